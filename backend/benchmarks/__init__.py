@@ -0,0 +1,24 @@
+"""
+性能测试，不依赖网络和真实的 notion 账号。
+    python -m benchmarks              micro-benchmark，见 runner.py
+    python -m benchmarks.load         端到端压测，见 load.py
+    python -m benchmarks.startup      冷启动耗时，见 startup.py
+
+src.config 在导入时就会读取环境变量，因此必须在导入 src 之前设置好。
+"""
+import os
+
+BENCHMARK_ENV = {
+    "PRODUCTION": "0",
+    "NOTION_CLIENT_ID": "benchmark",
+    "NOTION_SECRET": "benchmark",
+    "POSTGRES_URL": "postgres://benchmark",
+}
+# micro-benchmark 中限速设置得很大，避免测到的是等待令牌的时间。压测时需要真实的限速，不使用这两项
+NO_RATE_LIMIT_ENV = {
+    "NOTION_RATE_LIMIT": "1000000000",
+    "NOTION_RATE_LIMIT_BURST": "1000000000",
+}
+# 实际由这里设置的环境变量（没有被用户设置过的）
+applied_env = {key: value for key, value in {**BENCHMARK_ENV, **NO_RATE_LIMIT_ENV}.items() if key not in os.environ}
+os.environ.update(applied_env)
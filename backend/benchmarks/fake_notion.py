@@ -0,0 +1,208 @@
+"""
+在进程内模拟 notion api，替换 notion-client 使用的 httpx client，请求不会经过网络。
+只实现了后端用到的接口，返回值的格式与 notion 相同，但内容是固定的。
+"""
+import json
+import re
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+
+from src.notion_api import api
+
+DATABASE_PROPERTIES = {
+    "Name": {"id": "title", "name": "Name", "type": "title", "title": {}},
+    "Abstract": {"id": "abs", "name": "Abstract", "type": "rich_text", "rich_text": {}},
+    "DOI": {"id": "doi", "name": "DOI", "type": "rich_text", "rich_text": {}},
+    "URL": {"id": "url", "name": "URL", "type": "url", "url": {}},
+    "Year": {"id": "year", "name": "Year", "type": "number", "number": {"format": "number"}},
+    "Published": {"id": "pub", "name": "Published", "type": "date", "date": {}},
+    "Type": {"id": "type", "name": "Type", "type": "select", "select": {"options": []}},
+    "Subjects": {"id": "subj", "name": "Subjects", "type": "multi_select", "multi_select": {"options": []}},
+    "Authors": {"id": "auth", "name": "Authors", "type": "rich_text", "rich_text": {}},
+    # 关联到同一个 database，notion 返回的 relation 中还有 database_id，各个 database 不同，这里省略
+    "References": {
+        "id": "refs",
+        "name": "References",
+        "type": "relation",
+        "relation": {"type": "dual_property", "dual_property": {}},
+    },
+    "Status": {
+        "id": "stat",
+        "name": "Status",
+        "type": "status",
+        "status": {
+            "options": [{"id": f"o{i}", "name": name} for i, name in enumerate(["Not started", "Reading", "Done"])]
+        },
+    },
+}
+# 各类型的属性值应该是什么 python 类型，None 表示可以清空
+_VALUE_TYPES = {
+    "title": list,
+    "rich_text": list,
+    "number": (int, float, type(None)),
+    "url": (str, type(None)),
+    "select": (dict, type(None)),
+    "multi_select": list,
+    "date": (dict, type(None)),
+    "checkbox": bool,
+    "status": (dict, type(None)),
+    "relation": list,
+}
+# 路径中的 id，如 pages/{id}、blocks/{id}/children
+_ID = re.compile(r"/(?!children\b)[0-9a-zA-Z-]{8,}")
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+(Z|[+-]\d{2}:\d{2})?)?$")
+
+
+class FakeNotion:
+    def __init__(self, search_results: int = 20, database_properties: dict | None = None, rows: list[dict] | None = None):
+        self.search_results = search_results
+        self.database_properties = database_properties or DATABASE_PROPERTIES
+        # databases/{id}/query 返回的 page，所有 database 相同
+        self.rows = rows or []
+        # 每个接口收到的请求数，key 如 "POST pages"
+        self.requests: Counter[str] = Counter()
+        # 每个 page 正文中的 block 数
+        self.blocks: Counter[str] = Counter()
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/v1/")
+        route = f"{request.method} {_ID.sub('/{id}', path)}"
+        self.requests[route] += 1
+        body = json.loads(request.content) if request.content else {}
+        if route == "POST pages":
+            message = self.validate_properties(body.get("properties", {}))
+            if message is None:
+                message = self.validate_children(body.get("children", []))
+            if message is not None:
+                return self.error(400, "validation_error", message)
+            page_id = str(uuid.uuid4())
+            self.blocks[page_id] += len(body.get("children", []))
+            return httpx.Response(200, json=self.page(page_id, body.get("properties", {})))
+        if route == "PATCH blocks/{id}/children":
+            message = self.validate_children(body.get("children", []))
+            if message is not None:
+                return self.error(400, "validation_error", message)
+            self.blocks[path.split("/")[1]] += len(body["children"])
+            return httpx.Response(200, json={"object": "list", "results": body["children"], "has_more": False})
+        if route == "PATCH pages/{id}":
+            return httpx.Response(200, json={**self.page(path.split("/")[1], {}), **body})
+        if route == "GET databases/{id}":
+            return httpx.Response(200, json=self.database(path.split("/")[1]))
+        if route == "POST databases/{id}/query":
+            return httpx.Response(200, json=self.query(body))
+        if route == "GET pages/{id}":
+            return httpx.Response(200, json=self.page(path.split("/")[1], {}))
+        if route == "POST search":
+            results = [self.database(f"{i:08d}-0000-0000-0000-000000000000") for i in range(self.search_results)]
+            return httpx.Response(200, json={"object": "list", "results": results, "has_more": False, "next_cursor": None})
+        if route == "GET users/{id}":
+            user = {"object": "user", "id": path.split("/")[1], "type": "person", "name": "Benchmark", "person": {}}
+            return httpx.Response(200, json=user)
+        return self.error(404, "object_not_found", f"{route} not found")
+
+    @staticmethod
+    def error(status: int, code: str, message: str, headers: dict | None = None) -> httpx.Response:
+        return httpx.Response(
+            status,
+            json={"object": "error", "status": status, "code": code, "message": message},
+            headers=headers,
+        )
+
+    def validate_properties(self, properties: dict) -> str | None:
+        """与 notion 创建 page 时的校验相同（见 api.py 开头的说明），有多个错误时只返回第一个"""
+        for name, value in properties.items():
+            schema = self.database_properties.get(name)
+            if schema is None:
+                return f"{name} is not a property that exists."
+            pd_type = schema["type"]
+            if not isinstance(value, dict) or not isinstance(value.get(pd_type, ...), _VALUE_TYPES.get(pd_type, object)):
+                return f"{name} is expected to be {pd_type}."
+            if pd_type == "status" and value["status"] is not None:
+                option = value["status"].get("name")
+                if option not in {o["name"] for o in schema["status"]["options"]}:
+                    return f'Invalid status option. Status option "{option}" does not exist".'
+            if pd_type == "date" and value["date"] is not None:
+                start = value["date"].get("start")
+                if not isinstance(start, str) or not _ISO_DATE.match(start):
+                    return (
+                        f"body failed validation: body.properties.{name}.date.start should be a valid ISO 8601 date string, "
+                        f"instead was `{json.dumps(start)}`."
+                    )
+        return None
+
+    @staticmethod
+    def validate_children(children: list[dict]) -> str | None:
+        if len(children) > 100:
+            return f"body failed validation: body.children.length should be ≤ `100`, instead was `{len(children)}`."
+        for i, block in enumerate(children):
+            for j, text in enumerate(block[block["type"]].get("rich_text", [])):
+                if len(text["text"]["content"]) > 2000:
+                    return (
+                        f"body failed validation: body.children[{i}].{block['type']}.rich_text[{j}].text.content.length "
+                        f"should be ≤ `2000`, instead was `{len(text['text']['content'])}`."
+                    )
+        return None
+
+    def query(self, body: dict) -> dict:
+        """只支持按 last_edited_time 过滤（on_or_after）和排序，start_cursor 是下一页在结果中的下标"""
+        rows = self.rows
+        edited_after = body.get("filter", {}).get("last_edited_time", {}).get("on_or_after")
+        if edited_after is not None:
+            rows = [row for row in rows if row["last_edited_time"] >= edited_after]
+        if body.get("sorts"):
+            rows = sorted(rows, key=lambda row: row["last_edited_time"])
+        start = int(body.get("start_cursor") or 0)
+        end = start + body.get("page_size", 100)
+        has_more = end < len(rows)
+        return {
+            "object": "list",
+            "results": rows[start:end],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None,
+        }
+
+    @staticmethod
+    def page(page_id: str, properties: dict) -> dict:
+        return {
+            "object": "page",
+            "id": page_id,
+            "created_time": "2024-05-01T12:00:00.000Z",
+            "last_edited_time": "2024-05-01T12:00:00.000Z",
+            "parent": {"type": "database_id", "database_id": "benchmark"},
+            "archived": False,
+            "properties": properties,
+            "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+        }
+
+    def database(self, database_id: str) -> dict:
+        return {
+            "object": "database",
+            "id": database_id,
+            "created_time": "2024-05-01T12:00:00.000Z",
+            "last_edited_time": "2024-05-01T12:00:00.000Z",
+            "title": [{"type": "text", "text": {"content": "Papers"}, "plain_text": "Papers"}],
+            "properties": self.database_properties,
+            "url": f"https://www.notion.so/{database_id.replace('-', '')}",
+        }
+
+
+def install(fake: FakeNotion) -> None:
+    """之后 notion-client 的所有请求都由 fake 处理"""
+    api.notion.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(fake.handle), base_url="https://api.notion.com/v1/"
+    )
+
+
+@contextmanager
+def installed(fake: FakeNotion) -> Iterator[FakeNotion]:
+    """只在 with 内部由 fake 处理，退出后恢复原来的 client"""
+    original = api.notion.client
+    install(fake)
+    try:
+        yield fake
+    finally:
+        api.notion.client = original
@@ -0,0 +1,230 @@
+"""
+端到端压测：启动模拟的 notion 服务（notion_server.py）和后端（uvicorn main:app），
+由多个虚拟用户按比例发送 search、page-database、upload 请求，统计吞吐量和延迟。
+用于确定 worker 数量，以及在部署前发现扩展性的退化。
+
+    cd backend
+    python -m benchmarks.load --duration 30 --users 50 --tokens 20 --workers 2 \\
+        --mix search=5,page-database=3,upload=2 --latency-ms 150 --latency-jitter-ms 50 \\
+        --rate-429 0.02 --rate-5xx 0.01 --rate-validation 0.02
+
+后端使用真实的限速配置（NOTION_RATE_LIMIT 等环境变量），本地模式下会使用 src/database/database.db。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+import httpx
+
+from benchmarks import applied_env, NO_RATE_LIMIT_ENV
+from benchmarks.notion_server import Faults
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+QUERIES = ["paper", "reading", "notes", "thesis", "survey", "ml", "physics", "biology", "todo", "archive"]
+DATABASE_IDS = [f"{i:08d}-0000-0000-0000-000000000000" for i in range(10)]
+
+
+@dataclass
+class OperationStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _page_properties(i: int) -> dict:
+    text = lambda content: [{"text": {"content": content}}]
+    return {
+        "parent": {"type": "database_id", "database_id": DATABASE_IDS[0]},
+        "properties": {
+            "Name": {"title": text(f"Load test paper {i}")},
+            "Abstract": {"rich_text": text("Lorem ipsum dolor sit amet. " * 20)},
+            "DOI": {"rich_text": text(f"10.1000/load{i}")},
+            "Year": {"number": 2021},
+            "Published": {"date": {"start": "2021-03-01"}},
+            "Subjects": {"multi_select": [{"name": "Machine Learning"}]},
+        },
+    }
+
+
+def _parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("search", "page-database", "upload"):
+            raise ValueError(f"Unknown operation in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{url} is not ready after {timeout} seconds")
+                await asyncio.sleep(0.2)
+
+
+async def _virtual_user(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    weights: dict[str, float],
+    stats: dict[str, OperationStats],
+    deadline: float,
+    rng: random.Random,
+) -> None:
+    names, values = list(weights), list(weights.values())
+    upload_data = [_page_properties(i) for i in range(args.upload_size)]
+    while time.monotonic() < deadline:
+        operation = rng.choices(names, values)[0]
+        access_token = f"secret_load_{rng.randrange(args.tokens)}"
+        if operation == "search":
+            path, body = "/search-by-title", {
+                "query": rng.choice(QUERIES),
+                "search_for": "database",
+                "access_token": access_token,
+            }
+        elif operation == "page-database":
+            path, body = "/page-database/", {
+                "PDId": rng.choice(DATABASE_IDS),
+                "PDType": "database",
+                "access_token": access_token,
+            }
+        else:
+            path, body = "/upload-works", {"data": upload_data, "access_token": access_token}
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            result = response.json()
+            # /upload-works 的 data 是上传失败的内容，只要有一条失败就算作出错
+            ok = response.status_code == 200 and (not result["data"] if operation == "upload" else result["success"])
+        except httpx.HTTPError:
+            ok = False
+        stats[operation].latencies.append(time.perf_counter() - start)
+        if not ok:
+            stats[operation].errors += 1
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def report(stats: dict[str, OperationStats], duration: float, notion_stats: dict) -> dict:
+    """打印并返回结果。延迟的单位是毫秒"""
+    result = {"duration": round(duration, 2), "operations": {}, "notion": notion_stats}
+    all_latencies = [latency for operation in stats.values() for latency in operation.latencies]
+    rows = {**stats, "total": OperationStats(all_latencies, sum(operation.errors for operation in stats.values()))}
+    print(f"{'operation':<15} {'requests':>9} {'req/s':>8} {'errors':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9}")
+    for name, operation in rows.items():
+        count = len(operation.latencies)
+        row = {
+            "requests": count,
+            "throughput": round(count / duration, 2),
+            "error_rate": round(operation.errors / count, 4) if count else 0,
+            "p50": round(_percentile(operation.latencies, 50) * 1000, 1),
+            "p99": round(_percentile(operation.latencies, 99) * 1000, 1),
+            "max": round(max(operation.latencies, default=0) * 1000, 1),
+        }
+        result["operations"][name] = row
+        print(
+            f"{name:<15} {count:>9} {row['throughput']:>8.1f} {row['error_rate']:>8.1%} "
+            f"{row['p50']:>9.1f} {row['p99']:>9.1f} {row['max']:>9.1f}"
+        )
+    print(f"notion requests: {json.dumps(notion_stats['requests'])}")
+    print(f"injected faults: {json.dumps(notion_stats['injected'])}")
+    return result
+
+
+async def run(args: argparse.Namespace) -> dict:
+    weights = _parse_mix(args.mix)
+    notion_port, app_port = _free_port(), _free_port()
+    fault_args = [
+        arg for f in fields(Faults) for arg in (f"--{f.name.replace('_', '-')}", str(getattr(args, f.name)))
+    ]
+    # 后端需要真实的限速，去掉 benchmarks 为 micro-benchmark 设置的限速
+    env = {key: value for key, value in os.environ.items() if not (key in NO_RATE_LIMIT_ENV and key in applied_env)}
+    env["NOTION_API_URL"] = f"http://127.0.0.1:{notion_port}"
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.notion_server", "--port", str(notion_port), "--seed", str(args.seed)]
+            + fault_args,
+            cwd=BACKEND_ROOT,
+            env=env,
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--workers", str(args.workers)]
+            + ["--log-level", "warning"],
+            cwd=BACKEND_ROOT,
+            env=env,
+        ),
+    ]
+    try:
+        await _wait_until_ready(f"http://127.0.0.1:{notion_port}/_stats", processes[0])
+        await _wait_until_ready(f"http://127.0.0.1:{app_port}/openapi.json", processes[1])
+        stats: dict[str, OperationStats] = defaultdict(OperationStats)
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=args.timeout
+        ) as client:
+            start = time.monotonic()
+            deadline = start + args.duration
+            await asyncio.gather(
+                *(
+                    _virtual_user(client, args, weights, stats, deadline, random.Random(args.seed + i))
+                    for i in range(args.users)
+                )
+            )
+            duration = time.monotonic() - start
+            notion_stats = (await client.get(f"http://127.0.0.1:{notion_port}/_stats")).json()
+        return report(stats, duration, notion_stats)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the backend against a fake Notion API")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to generate load")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--tokens", type=int, default=10, help="distinct access tokens the users pick from")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the backend")
+    parser.add_argument("--mix", default="search=5,page-database=3,upload=2", help="relative weight of operations")
+    parser.add_argument("--upload-size", type=int, default=5, help="pages per /upload-works request")
+    parser.add_argument("--timeout", type=float, default=120, help="client timeout of each request in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as json to this file")
+    for f in fields(Faults):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=float, default=f.default)
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+以 http 服务的形式运行 FakeNotion，用于 load.py 的压测。可以注入：
+    * 延迟：每个请求等待 latency_ms ± latency_jitter_ms 毫秒
+    * 429：按 rate_429 的比例随机返回，或者模拟 notion 按 access token 的限速（token_rate）；都带有 Retry-After
+    * 5xx：按 rate_5xx 的比例随机返回 500、502、503
+    * validation_error：pages.create 按 rate_validation 的比例随机返回；属性本身不符合 schema 时也会返回，见 FakeNotion
+GET /_stats 返回各接口的请求数和注入的错误数。
+
+    python -m benchmarks.notion_server --port 9000 --latency-ms 150 --rate-429 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, fields
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from benchmarks.fake_notion import FakeNotion
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0
+    latency_jitter_ms: float = 0
+    rate_429: float = 0
+    retry_after: float = 1
+    rate_5xx: float = 0
+    rate_validation: float = 0
+    # 每个 access token 平均每秒最多多少个请求、允许的突发请求数，0 表示不限速。notion 的限制约为 3
+    token_rate: float = 0
+    token_burst: float = 10
+
+
+class NotionServer:
+    def __init__(self, fake: FakeNotion, faults: Faults, seed: int | None = None):
+        self.fake = fake
+        self.faults = faults
+        self.random = random.Random(seed)
+        # 注入的错误数，key 如 "429"、"rate_limited"、"5xx"、"validation_error"
+        self.injected: Counter[str] = Counter()
+        # access token -> (剩余令牌数, 上次更新时间)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self.app = Starlette(
+            routes=[
+                Route("/_stats", self.stats, methods=["GET"]),
+                Route("/{path:path}", self.handle, methods=["GET", "POST", "PATCH", "DELETE"]),
+            ]
+        )
+
+    def _take_token(self, access_token: str) -> bool:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(access_token, (self.faults.token_burst, now))
+        tokens = min(self.faults.token_burst, tokens + (now - updated_at) * self.faults.token_rate)
+        if tokens < 1:
+            self._buckets[access_token] = (tokens, now)
+            return False
+        self._buckets[access_token] = (tokens - 1, now)
+        return True
+
+    def _inject(self, request: Request) -> httpx.Response | None:
+        """返回注入的错误，不注入时返回 None"""
+        faults = self.faults
+        access_token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if faults.token_rate > 0 and not self._take_token(access_token):
+            self.injected["rate_limited"] += 1
+            return self._rate_limited()
+        if self.random.random() < faults.rate_429:
+            self.injected["429"] += 1
+            return self._rate_limited()
+        if self.random.random() < faults.rate_5xx:
+            self.injected["5xx"] += 1
+            status = self.random.choice([500, 502, 503])
+            code = "service_unavailable" if status == 503 else "internal_server_error"
+            return self.fake.error(status, code, "Injected server error")
+        if request.method == "POST" and request.url.path == "/v1/pages" and self.random.random() < faults.rate_validation:
+            self.injected["validation_error"] += 1
+            return self.fake.error(400, "validation_error", "Abstract is expected to be rich_text.")
+        return None
+
+    def _rate_limited(self) -> httpx.Response:
+        return self.fake.error(
+            429,
+            "rate_limited",
+            "You have been rated limited. Please try again in a few minutes.",
+            headers={"Retry-After": f"{self.faults.retry_after:g}"},
+        )
+
+    async def handle(self, request: Request) -> Response:
+        delay = self.faults.latency_ms + self.random.uniform(-1, 1) * self.faults.latency_jitter_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        response = self._inject(request)
+        if response is None:
+            response = self.fake.handle(
+                httpx.Request(request.method, str(request.url), headers=request.headers.raw, content=await request.body())
+            )
+        return Response(response.content, status_code=response.status_code, headers=dict(response.headers))
+
+    async def stats(self, request: Request) -> JSONResponse:
+        return JSONResponse({"requests": dict(self.fake.requests), "injected": dict(self.injected)})
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake Notion API server with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--seed", type=int, default=None)
+    for field in fields(Faults):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=float, default=field.default)
+    args = parser.parse_args()
+    faults = Faults(**{field.name: getattr(args, field.name) for field in fields(Faults)})
+    server = NotionServer(FakeNotion(), faults, seed=args.seed)
+    print(f"Fake notion api listening on http://{args.host}:{args.port}, faults: {json.dumps(vars(faults))}")
+    uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+运行 suite.py 中的所有 benchmark，并与保存的基准结果（baselines.json）比较，
+比基准慢超过阈值的标记为 REGRESSION，此时退出码为 1，可以直接用于 CI。
+
+    cd backend
+    python -m benchmarks               # 运行并与基准比较
+    python -m benchmarks --save        # 运行并将结果保存为新的基准
+    python -m benchmarks -k upload     # 只运行名称中包含 upload 的
+
+基准结果与机器相关，换机器（如 CI 的机器）后需要先 --save 一次。
+"""
+import argparse
+import asyncio
+import json
+import timeit
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+_loop = asyncio.new_event_loop()
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # 做好准备工作后，返回被测的函数
+    setup: Callable[[], Callable[[], Any]]
+    # 被测函数每次调用处理多少条数据，用于计算平均每条的耗时
+    items: int = 1
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, items: int = 1):
+    """注册一个 benchmark，被装饰的函数即 Benchmark.setup"""
+
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = Benchmark(name=name, setup=setup, items=items)
+        return setup
+
+    return decorator
+
+
+def run_async(func: Callable[[], Awaitable[Any]]) -> Callable[[], Any]:
+    """将异步函数包装为同步函数，所有 benchmark 共用一个 event loop"""
+    return lambda: _loop.run_until_complete(func())
+
+
+def measure(func: Callable[[], Any], repeat: int = 5) -> float:
+    """返回每次调用的耗时（微秒）。取多轮中最快的一轮，减少其他进程的干扰"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def load_baselines() -> dict[str, float]:
+    if not BASELINES_PATH.exists():
+        return {}
+    return json.loads(BASELINES_PATH.read_text())
+
+
+def save_baselines(results: dict[str, float]) -> None:
+    baselines = load_baselines()
+    baselines.update({name: round(us, 2) for name, us in results.items()})
+    BASELINES_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+
+
+def run(keyword: str = "") -> dict[str, float]:
+    # 导入 suite 时才会注册所有 benchmark
+    from benchmarks import suite  # noqa: F401
+
+    return {name: measure(bench.setup()) for name, bench in BENCHMARKS.items() if keyword in name}
+
+
+def report(results: dict[str, float], baselines: dict[str, float], threshold: float) -> list[str]:
+    """打印结果，返回变慢超过 threshold（比例）的 benchmark 名称"""
+    regressions = []
+    print(f"{'benchmark':<40} {'baseline':>11} {'current':>11} {'per item':>10} {'change':>8}")
+    for name, us in results.items():
+        per_item = us / BENCHMARKS[name].items
+        baseline = baselines.get(name)
+        if baseline is None:
+            change, flag = "", "new"
+        else:
+            ratio = us / baseline - 1
+            change = f"{ratio:+.0%}"
+            flag = "REGRESSION" if ratio > threshold else ""
+            if flag:
+                regressions.append(name)
+        baseline_str = f"{baseline:.1f}us" if baseline is not None else "-"
+        print(f"{name:<40} {baseline_str:>11} {us:>9.1f}us {per_item:>8.2f}us {change:>8} {flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run backend micro-benchmarks")
+    parser.add_argument("-k", "--keyword", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baselines")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="slowdown ratio that counts as a regression (default 0.25)"
+    )
+    args = parser.parse_args()
+
+    results = run(args.keyword)
+    regressions = report(results, load_baselines(), args.threshold)
+    if args.save:
+        save_baselines(results)
+        print(f"Saved {len(results)} baselines to {BASELINES_PATH}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
@@ -0,0 +1,105 @@
+"""
+比较接口返回值的序列化耗时：FastAPI 默认的方式（校验 response_model、转换为基本类型、json.dumps）与 ApiJSONResponse。
+数据模拟 /search-by-title 返回的 notion page，每个 page 有十几个属性。
+
+运行：cd backend && python -m benchmarks.serialization
+suite.py 中也包含了其中两种数据量的结果，会与基准比较
+"""
+import asyncio
+import json
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from benchmarks.runner import measure
+from src.models import ApiResponse
+from src.responses import create_response
+
+SIZES = [1, 10, 100, 500]
+
+_response_field = create_response_field(name="Response_benchmark", type_=ApiResponse)
+_loop = asyncio.new_event_loop()
+
+
+def make_page(i: int) -> dict:
+    rich_text = lambda text: [
+        {
+            "type": "text",
+            "text": {"content": text, "link": None},
+            "annotations": {
+                "bold": False,
+                "italic": False,
+                "strikethrough": False,
+                "underline": False,
+                "code": False,
+                "color": "default",
+            },
+            "plain_text": text,
+            "href": None,
+        }
+    ]
+    properties = {
+        "Name": {"id": "title", "type": "title", "title": rich_text(f"A study of something important, part {i}")},
+        "Abstract": {"id": "abs", "type": "rich_text", "rich_text": rich_text("Lorem ipsum dolor sit amet. " * 20)},
+        "DOI": {"id": "doi", "type": "rich_text", "rich_text": rich_text(f"10.1000/xyz{i}")},
+        "URL": {"id": "url", "type": "url", "url": f"https://example.org/works/{i}"},
+        "Year": {"id": "year", "type": "number", "number": 2000 + i % 24},
+        "Published": {"id": "pub", "type": "date", "date": {"start": "2021-03-01", "end": None, "time_zone": None}},
+        "Type": {"id": "type", "type": "select", "select": {"id": "s1", "name": "journal-article", "color": "blue"}},
+        "Subjects": {
+            "id": "subj",
+            "type": "multi_select",
+            "multi_select": [{"id": f"m{j}", "name": f"subject {j}", "color": "gray"} for j in range(5)],
+        },
+        "Authors": {"id": "auth", "type": "rich_text", "rich_text": rich_text("Alice, Bob, Carol, Dave")},
+        "Venue": {"id": "venue", "type": "rich_text", "rich_text": rich_text("Journal of Examples")},
+        "Cited": {"id": "cited", "type": "number", "number": i * 3},
+        "Read": {"id": "read", "type": "checkbox", "checkbox": i % 2 == 0},
+    }
+    return {
+        "object": "page",
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "created_time": "2024-05-01T12:00:00.000Z",
+        "last_edited_time": "2024-05-02T12:00:00.000Z",
+        "created_by": {"object": "user", "id": "u1"},
+        "last_edited_by": {"object": "user", "id": "u1"},
+        "cover": None,
+        "icon": None,
+        "parent": {"type": "database_id", "database_id": "d1"},
+        "archived": False,
+        "in_trash": False,
+        "properties": properties,
+        "url": f"https://www.notion.so/{i}",
+        "public_url": None,
+    }
+
+
+def fastapi_default(data: list[dict]) -> bytes:
+    """与 FastAPI 处理 response_model=ApiResponse 的接口返回 ApiResponse 时相同"""
+    content = _loop.run_until_complete(
+        serialize_response(field=_response_field, response_content=ApiResponse(success=True, data=data))
+    )
+    return JSONResponse(content).body
+
+
+def api_json_response(data: list[dict]) -> bytes:
+    return create_response(success=True, data=data).body
+
+
+def main():
+    print(f"{'pages':>6} {'bytes':>10} {'fastapi (us)':>14} {'orjson (us)':>13} {'speedup':>8}")
+    for size in SIZES:
+        data = [make_page(i) for i in range(size)]
+        # 两种方式的结果必须相同
+        assert json.loads(fastapi_default(data)) == json.loads(api_json_response(data))
+        default_time = measure(lambda: fastapi_default(data))
+        fast_time = measure(lambda: api_json_response(data))
+        print(
+            f"{size:>6} {len(api_json_response(data)):>10} {default_time:>14.1f} {fast_time:>13.1f} "
+            f"{default_time / fast_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
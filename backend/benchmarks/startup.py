@@ -0,0 +1,113 @@
+"""
+冷启动测试：每一轮都在新的进程中导入 main、执行 lifespan、处理第一个请求，分别计时。
+自动扩缩容时新实例在这段时间内无法处理请求，因此与 micro-benchmark 一样与 baselines.json 比较。
+
+    cd backend
+    python -m benchmarks.startup               # 运行并与基准比较
+    python -m benchmarks.startup --save        # 运行并将结果保存为新的基准
+
+第一个请求是 search-by-title，notion 的请求由 fake_notion 处理，包括建立连接、取令牌、序列化等首次调用的开销。
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.runner import BASELINES_PATH, load_baselines, save_baselines
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+PHASES = ("import_main", "lifespan", "first_request")
+
+
+def _measure_once() -> dict[str, float]:
+    """在当前进程中执行一次冷启动，返回每个阶段的耗时（微秒）。必须在新的进程中调用"""
+    start = time.perf_counter()
+    import main
+
+    imported = time.perf_counter()
+    from fastapi.testclient import TestClient
+
+    from benchmarks.fake_notion import FakeNotion, install
+
+    with TestClient(main.app) as client:
+        started = time.perf_counter()
+        install(FakeNotion(search_results=20))
+        fake_ready = time.perf_counter()
+        response = client.post(
+            "/search-by-title", json={"query": "paper", "search_for": "database", "access_token": "secret_startup"}
+        )
+        finished = time.perf_counter()
+        if not response.json()["success"]:
+            raise RuntimeError(f"First request failed: {response.text}")
+    # TestClient 的创建计入 lifespan，安装 fake 的时间不计入
+    return {
+        "import_main": (imported - start) * 1e6,
+        "lifespan": (started - imported) * 1e6,
+        "first_request": (finished - fake_ready) * 1e6,
+    }
+
+
+def run(rounds: int) -> dict[str, float]:
+    """每个阶段取多轮中最快的一轮，减少其他进程的干扰"""
+    best: dict[str, float] = {}
+    for _ in range(rounds):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            cwd=BACKEND_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for phase, us in json.loads(output.splitlines()[-1]).items():
+            best[phase] = min(best.get(phase, us), us)
+    return {f"startup.{phase}": best[phase] for phase in PHASES}
+
+
+def report(results: dict[str, float], baselines: dict[str, float], threshold: float) -> list[str]:
+    """打印结果，返回变慢超过 threshold（比例）的阶段名称"""
+    regressions = []
+    print(f"{'phase':<40} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, us in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            change, flag = "", "new"
+        else:
+            ratio = us / baseline - 1
+            change = f"{ratio:+.0%}"
+            flag = "REGRESSION" if ratio > threshold else ""
+            if flag:
+                regressions.append(name)
+        baseline_str = f"{baseline / 1000:.1f}ms" if baseline is not None else "-"
+        print(f"{name:<40} {baseline_str:>11} {us / 1000:>9.1f}ms {change:>8} {flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure backend cold start")
+    parser.add_argument("--rounds", type=int, default=5, help="number of fresh processes to start (default 5)")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baselines")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="slowdown ratio that counts as a regression (default 0.25)"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_measure_once()))
+        return 0
+    results = run(args.rounds)
+    regressions = report(results, load_baselines(), args.threshold)
+    if args.save:
+        save_baselines(results)
+        print(f"Saved {len(results)} baselines to {BASELINES_PATH}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+后端热点路径的 benchmark：模型校验、接口返回值序列化、Work 到 notion properties 的转换、上传和搜索，
+以及 database 本地副本的同步和搜索。
+notion 的请求由 fake_notion.FakeNotion 在进程内处理，测到的是后端自身的开销。
+"""
+import uuid
+
+from benchmarks.fake_notion import FakeNotion, DATABASE_PROPERTIES, install
+from benchmarks.runner import benchmark, run_async
+from benchmarks.serialization import make_page, fastapi_default, api_json_response
+from src.cache import TTLCache
+from src.database.db_client import init_db
+from src.models import NAccessToken, NUser, Work, PDToWorkMappingItem, NProperty
+from src.notion_api import api
+from src.notion_api.database_work_mapping import transform_works_to_pages
+from src.notion_api.citation_graph import upload_citation_graph
+from src.notion_api.page_content import work_to_blocks
+from src.notion_api.database_mirror import sync_database, search_mirror
+
+ACCESS_TOKEN_JSON = {
+    "access_token": "secret_benchmark",
+    "bot_id": "b1b2b3b4-0000-0000-0000-000000000000",
+    "workspace_id": "w1w2w3w4-0000-0000-0000-000000000000",
+    "workspace_name": "Benchmark workspace",
+    "workspace_icon": "https://example.org/icon.png",
+    "token_type": "bearer",
+    "duplicated_template_id": None,
+    "request_id": "r1r2r3r4-0000-0000-0000-000000000000",
+    "owner": {
+        "type": "user",
+        "user": {
+            "object": "user",
+            "id": "u1u2u3u4-0000-0000-0000-000000000000",
+            "name": "Benchmark",
+            "avatar_url": None,
+            "type": "person",
+            "person": {"email": "benchmark@example.org"},
+        },
+    },
+}
+USER_JSON = ACCESS_TOKEN_JSON["owner"]["user"]
+# 每篇文献的参考文献数量
+REFERENCES = 50
+UPLOAD_ITEMS = 100
+MAPPING_WORKS = 100
+MIRROR_PAGES = 500
+
+
+def make_work(i: int, references: int = 0) -> dict:
+    return {
+        "title": f"A study of something important, part {i}",
+        "authors": [
+            {"familyName": f"Family{j}", "givenName": f"Given{j}", "fullName": f"Given{j} Family{j}"} for j in range(5)
+        ],
+        "abstract": "Lorem ipsum dolor sit amet. " * 40,
+        "subjects": ["Computer Science", "Machine Learning"],
+        "DOI": f"10.1000/xyz{i}",
+        "platform": "arXiv",
+        "platformId": f"2101.{i:05d}",
+        "url": f"https://arxiv.org/abs/2101.{i:05d}",
+        "type": "journal-article",
+        "publishInfo": {"publisher": "Example", "containerTitle": "Journal of Examples", "year": "2021", "month": "03"},
+        "references": [make_work(i * 1000 + j) for j in range(references)] or None,
+    }
+
+
+def make_mirror_page(i: int) -> dict:
+    """databases.query 返回的 page，每分钟修改一个"""
+    text = lambda content: {"type": "rich_text", "rich_text": [{"type": "text", "plain_text": content}]}
+    words = ["neural", "quantum", "protein", "graph", "climate", "language", "galaxy", "enzyme", "market", "robot"]
+    return {
+        "object": "page",
+        "id": f"{i:08d}-1111-0000-0000-000000000000",
+        "last_edited_time": f"2024-05-{i // 1440 + 1:02d}T{i // 60 % 24:02d}:{i % 60:02d}:00.000Z",
+        "archived": False,
+        "url": f"https://www.notion.so/page{i}",
+        "properties": {
+            "Name": {"type": "title", "title": [{"type": "text", "plain_text": f"{words[i % 10]} models, part {i}"}]},
+            "Authors": text(", ".join(f"Given{i % 50 + j} Family{i % 50 + j}" for j in range(5))),
+            "Abstract": text(f"Lorem ipsum {words[i % 7]} dolor sit amet {words[i % 3]}. " * 20),
+            "DOI": text(f"10.1000/xyz{i}"),
+            "Year": {"type": "number", "number": 2021},
+        },
+    }
+
+
+def make_mapping() -> dict[str, PDToWorkMappingItem | None]:
+    work_property_names = {
+        "Name": "title",
+        "Abstract": "abstract",
+        "DOI": "DOI",
+        "URL": "url",
+        "Year": "year",
+        "Published": "date",
+        "Type": "type",
+        "Subjects": "subjects",
+        "Authors": "authors",
+    }
+    return {
+        name: PDToWorkMappingItem(
+            PDPropertyName=name,
+            # 前端传来的 PDProperty 中 select 等的格式与 notion 返回的 schema 不同，这里只需要类型
+            PDProperty=NProperty.model_validate({key: DATABASE_PROPERTIES[name][key] for key in ("id", "name", "type")}),
+            workPropertyName=work_property_names[name],
+        )
+        for name in work_property_names
+    }
+
+
+@benchmark("model.NAccessToken.parse_obj")
+def bench_access_token():
+    return lambda: NAccessToken.model_validate(ACCESS_TOKEN_JSON)
+
+
+@benchmark("model.NUser.parse_obj")
+def bench_user():
+    return lambda: NUser.model_validate(USER_JSON)
+
+
+@benchmark("model.Work")
+def bench_work():
+    data = make_work(0)
+    return lambda: Work.model_validate(data)
+
+
+@benchmark("model.Work.references", items=REFERENCES + 1)
+def bench_work_with_references():
+    data = make_work(0, references=REFERENCES)
+    return lambda: Work.model_validate(data)
+
+
+@benchmark("model.Work.model_validate_json")
+def bench_work_from_json():
+    """从 DOI 缓存中读取 Work"""
+    data = Work.model_validate(make_work(0)).model_dump_json(exclude_none=True)
+    return lambda: Work.model_validate_json(data)
+
+
+for _size in (10, 100):
+
+    @benchmark(f"serialize.fastapi_default.{_size}", items=_size)
+    def bench_serialize_default(size=_size):
+        data = [make_page(i) for i in range(size)]
+        return lambda: fastapi_default(data)
+
+    @benchmark(f"serialize.api_json_response.{_size}", items=_size)
+    def bench_serialize_fast(size=_size):
+        data = [make_page(i) for i in range(size)]
+        return lambda: api_json_response(data)
+
+
+@benchmark("mapping.transform_works_to_pages", items=MAPPING_WORKS)
+def bench_transform():
+    mapping = make_mapping()
+    works = [Work.model_validate(make_work(i)) for i in range(MAPPING_WORKS)]
+    return lambda: transform_works_to_pages("benchmark", mapping, works)
+
+
+@benchmark("notion.upload_works", items=UPLOAD_ITEMS)
+def bench_upload_works():
+    """每条上传内容经过限速、semaphore、notion-client 和 fake 的总开销"""
+    works = [Work.model_validate(make_work(i)) for i in range(UPLOAD_ITEMS)]
+    pages = transform_works_to_pages("benchmark", make_mapping(), works)
+    install(FakeNotion())
+
+    async def upload():
+        results = await api.upload_works(pages, "secret_benchmark")
+        assert not any(isinstance(result, api.ErrorResult) for result in results)
+
+    return run_async(upload)
+
+
+@benchmark("notion.upload_works.page_body", items=UPLOAD_ITEMS)
+def bench_upload_works_page_body():
+    """很长的摘要写入正文，分为 100 多个 block，每条需要 1 次 pages.create 和 1 次 blocks.children.append"""
+    works = [Work.model_validate({**make_work(i), "abstract": "word " * 50000}) for i in range(UPLOAD_ITEMS)]
+    pages = transform_works_to_pages("benchmark", make_mapping(), works)
+    for page, work in zip(pages, works):
+        page["children"] = work_to_blocks(work, ["abstract"])
+    install(FakeNotion())
+
+    async def upload():
+        results = await api.upload_works(pages, "secret_benchmark")
+        assert not any(isinstance(result, api.ErrorResult) for result in results)
+
+    return run_async(upload)
+
+
+@benchmark("notion.upload_citation_graph", items=REFERENCES + 1)
+def bench_upload_citation_graph():
+    """一篇文献和它的参考文献，分两轮上传。每次都是新的 database，上传记录中没有已经上传过的参考文献"""
+    works = [Work.model_validate(make_work(0, references=REFERENCES))]
+    mapping = make_mapping()
+    install(FakeNotion())
+    # 需要读写本地的上传记录，与 load.py 相同使用 src/database/database.db
+    run_async(init_db)()
+
+    async def upload():
+        results = await upload_citation_graph(works, mapping, uuid.uuid4().hex, "secret_benchmark", "References")
+        assert not any(isinstance(result, api.ErrorResult) for result in results)
+
+    return run_async(upload)
+
+
+@benchmark("notion.search_by_title.uncached")
+def bench_search_uncached():
+    install(FakeNotion(search_results=20))
+
+    async def search():
+        await api.search_cache.pop(("secret_benchmark", "paper", "database"))
+        await api.search_by_title("paper", "database", "secret_benchmark")
+
+    return run_async(search)
+
+
+@benchmark("notion.search_by_title.cached")
+def bench_search_cached():
+    install(FakeNotion(search_results=20))
+
+    async def search():
+        await api.search_by_title("paper", "database", "secret_benchmark")
+
+    return run_async(search)
+
+
+@benchmark("mirror.sync.initial", items=MIRROR_PAGES)
+def bench_mirror_sync_initial():
+    """每次都是新的 database，需要建立所有 page 的索引"""
+    install(FakeNotion(rows=[make_mirror_page(i) for i in range(MIRROR_PAGES)]))
+    run_async(init_db)()
+
+    async def sync():
+        result = await sync_database(uuid.uuid4().hex, "secret_benchmark")
+        assert not isinstance(result, api.ErrorResult) and result.updated == MIRROR_PAGES
+
+    return run_async(sync)
+
+
+def _synced_mirror_database() -> str:
+    database_id = "22222222-0000-0000-0000-000000000000"
+    install(FakeNotion(rows=[make_mirror_page(i) for i in range(MIRROR_PAGES)]))
+    run_async(init_db)()
+    run_async(lambda: sync_database(database_id, "secret_benchmark", full=True))()
+    return database_id
+
+
+@benchmark("mirror.sync.unchanged")
+def bench_mirror_sync_unchanged():
+    """没有修改时只会再次获取最后一分钟内修改的 page"""
+    database_id = _synced_mirror_database()
+
+    async def sync():
+        result = await sync_database(database_id, "secret_benchmark")
+        assert not isinstance(result, api.ErrorResult) and result.updated == 0
+
+    return run_async(sync)
+
+
+@benchmark("mirror.search")
+def bench_mirror_search():
+    database_id = _synced_mirror_database()
+
+    async def search():
+        result = await search_mirror(database_id, "quantum mod", "secret_benchmark")
+        assert not isinstance(result, api.ErrorResult) and result[0]
+
+    return run_async(search)
+
+
+@benchmark("cache.TTLCache.get_set", items=1000)
+def bench_ttl_cache():
+    cache = TTLCache(ttl=60, max_size=500)
+    keys = [("token", f"key{i}") for i in range(1000)]
+
+    def get_set():
+        for key in keys:
+            if cache.get(key) is None:
+                cache.set(key, key)
+
+    return get_set
@@ -1,26 +1,69 @@
+import os
+import secrets
+import shutil
 import sys
+import tempfile
+from collections import Counter
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any
+from typing import Literal
 
-from fastapi import FastAPI, status, Body, Request, BackgroundTasks
+from fastapi import FastAPI, status, Body, Request, BackgroundTasks, Form, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
 sys.path.append(str(Path(__file__).parent.resolve()))
 
-from src.models import SearchByTitleRequest, ApiResponse
+from src.models import (
+    SearchByTitleRequest,
+    ApiResponse,
+    UploadRawWorksRequest,
+    PageBodyField,
+    ImportFormat,
+    ResolveDOIsRequest,
+    ArxivWorksRequest,
+    PDToWorkMappingItem,
+    MirrorSyncRequest,
+    MirrorSearchRequest,
+)
 from src.config import Config
+from src.responses import ApiJSONResponse, create_response
+from src.metrics import registry, http_request_duration, upload_jobs
 from src.notion_api.api import (
     search_by_title,
     ErrorResult,
-    APIResponseError,
+    DuplicateResult,
     upload_works,
+    upload_raw_works,
     get_page_database_by_id,
     exchange_code_for_token,
     get_user_info,
+    open_http_clients,
+    close_http_clients,
+    to_error_result,
 )
+from src.notion_api.retry import NOTION_ERRORS
+from src.notion_api.upload_jobs import upload_job_manager
+from src.notion_api.citation_graph import upload_citation_graph
+from src.notion_api.database_mirror import sync_database, search_mirror
+from src.database.db_client import init_db, close_db
+from src.scrapers.doi import resolve_dois
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    await open_http_clients()
+    await upload_job_manager.start()
+    yield
+    await upload_job_manager.stop()
+    await close_http_clients()
+    await close_db()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ApiJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,18 +73,192 @@ app.add_middleware(
 )
 
 
-def create_response(success: bool, data: Any = None, message: str = "", code: int = 0) -> JSONResponse:
-    return JSONResponse(content={"success": success, "message": message, "data": data, "code": code})
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    with http_request_duration.time(method=request.method, route="unmatched", status="500") as labels:
+        response = await call_next(request)
+        # 使用路由的模板（如 /upload-jobs/{job_id}）而不是实际路径，避免标签数量无限增长
+        route = request.scope.get("route")
+        if route is not None:
+            labels["route"] = route.path
+        labels["status"] = str(response.status_code)
+    return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint(request: Request):
+    """Prometheus 格式的监控指标。是否开放及访问的 token 见 Config.METRICS_ENABLED、Config.METRICS_TOKEN"""
+    if not Config.METRICS_ENABLED:
+        return PlainTextResponse("Not Found", status_code=status.HTTP_404_NOT_FOUND)
+    if Config.METRICS_TOKEN is not None and not secrets.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {Config.METRICS_TOKEN}".encode()
+    ):
+        return PlainTextResponse("Unauthorized", status_code=status.HTTP_401_UNAUTHORIZED)
+    job_counts = Counter(job.status for job in upload_job_manager.jobs.values())
+    for job_status in ("pending", "running", "finished", "failed"):
+        upload_jobs.set(job_counts[job_status], status=job_status)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def _get_idempotency_key(request: Request, request_data: dict) -> str | None:
+    return request.headers.get("Idempotency-Key") or request_data.get("idempotency_key")
 
 
 @app.post("/upload-works", response_model=ApiResponse)
 async def upload_works_endpoint(request: Request):
-    """data 是可以直接传递给 upload_works，符合 notion.create.pages 参数要求的上传数据"""
+    """data 是可以直接传递给 upload_works，符合 notion.create.pages 参数要求的上传数据。
+    可以通过 Idempotency-Key header 或者 idempotency_key 字段传入 idempotency key，重试时只上传之前失败或者没有上传的内容
+    """
     request_data = await request.json()
-    result = await upload_works(request_data["data"], request_data["access_token"])
+    result = await upload_works(
+        request_data["data"], request_data["access_token"], idempotency_key=_get_idempotency_key(request, request_data)
+    )
     # 只返回出错，插入失败的即可
     result = [r.data for r in result if isinstance(r, ErrorResult)]
-    return ApiResponse(success=len(result) == len(request_data["data"]), data=result, code=status.HTTP_200_OK)
+    return create_response(success=len(result) == len(request_data["data"]), data=result, code=status.HTTP_200_OK)
+
+
+@app.post("/upload-raw-works", response_model=ApiResponse)
+async def upload_raw_works_endpoint(request: UploadRawWorksRequest):
+    """与 /upload-works 不同，这里传入的是原始的 Work 和 database 与 Work 的对应关系，由后端转换为 notion 的上传格式。
+    返回的 data 中，failed 是上传出错的文献的下标，duplicates 是因为已经上传过而跳过的文献的下标及其 page id
+    设置 references_property 时会同时上传参考文献，failed、duplicates 只包括 works 本身
+    """
+    if request.references_property:
+        result = await upload_citation_graph(
+            works=request.works,
+            mapping=request.mapping,
+            database_id=request.database_id,
+            access_token=request.access_token,
+            references_property=request.references_property,
+            on_duplicate=request.on_duplicate,
+            page_body=request.page_body,
+        )
+    else:
+        result = await upload_raw_works(
+            works=request.works,
+            mapping=request.mapping,
+            database_id=request.database_id,
+            access_token=request.access_token,
+            on_duplicate=request.on_duplicate,
+            page_body=request.page_body,
+        )
+    if isinstance(result, ErrorResult):
+        return create_response(success=False, code=status.HTTP_400_BAD_REQUEST, message=result.message)
+    failed = [r.data for r in result if isinstance(r, ErrorResult)]
+    duplicates = {r.data: r.page_id for r in result if isinstance(r, DuplicateResult)}
+    return create_response(
+        success=len(failed) == 0, data={"failed": failed, "duplicates": duplicates}, code=status.HTTP_200_OK
+    )
+
+
+@app.post("/upload-jobs", response_model=ApiResponse)
+async def submit_upload_job_endpoint(request: Request):
+    """与 /upload-works 参数相同（包括 idempotency key），但是立即返回 job id，上传在后台进行，之后通过 /upload-jobs/{job_id} 查询进度"""
+    request_data = await request.json()
+    job = await upload_job_manager.submit(
+        request_data["data"], request_data["access_token"], idempotency_key=_get_idempotency_key(request, request_data)
+    )
+    if isinstance(job, ErrorResult):
+        return create_response(success=False, code=job.code, message=job.message)
+    return create_response(success=True, data=job.to_status(), code=status.HTTP_202_ACCEPTED)
+
+
+@app.get("/upload-jobs/{job_id}", response_model=ApiResponse)
+async def upload_job_status_endpoint(job_id: str):
+    job_status = await upload_job_manager.get_status(job_id)
+    if job_status is None:
+        return create_response(success=False, code=status.HTTP_404_NOT_FOUND, message="Upload job not found")
+    return create_response(success=True, data=job_status)
+
+
+_mapping_adapter = TypeAdapter(dict[str, PDToWorkMappingItem | None])
+
+
+def _save_upload_file(file: UploadFile) -> str | None:
+    """将上传的文件保存到临时文件中，返回临时文件的路径。超过 Config.IMPORT_MAX_FILE_SIZE 时返回 None"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".import") as f:
+        shutil.copyfileobj(file.file, f)
+        size = f.tell()
+    if size > Config.IMPORT_MAX_FILE_SIZE:
+        os.remove(f.name)
+        return None
+    return f.name
+
+
+@app.post("/import-works", response_model=ApiResponse)
+async def import_works_endpoint(
+    access_token: str = Form(...),
+    database_id: str = Form(...),
+    # 与 /upload-raw-works 的 mapping 相同，multipart 表单中只能以 json 字符串的形式传递
+    mapping: str = Form(...),
+    format: ImportFormat = Form(...),
+    on_duplicate: Literal["upload", "skip"] = Form("upload"),
+    # 与 /upload-raw-works 的 page_body 相同，可以传多次
+    page_body: list[PageBodyField] = Form([]),
+    file: UploadFile = File(...),
+):
+    """导入 BibTeX、RIS、CSL-JSON 文件。与 /upload-jobs 相同，立即返回 job id，之后通过 /upload-jobs/{job_id} 查询进度。
+    文件中无法解析的记录会作为失败项出现在 failures 中，code 为 parse_error
+    """
+    # 导入、arxiv 等不常用的功能在第一次请求时才导入，减少冷启动时间（见 benchmarks/startup.py）
+    from src.importers.pipeline import create_import_job
+
+    try:
+        parsed_mapping = _mapping_adapter.validate_json(mapping)
+    except ValidationError as e:
+        return create_response(success=False, code=status.HTTP_400_BAD_REQUEST, message=f"Invalid mapping: {e}")
+    # 请求结束后 UploadFile 会被关闭，因此需要先复制一份，后台任务从复制的文件中读取
+    file_path = await run_in_threadpool(_save_upload_file, file)
+    if file_path is None:
+        return create_response(
+            success=False,
+            code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            message=f"File is larger than {Config.IMPORT_MAX_FILE_SIZE} bytes",
+        )
+    job = await upload_job_manager.submit_job(
+        create_import_job(
+            file_path=file_path,
+            file_format=format,
+            mapping=parsed_mapping,
+            database_id=database_id,
+            access_token=access_token,
+            on_duplicate=on_duplicate,
+            page_body=page_body,
+        )
+    )
+    if isinstance(job, ErrorResult):
+        os.remove(file_path)
+        return create_response(success=False, code=job.code, message=job.message)
+    return create_response(success=True, data=job.to_status(), code=status.HTTP_202_ACCEPTED)
+
+
+@app.post("/resolve-dois", response_model=ApiResponse)
+async def resolve_dois_endpoint(request: ResolveDOIsRequest):
+    """根据 DOI 获取文献信息。返回的 data 与 dois 一一对应，无法获取的为 None"""
+    if len(request.dois) > Config.DOI_RESOLVER_MAX_BATCH:
+        return create_response(
+            success=False,
+            code=status.HTTP_400_BAD_REQUEST,
+            message=f"At most {Config.DOI_RESOLVER_MAX_BATCH} DOIs can be resolved at a time",
+        )
+    works = await resolve_dois(request.dois)
+    return create_response(success=all(work is not None for work in works), data=works)
+
+
+@app.post("/arxiv-works", response_model=ApiResponse)
+async def arxiv_works_endpoint(request: ArxivWorksRequest):
+    """根据 arxiv id 获取文献信息。返回的 data 与 ids 一一对应，无法获取的为 None"""
+    from src.scrapers.arxiv import fetch_arxiv_works
+
+    if len(request.ids) > Config.ARXIV_MAX_BATCH:
+        return create_response(
+            success=False,
+            code=status.HTTP_400_BAD_REQUEST,
+            message=f"At most {Config.ARXIV_MAX_BATCH} arXiv ids can be fetched at a time",
+        )
+    works = await fetch_arxiv_works(request.ids)
+    return create_response(success=all(work is not None for work in works), data=works)
 
 
 @app.post("/search-by-title", response_model=ApiResponse)
@@ -51,10 +268,38 @@ async def search_by_title_endpoint(request: SearchByTitleRequest):
             query=request.query, search_for=request.search_for, access_token=request.access_token
         )
         if isinstance(result, ErrorResult):
-            return ApiResponse(success=False, code=status.HTTP_404_NOT_FOUND, message="No results found")
-        return ApiResponse(success=True, data=result)
-    except APIResponseError as e:
-        return ApiResponse(success=False, code=status.HTTP_500_INTERNAL_SERVER_ERROR, message=str(e))
+            return create_response(success=False, code=status.HTTP_404_NOT_FOUND, message="No results found")
+        return create_response(success=True, data=result)
+    except NOTION_ERRORS as e:
+        error = to_error_result(e)
+        return create_response(success=False, code=error.code, message=error.message)
+
+
+@app.post("/database-mirror/sync", response_model=ApiResponse)
+async def sync_database_mirror_endpoint(request: MirrorSyncRequest):
+    """将 database 同步到本地，之后通过 /database-mirror/search 搜索。第一次同步获取所有 page，之后只获取有修改的。
+    database 较大时第一次同步需要较长时间（每次请求 notion 最多获取 100 个 page）
+    """
+    result = await sync_database(
+        database_id=request.database_id, access_token=request.access_token, mapping=request.mapping, full=request.full
+    )
+    if isinstance(result, ErrorResult):
+        return create_response(success=False, code=result.code, message=result.message)
+    return create_response(success=True, data=result)
+
+
+@app.post("/database-mirror/search", response_model=ApiResponse)
+async def search_database_mirror_endpoint(request: MirrorSearchRequest):
+    """在 database 的本地副本中按标题、作者、摘要、DOI 搜索，不请求 notion。
+    返回的 synced_at 是上一次同步的时间，前端可以据此决定是否需要先同步
+    """
+    result = await search_mirror(
+        database_id=request.database_id, query=request.query, access_token=request.access_token, limit=request.limit
+    )
+    if isinstance(result, ErrorResult):
+        return create_response(success=False, code=result.code, message=result.message)
+    hits, synced_at = result
+    return create_response(success=True, data={"results": hits, "synced_at": synced_at})
 
 
 @app.post("/page-database/", response_model=ApiResponse)
@@ -63,8 +308,10 @@ async def page_database_endpoint(request: Request):
     pd_id = request_data["PDId"]
     pd_type = request_data["PDType"]
     access_token = request_data["access_token"]
-    result = await get_page_database_by_id(pd_id=pd_id, pd_type=pd_type, access_token=access_token)
-    return ApiResponse(success=True, data=result)
+    # 前端需要确认 schema 是否有变化时，可以传入 refresh 以跳过缓存
+    refresh = request_data.get("refresh", False)
+    result = await get_page_database_by_id(pd_id=pd_id, pd_type=pd_type, access_token=access_token, refresh=refresh)
+    return create_response(success=True, data=result)
 
 
 # 如果使用 GET 请求，access token 就要放在 url 中，不够安全，因此使用 POST
@@ -74,8 +321,8 @@ async def exchange_code_for_token_endpoint(
 ):
     token_result = await exchange_code_for_token(code=code)
     if isinstance(token_result, ErrorResult):
-        return ApiResponse(success=False, code=token_result.code, message=token_result.message)
+        return create_response(success=False, code=token_result.code, message=token_result.message)
     background_tasks.add_task(
         get_user_info, user_id=token_result.owner.user.id, access_token=token_result.access_token
     )
-    return ApiResponse(data=token_result, success=True)
+    return create_response(data=token_result, success=True)
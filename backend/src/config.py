@@ -12,5 +12,92 @@ class Config:
     NOTION_CLIENT_ID = os.environ["NOTION_CLIENT_ID"]
     NOTION_SECRET = os.environ["NOTION_SECRET"]
     NOTION_TEST_DATABASE = os.environ.get("NOTION_TEST_DATABASE")
+    # notion api 的地址，压测时可以改为本地的模拟服务（见 benchmarks/notion_server.py）
+    NOTION_API_URL = os.environ.get("NOTION_API_URL", "https://api.notion.com")
     # postgresql 的链接路径可能是 postgres:// 开头，但是 sqlalchemy 要求是 postgresql:// 开头，替换一下即可
     POSTGRES_URL = os.environ.get("POSTGRES_URL").replace("postgres://", "postgresql://")
+    # 限速的令牌桶、schema 和搜索结果缓存、后台上传任务的状态保存在哪里，见 shared_state.py。
+    # memory 只在当前进程内有效；database 保存在数据库中，运行多个 worker 时使用
+    SHARED_STATE_BACKEND = os.environ.get("SHARED_STATE_BACKEND", "memory")
+    # 同一个 access token 同时进行的 pages.create 请求数上限
+    UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", "3"))
+    # notion api 限速：每个 access token 平均每秒请求数、允许的突发请求数、收到 429 后速率最低降到多少
+    NOTION_RATE_LIMIT = float(os.environ.get("NOTION_RATE_LIMIT", "3"))
+    NOTION_RATE_LIMIT_BURST = float(os.environ.get("NOTION_RATE_LIMIT_BURST", "10"))
+    NOTION_RATE_LIMIT_MIN = float(os.environ.get("NOTION_RATE_LIMIT_MIN", "0.5"))
+    # 收到 429 后，每次请求成功时速率回升 NOTION_RATE_LIMIT 的多少比例
+    NOTION_RATE_LIMIT_RECOVERY = float(os.environ.get("NOTION_RATE_LIMIT_RECOVERY", "0.05"))
+    # 429、5xx、超时等暂时性错误（见 notion_api/retry.py）最多重试多少次，以及从第一次请求开始多少秒后不再重试
+    NOTION_MAX_RETRIES = int(os.environ.get("NOTION_MAX_RETRIES", "4"))
+    NOTION_RETRY_DEADLINE = float(os.environ.get("NOTION_RETRY_DEADLINE", "120"))
+    # 重试间隔的指数退避：第 n 次重试前随机等待 0 到 min(CAP, BASE * 2^n) 秒
+    NOTION_RETRY_BACKOFF_BASE = float(os.environ.get("NOTION_RETRY_BACKOFF_BASE", "0.5"))
+    NOTION_RETRY_BACKOFF_CAP = float(os.environ.get("NOTION_RETRY_BACKOFF_CAP", "8"))
+    # 429 响应中没有 Retry-After 时，默认等待的秒数
+    NOTION_DEFAULT_RETRY_AFTER = float(os.environ.get("NOTION_DEFAULT_RETRY_AFTER", "1"))
+    # 上传前是否先在本地根据 database 的 schema 检查上传内容，不符合的直接返回错误，不再请求 notion
+    NOTION_PREFLIGHT_VALIDATION = os.environ.get("NOTION_PREFLIGHT_VALIDATION", "1") == "1"
+    # 后台上传任务：同时执行的任务数、排队中的任务数上限、已完成任务的结果保留多少秒
+    UPLOAD_JOB_WORKERS = int(os.environ.get("UPLOAD_JOB_WORKERS", "4"))
+    UPLOAD_JOB_QUEUE_SIZE = int(os.environ.get("UPLOAD_JOB_QUEUE_SIZE", "100"))
+    UPLOAD_JOB_RESULT_TTL = int(os.environ.get("UPLOAD_JOB_RESULT_TTL", "3600"))
+    # SHARED_STATE_BACKEND 为 database 时，执行中的任务每隔多少秒将进度写入数据库，供其他 worker 查询
+    UPLOAD_JOB_STATUS_INTERVAL = float(os.environ.get("UPLOAD_JOB_STATUS_INTERVAL", "1"))
+    # 带有 idempotency key 的上传请求，上传结果保留多少秒。期间使用同一个 key 重试，已经上传成功的内容不会重复创建 page
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))
+    # 最多缓存多少个编译后的 database-work mapping
+    MAPPING_CACHE_SIZE = int(os.environ.get("MAPPING_CACHE_SIZE", "256"))
+    # page/database schema 缓存的有效期（秒）和最多缓存的数量
+    SCHEMA_CACHE_TTL = int(os.environ.get("SCHEMA_CACHE_TTL", "300"))
+    SCHEMA_CACHE_SIZE = int(os.environ.get("SCHEMA_CACHE_SIZE", "5000"))
+    # 搜索结果缓存的有效期（秒）和最多缓存的数量
+    SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", "30"))
+    SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "1000"))
+    # 生产环境数据库连接池的大小、超出连接池大小后最多再创建的连接数、获取连接的超时时间（秒）、连接的回收时间（秒）
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    # 启动时数据库的版本不是最新的迁移（alembic head）时，是否自动执行迁移。生产环境默认不执行，需要先手动迁移
+    DB_AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "0" if IS_PRODUCTION else "1") == "1"
+    # access token、user 等数据先缓存在内存中，达到多少行或者经过多少秒后批量写入数据库
+    DB_WRITE_BATCH_SIZE = int(os.environ.get("DB_WRITE_BATCH_SIZE", "50"))
+    DB_WRITE_FLUSH_INTERVAL = float(os.environ.get("DB_WRITE_FLUSH_INTERVAL", "2"))
+    # 对外 http 请求共用的连接池：最大连接数、最多保持的 keep-alive 连接数、keep-alive 连接的过期时间（秒）
+    HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+    # 请求的超时时间和建立连接的超时时间（秒）
+    HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "60"))
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "10"))
+    # 是否使用 http2，需要安装 httpx[http2]
+    HTTP2 = os.environ.get("HTTP2") == "1"
+    # crossref api 的地址，测试时可以改为本地的模拟服务。设置 CROSSREF_MAILTO 后会进入 crossref 的 polite pool，速度更快
+    CROSSREF_API_URL = os.environ.get("CROSSREF_API_URL", "https://api.crossref.org")
+    CROSSREF_MAILTO = os.environ.get("CROSSREF_MAILTO")
+    # 同时向 crossref 发送的请求数、一次最多解析多少个 DOI
+    DOI_RESOLVER_CONCURRENCY = int(os.environ.get("DOI_RESOLVER_CONCURRENCY", "5"))
+    DOI_RESOLVER_MAX_BATCH = int(os.environ.get("DOI_RESOLVER_MAX_BATCH", "200"))
+    # DOI 信息缓存的有效期（秒）。crossref 中不存在的 DOI 缓存时间较短
+    DOI_CACHE_TTL = int(os.environ.get("DOI_CACHE_TTL", str(30 * 24 * 3600)))
+    DOI_NOT_FOUND_CACHE_TTL = int(os.environ.get("DOI_NOT_FOUND_CACHE_TTL", str(24 * 3600)))
+    # arxiv api 的地址，测试时可以改为本地的模拟服务
+    ARXIV_API_URL = os.environ.get("ARXIV_API_URL", "https://export.arxiv.org")
+    # 每个请求最多包含多少个 id，以及连续两次请求的最小间隔（秒），arxiv 要求不小于 3 秒
+    ARXIV_CHUNK_SIZE = int(os.environ.get("ARXIV_CHUNK_SIZE", "100"))
+    ARXIV_REQUEST_INTERVAL = float(os.environ.get("ARXIV_REQUEST_INTERVAL", "3"))
+    # 一次最多获取多少个 id。超过 ARXIV_CHUNK_SIZE 时分多次请求，每次间隔 ARXIV_REQUEST_INTERVAL，默认最多等待约 15 秒
+    ARXIV_MAX_BATCH = int(os.environ.get("ARXIV_MAX_BATCH", "500"))
+    # 论文信息缓存的有效期（秒）、最多缓存的数量，以及不带版本号的 id 对应的最新版本号的缓存有效期（秒）
+    ARXIV_CACHE_TTL = int(os.environ.get("ARXIV_CACHE_TTL", str(7 * 24 * 3600)))
+    ARXIV_CACHE_SIZE = int(os.environ.get("ARXIV_CACHE_SIZE", "10000"))
+    ARXIV_LATEST_VERSION_TTL = int(os.environ.get("ARXIV_LATEST_VERSION_TTL", str(24 * 3600)))
+    # 导入 BibTeX 等文件时，每批上传多少条、最多有多少批在排队等待上传、同时上传的批数，以及文件大小上限（字节）
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "50"))
+    IMPORT_QUEUE_SIZE = int(os.environ.get("IMPORT_QUEUE_SIZE", "4"))
+    IMPORT_UPLOADERS = int(os.environ.get("IMPORT_UPLOADERS", "2"))
+    IMPORT_MAX_FILE_SIZE = int(os.environ.get("IMPORT_MAX_FILE_SIZE", str(50 * 1024 * 1024)))
+    # /metrics 的访问控制。设置了 METRICS_TOKEN 时，请求需要带上 Authorization: Bearer <METRICS_TOKEN>；
+    # 没有设置时，生产环境默认不开放 /metrics（返回 404），本地默认开放
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0" if IS_PRODUCTION else "1") == "1" or bool(METRICS_TOKEN)
@@ -1,11 +1,18 @@
+"""
+在 src/database 目录中执行 alembic upgrade head 等命令时，使用与后端相同的数据库（生产环境为 POSTGRES_URL），
+但是用同步的驱动（psycopg2、sqlite3）。
+后端启动时由 db_client.check_migrations 执行迁移，此时通过 config.attributes["connection"] 传入连接
+"""
 from logging.config import fileConfig
+from pathlib import Path
 
-from sqlalchemy import engine_from_config
+from sqlalchemy import create_engine
 from sqlalchemy import pool
 
 from alembic import context
 
-from database.db_models import Base
+from src.config import Config
+from src.database.db_models import Base
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -13,7 +20,8 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# 由后端调用时不修改后端的 logging 设置
+if config.config_file_name is not None and "connection" not in config.attributes:
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -52,6 +60,19 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def database_url() -> str:
+    """与 db_client._create_engine 使用同一个数据库"""
+    if Config.IS_PRODUCTION:
+        return Config.POSTGRES_URL
+    return f"sqlite:///{Path(__file__).resolve().parent.parent / 'database.db'}"
+
+
+def run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
@@ -59,17 +80,13 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+    connectable = create_engine(database_url(), poolclass=pool.NullPool)
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-
-        with context.begin_transaction():
-            context.run_migrations()
+        run_migrations(connection)
 
 
 if context.is_offline_mode():
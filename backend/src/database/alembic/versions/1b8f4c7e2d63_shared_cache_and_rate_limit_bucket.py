@@ -0,0 +1,48 @@
+"""shared_cache and rate_limit_bucket
+
+Revision ID: 1b8f4c7e2d63
+Revises: e7d30a6b95c2
+Create Date: 2024-06-10 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1b8f4c7e2d63"
+down_revision: Union[str, None] = "e7d30a6b95c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "shared_cache",
+        sa.Column("namespace", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("namespace", "key"),
+    )
+    op.create_index(op.f("ix_shared_cache_expires_at"), "shared_cache", ["expires_at"], unique=False)
+    op.create_table(
+        "rate_limit_bucket",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("rate", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.Column("blocked_until", sa.Float(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(op.f("ix_rate_limit_bucket_updated_at"), "rate_limit_bucket", ["updated_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_rate_limit_bucket_updated_at"), table_name="rate_limit_bucket")
+    op.drop_table("rate_limit_bucket")
+    op.drop_index(op.f("ix_shared_cache_expires_at"), table_name="shared_cache")
+    op.drop_table("shared_cache")
@@ -0,0 +1,50 @@
+"""access_token and user
+
+Revision ID: 3f1c2a9b7d10
+Revises: 
+Create Date: 2024-05-01 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c2a9b7d10"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "access_token",
+        sa.Column("access_token", sa.String(), nullable=False),
+        sa.Column("bot_id", sa.String(), nullable=False),
+        sa.Column("duplicated_template_id", sa.String(), nullable=True),
+        sa.Column("owner_user_id", sa.String(), nullable=True),
+        sa.Column("token_type", sa.String(), nullable=False),
+        sa.Column("workspace_icon", sa.String(), nullable=True),
+        sa.Column("workspace_id", sa.String(), nullable=False),
+        sa.Column("workspace_name", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("bot_id"),
+    )
+    op.create_index(op.f("ix_access_token_owner_user_id"), "access_token", ["owner_user_id"], unique=False)
+    op.create_table(
+        "user",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("avatar_url", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user")
+    op.drop_index(op.f("ix_access_token_owner_user_id"), table_name="access_token")
+    op.drop_table("access_token")
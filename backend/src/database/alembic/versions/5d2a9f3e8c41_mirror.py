@@ -0,0 +1,57 @@
+"""mirror_page, mirror_term and mirror_sync_state
+
+Revision ID: 5d2a9f3e8c41
+Revises: 1b8f4c7e2d63
+Create Date: 2024-06-24 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d2a9f3e8c41"
+down_revision: Union[str, None] = "1b8f4c7e2d63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mirror_page",
+        sa.Column("database_id", sa.String(), nullable=False),
+        sa.Column("page_id", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("authors", sa.String(), nullable=False),
+        sa.Column("abstract", sa.String(), nullable=False),
+        sa.Column("doi", sa.String(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("last_edited_time", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("database_id", "page_id"),
+    )
+    op.create_table(
+        "mirror_term",
+        sa.Column("database_id", sa.String(), nullable=False),
+        sa.Column("term", sa.String(), nullable=False),
+        sa.Column("page_id", sa.String(), nullable=False),
+        sa.Column("weight", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("database_id", "term", "page_id"),
+    )
+    op.create_index(op.f("ix_mirror_term_page_id"), "mirror_term", ["page_id"], unique=False)
+    op.create_table(
+        "mirror_sync_state",
+        sa.Column("database_id", sa.String(), nullable=False),
+        sa.Column("cursor", sa.String(), nullable=True),
+        sa.Column("columns", sa.String(), nullable=False),
+        sa.Column("synced_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("database_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("mirror_sync_state")
+    op.drop_index(op.f("ix_mirror_term_page_id"), table_name="mirror_term")
+    op.drop_table("mirror_term")
+    op.drop_table("mirror_page")
@@ -0,0 +1,33 @@
+"""upload_ledger
+
+Revision ID: 8a4e6d2c1b37
+Revises: 3f1c2a9b7d10
+Create Date: 2024-05-08 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8a4e6d2c1b37"
+down_revision: Union[str, None] = "3f1c2a9b7d10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_ledger",
+        sa.Column("database_id", sa.String(), nullable=False),
+        sa.Column("work_identifier", sa.String(), nullable=False),
+        sa.Column("page_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=False),
+        sa.PrimaryKeyConstraint("database_id", "work_identifier"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("upload_ledger")
@@ -0,0 +1,34 @@
+"""doi_metadata
+
+Revision ID: c52b9e0f4a18
+Revises: 8a4e6d2c1b37
+Create Date: 2024-05-10 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c52b9e0f4a18"
+down_revision: Union[str, None] = "8a4e6d2c1b37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "doi_metadata",
+        sa.Column("doi", sa.String(), nullable=False),
+        sa.Column("work", sa.String(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("doi"),
+    )
+    op.create_index(op.f("ix_doi_metadata_expires_at"), "doi_metadata", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_doi_metadata_expires_at"), table_name="doi_metadata")
+    op.drop_table("doi_metadata")
@@ -0,0 +1,36 @@
+"""upload_result
+
+Revision ID: e7d30a6b95c2
+Revises: c52b9e0f4a18
+Create Date: 2024-05-20 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7d30a6b95c2"
+down_revision: Union[str, None] = "c52b9e0f4a18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_result",
+        sa.Column("idempotency_key", sa.String(), nullable=False),
+        sa.Column("item_index", sa.Integer(), nullable=False),
+        sa.Column("item_hash", sa.String(), nullable=False),
+        sa.Column("page_id", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("idempotency_key", "item_index"),
+    )
+    op.create_index(op.f("ix_upload_result_expires_at"), "upload_result", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_upload_result_expires_at"), table_name="upload_result")
+    op.drop_table("upload_result")
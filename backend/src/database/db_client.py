@@ -1,55 +1,631 @@
+import ast
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any, AsyncContextManager, Callable
 
-from sqlalchemy import create_engine
-from sqlalchemy.dialects.sqlite import insert
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select, delete, update, inspect, func, and_, distinct, literal, union_all, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 
 from src.config import Config
-from src.database.db_models import AccessToken, User, Base
+from src.database.db_models import (
+    AccessToken,
+    User,
+    Base,
+    UploadLedger,
+    DOIMetadata,
+    UploadResult,
+    SharedCacheEntry,
+    RateLimitBucket,
+    MirrorPage,
+    MirrorTerm,
+    MirrorSyncState,
+)
+from src.database.write_buffer import WriteBehindBuffer
+from src.metrics import db_write_duration, db_rows_written
 from src.models import NAccessToken, NUser
 
-if Config.IS_PRODUCTION:
-    engine = create_engine(Config.POSTGRES_URL)
-else:
-    engine = create_engine(f"sqlite:///{Path(__file__).resolve().parent}/database.db")
-# 使用 with Session.begin()，会自动在 with 内部代码到结尾时自动提交事务，出错时也会自动 rollback
-Session = sessionmaker(engine)
-Base.metadata.create_all(engine, checkfirst=True)
+logger = logging.getLogger(__name__)
 
 
-def save_access_token(access_token_model: NAccessToken) -> bool:
+def _create_engine() -> tuple[AsyncEngine, Callable]:
+    """使用异步的数据库驱动，避免写数据库时阻塞 event loop：生产环境用 asyncpg，本地用 aiosqlite。
+    只导入用到的那一种，返回 engine 和对应方言的 insert（用于 ON CONFLICT）
+    """
+    if Config.IS_PRODUCTION:
+        from sqlalchemy.dialects.postgresql import insert
+
+        db_url = make_url(Config.POSTGRES_URL).set(drivername="postgresql+asyncpg")
+        # asyncpg 不支持 sslmode 参数，需要改为通过 connect_args 中的 ssl 传递
+        connect_args = {}
+        if "sslmode" in db_url.query:
+            connect_args["ssl"] = db_url.query["sslmode"]
+            db_url = db_url.difference_update_query(["sslmode"])
+        engine = create_async_engine(
+            db_url,
+            connect_args=connect_args,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(__file__).resolve().parent}/database.db")
+    return engine, insert
+
+
+class LazySessionMaker:
+    """用法与 async_sessionmaker 相同（Session()、Session.begin()），但 engine 在第一次使用时才创建，
+    导入本模块时不会加载数据库驱动。FastAPI 启动时 init_db 会先使用一次
+    """
+
+    def __init__(self):
+        self.engine: AsyncEngine | None = None
+        self.insert: Callable | None = None
+        self._session_maker: async_sessionmaker | None = None
+
+    def connect(self) -> async_sessionmaker:
+        if self._session_maker is None:
+            self.engine, self.insert = _create_engine()
+            self._session_maker = async_sessionmaker(self.engine)
+        return self._session_maker
+
+    def __call__(self) -> AsyncSession:
+        return self.connect()()
+
+    def begin(self) -> AsyncContextManager[AsyncSession]:
+        return self.connect().begin()
+
+    async def dispose(self) -> None:
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine, self.insert, self._session_maker = None, None, None
+
+
+# 使用 async with Session.begin()，会自动在 with 内部代码到结尾时自动提交事务，出错时也会自动 rollback
+Session = LazySessionMaker()
+
+
+def insert(table: type[Base]) -> Any:
+    Session.connect()
+    return Session.insert(table)
+
+
+write_buffer = WriteBehindBuffer(
+    session_maker=Session,
+    insert=insert,
+    batch_size=Config.DB_WRITE_BATCH_SIZE,
+    flush_interval=Config.DB_WRITE_FLUSH_INTERVAL,
+)
+
+
+async def init_db() -> None:
+    """在 FastAPI 启动时调用，检查数据库是否已经迁移到最新版本，并启动 write_buffer"""
+    await check_migrations()
+    await delete_expired_upload_results()
+    await delete_expired_shared_state()
+    await write_buffer.start()
+
+
+# 迁移脚本中的 revision = "..."、down_revision = "..."（alembic 生成的格式）
+_REVISION_LINE = re.compile(r"^(revision|down_revision)\b[^=]*=\s*(.+)$", re.MULTILINE)
+
+
+def _alembic_config() -> Any:
+    from alembic.config import Config as AlembicConfig
+
+    return AlembicConfig(str(Path(__file__).resolve().parent / "alembic.ini"))
+
+
+def _script_heads() -> set[str]:
+    """迁移脚本的最新版本，即没有被其他脚本作为 down_revision 的 revision。
+    直接读取脚本开头的 revision、down_revision，不导入 alembic（导入需要约 0.1 秒，只在需要迁移时导入）
+    """
+    revisions, parents = set(), set()
+    for path in (Path(__file__).resolve().parent / "alembic" / "versions").glob("*.py"):
+        values = dict(_REVISION_LINE.findall(path.read_text(encoding="utf-8")))
+        revisions.add(ast.literal_eval(values["revision"]))
+        down_revision = ast.literal_eval(values["down_revision"])
+        # 合并分支的脚本 down_revision 是 tuple
+        parents.update(down_revision if isinstance(down_revision, tuple) else filter(None, [down_revision]))
+    return revisions - parents
+
+
+def _current_revisions(sync_conn: Any) -> set[str]:
+    if not inspect(sync_conn).has_table("alembic_version"):
+        return set()
+    return set(sync_conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+
+
+def _migrate(sync_conn: Any) -> None:
+    """在 alembic 出现之前由 create_all 创建的数据库（有表但没有 alembic_version）先补全缺少的表，再标记为最新版本"""
+    from alembic import command
+
+    alembic_config = _alembic_config()
+    alembic_config.attributes["connection"] = sync_conn
+    tables = set(inspect(sync_conn).get_table_names())
+    if not _current_revisions(sync_conn) and tables & set(Base.metadata.tables):
+        Base.metadata.create_all(sync_conn, checkfirst=True)
+        command.stamp(alembic_config, "head")
+    else:
+        command.upgrade(alembic_config, "head")
+
+
+async def check_migrations() -> None:
+    """比较数据库的版本（alembic_version 表）与迁移脚本的最新版本（src/database/alembic/versions）。
+    不是最新版本时，Config.DB_AUTO_MIGRATE 为真则执行迁移（本地默认开启），否则报错，需要先手动迁移
+    """
+    head = _script_heads()
+    Session.connect()
+    async with Session.engine.connect() as conn:
+        current = await conn.run_sync(_current_revisions)
+    if current == head:
+        return
+    if not Config.DB_AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database is at revision {', '.join(sorted(current)) or 'none'}, expected {', '.join(sorted(head))}. "
+            "Run `alembic upgrade head` in src/database first, or start once with DB_AUTO_MIGRATE=1"
+        )
+    try:
+        async with Session.engine.begin() as conn:
+            await conn.run_sync(_migrate)
+    except Exception:
+        # 多个 worker 同时启动时，可能已经被其他 worker 迁移
+        async with Session.engine.connect() as conn:
+            if await conn.run_sync(_current_revisions) != head:
+                raise
+
+
+async def close_db() -> None:
+    """在 FastAPI 关闭时调用，写入 write_buffer 中剩余的数据，并关闭连接池"""
+    await write_buffer.stop()
+    await Session.dispose()
+
+
+async def save_access_token(access_token_model: NAccessToken) -> bool:
+    """不会立即写入数据库，而是先放入 write_buffer，之后批量写入。返回值表示是否成功放入 write_buffer"""
     try:
         owner_user_id = access_token_model.owner.user.id
-        with Session.begin() as session:
-            insert_statement = (
-                insert(AccessToken)
-                .values(
-                    access_token=access_token_model.access_token,
-                    bot_id=access_token_model.bot_id,
-                    owner_user_id=owner_user_id,
-                    duplicated_template_id=access_token_model.duplicated_template_id,
-                    token_type=access_token_model.token_type,
-                    workspace_icon=access_token_model.workspace_icon,
-                    workspace_id=access_token_model.workspace_id,
-                    workspace_name=access_token_model.workspace_name,
-                )
-                .on_conflict_do_nothing(index_elements=["bot_id"])  # 已经存在则跳过
-            )
-            session.execute(insert_statement)
-        return True
-    except Exception as e:
+        write_buffer.add(
+            AccessToken,
+            dict(
+                access_token=access_token_model.access_token,
+                bot_id=access_token_model.bot_id,
+                owner_user_id=owner_user_id,
+                duplicated_template_id=access_token_model.duplicated_template_id,
+                token_type=access_token_model.token_type,
+                workspace_icon=access_token_model.workspace_icon,
+                workspace_id=access_token_model.workspace_id,
+                workspace_name=access_token_model.workspace_name,
+            ),
+            conflict_column="bot_id",  # 已经存在则跳过
+        )
+        return True
+    except Exception:
+        logger.exception("Failed to queue access token")
         return False
 
 
-def save_user(user: NUser) -> bool:
+async def save_user(user: NUser) -> bool:
+    """与 save_access_token 相同，先放入 write_buffer，之后批量写入"""
     try:
-        with Session.begin() as session:
-            insert_stmt = insert(User).values(
-                id=user.id, type=user.type.value, email=user.person.email, name=user.name, avatar_url=user.avatar_url
+        write_buffer.add(
+            User,
+            dict(id=user.id, type=user.type.value, email=user.person.email, name=user.name, avatar_url=user.avatar_url),
+            conflict_column="id",
+        )
+        return True
+    except Exception:
+        logger.exception("Failed to queue user")
+        return False
+
+
+# 每条 sql 中 IN 的参数数量上限，避免超过 sqlite 的参数数量限制
+_MAX_SQL_PARAMS = 500
+
+
+async def get_uploaded_pages(database_id: str, work_identifiers: list[str]) -> dict[str, str]:
+    """返回已经上传到 database_id 中的文献，key 是 work_identifier，value 是 page id"""
+    uploaded = {}
+    try:
+        async with Session() as session:
+            for i in range(0, len(work_identifiers), _MAX_SQL_PARAMS):
+                rows = await session.execute(
+                    select(UploadLedger.work_identifier, UploadLedger.page_id).where(
+                        UploadLedger.database_id == database_id,
+                        UploadLedger.work_identifier.in_(work_identifiers[i : i + _MAX_SQL_PARAMS]),
+                    )
+                )
+                uploaded.update(dict(rows.all()))
+    except Exception:
+        logger.exception("Failed to read the upload ledger")
+    return uploaded
+
+
+async def save_uploaded_pages(database_id: str, pages: dict[str, str]) -> bool:
+    """pages 的 key 是 work_identifier，value 是 page id。所有行在一个事务中一次写入"""
+    if not pages:
+        return True
+    try:
+        db_rows_written.inc(len(pages), operation="upload_ledger")
+        # 先记为 error，写入成功后再改为 ok
+        with db_write_duration.time(operation="upload_ledger", status="error") as labels:
+            async with Session.begin() as session:
+                insert_stmt = insert(UploadLedger).values(
+                    [
+                        dict(database_id=database_id, work_identifier=work_identifier, page_id=page_id)
+                        for work_identifier, page_id in pages.items()
+                    ]
+                )
+                insert_stmt = insert_stmt.on_conflict_do_nothing(index_elements=["database_id", "work_identifier"])
+                await session.execute(insert_stmt)
+            labels["status"] = "ok"
+        return True
+    except Exception:
+        logger.exception("Failed to write the upload ledger")
+        return False
+
+
+def _utc_now() -> datetime:
+    """数据库中统一保存不带时区的 UTC 时间"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def get_doi_metadata(dois: list[str]) -> dict[str, str | None]:
+    """返回未过期的缓存，key 是 doi，value 是 Work 的 json 字符串，为 None 表示 crossref 中没有该 DOI"""
+    cached = {}
+    try:
+        async with Session() as session:
+            for i in range(0, len(dois), _MAX_SQL_PARAMS):
+                rows = await session.execute(
+                    select(DOIMetadata.doi, DOIMetadata.work).where(
+                        DOIMetadata.doi.in_(dois[i : i + _MAX_SQL_PARAMS]), DOIMetadata.expires_at > _utc_now()
+                    )
+                )
+                cached.update(dict(rows.all()))
+    except Exception:
+        logger.exception("Failed to read cached DOI metadata")
+    return cached
+
+
+async def save_doi_metadata(works: dict[str, str | None], ttl: float) -> bool:
+    """works 的格式与 get_doi_metadata 的返回值相同，ttl 是缓存有效期（秒）。已存在的 doi 会被覆盖"""
+    if not works:
+        return True
+    expires_at = _utc_now() + timedelta(seconds=ttl)
+    try:
+        db_rows_written.inc(len(works), operation="doi_metadata")
+        with db_write_duration.time(operation="doi_metadata", status="error") as labels:
+            async with Session.begin() as session:
+                insert_stmt = insert(DOIMetadata).values(
+                    [dict(doi=doi, work=work, expires_at=expires_at) for doi, work in works.items()]
+                )
+                insert_stmt = insert_stmt.on_conflict_do_update(
+                    index_elements=["doi"],
+                    set_=dict(work=insert_stmt.excluded.work, expires_at=insert_stmt.excluded.expires_at),
+                )
+                await session.execute(insert_stmt)
+            labels["status"] = "ok"
+        return True
+    except Exception:
+        logger.exception("Failed to write DOI metadata")
+        return False
+
+
+async def get_upload_results(idempotency_key: str) -> dict[int, tuple[str, str]]:
+    """返回该 key 下未过期的上传结果，key 是上传内容的下标，value 是 (上传内容的 hash, page id)"""
+    try:
+        async with Session() as session:
+            rows = await session.execute(
+                select(UploadResult.item_index, UploadResult.item_hash, UploadResult.page_id).where(
+                    UploadResult.idempotency_key == idempotency_key, UploadResult.expires_at > _utc_now()
+                )
+            )
+            return {item_index: (item_hash, page_id) for item_index, item_hash, page_id in rows.all()}
+    except Exception:
+        logger.exception("Failed to read upload results")
+        return {}
+
+
+async def save_upload_results(idempotency_key: str, results: dict[int, tuple[str, str]], ttl: float) -> bool:
+    """results 的格式与 get_upload_results 的返回值相同。已存在的下标会被覆盖，并重新计算过期时间"""
+    if not results:
+        return True
+    expires_at = _utc_now() + timedelta(seconds=ttl)
+    try:
+        db_rows_written.inc(len(results), operation="upload_result")
+        with db_write_duration.time(operation="upload_result", status="error") as labels:
+            async with Session.begin() as session:
+                insert_stmt = insert(UploadResult).values(
+                    [
+                        dict(
+                            idempotency_key=idempotency_key,
+                            item_index=item_index,
+                            item_hash=item_hash,
+                            page_id=page_id,
+                            expires_at=expires_at,
+                        )
+                        for item_index, (item_hash, page_id) in results.items()
+                    ]
+                )
+                insert_stmt = insert_stmt.on_conflict_do_update(
+                    index_elements=["idempotency_key", "item_index"],
+                    set_=dict(
+                        item_hash=insert_stmt.excluded.item_hash,
+                        page_id=insert_stmt.excluded.page_id,
+                        expires_at=insert_stmt.excluded.expires_at,
+                    ),
+                )
+                await session.execute(insert_stmt)
+            labels["status"] = "ok"
+        return True
+    except Exception:
+        logger.exception("Failed to write upload results")
+        return False
+
+
+async def delete_expired_upload_results() -> None:
+    try:
+        async with Session.begin() as session:
+            await session.execute(delete(UploadResult).where(UploadResult.expires_at <= _utc_now()))
+    except Exception:
+        logger.exception("Failed to delete expired upload results")
+
+
+async def get_shared_cache(namespace: str, key: str) -> str | None:
+    """返回未过期的缓存内容（json 字符串）"""
+    try:
+        async with Session() as session:
+            return await session.scalar(
+                select(SharedCacheEntry.value).where(
+                    SharedCacheEntry.namespace == namespace,
+                    SharedCacheEntry.key == key,
+                    SharedCacheEntry.expires_at > _utc_now(),
+                )
+            )
+    except Exception:
+        logger.exception("Failed to read shared cache")
+        return None
+
+
+async def get_shared_cache_many(namespace: str, keys: list[str]) -> dict[str, str]:
+    """与 get_shared_cache 相同，但是多个 key 只查询一次（key 很多时每 _MAX_SQL_PARAMS 个一次），只返回存在的"""
+    values = {}
+    try:
+        async with Session() as session:
+            for i in range(0, len(keys), _MAX_SQL_PARAMS):
+                rows = await session.execute(
+                    select(SharedCacheEntry.key, SharedCacheEntry.value).where(
+                        SharedCacheEntry.namespace == namespace,
+                        SharedCacheEntry.key.in_(keys[i : i + _MAX_SQL_PARAMS]),
+                        SharedCacheEntry.expires_at > _utc_now(),
+                    )
+                )
+                values.update(dict(rows.all()))
+    except Exception:
+        logger.exception("Failed to read shared cache")
+    return values
+
+
+async def set_shared_cache(namespace: str, key: str, value: str, ttl: float) -> bool:
+    """已存在的 key 会被覆盖，并重新计算过期时间"""
+    try:
+        db_rows_written.inc(operation="shared_cache")
+        with db_write_duration.time(operation="shared_cache", status="error") as labels:
+            async with Session.begin() as session:
+                insert_stmt = insert(SharedCacheEntry).values(
+                    namespace=namespace, key=key, value=value, expires_at=_utc_now() + timedelta(seconds=ttl)
+                )
+                insert_stmt = insert_stmt.on_conflict_do_update(
+                    index_elements=["namespace", "key"],
+                    set_=dict(value=insert_stmt.excluded.value, expires_at=insert_stmt.excluded.expires_at),
+                )
+                await session.execute(insert_stmt)
+            labels["status"] = "ok"
+        return True
+    except Exception:
+        logger.exception("Failed to write shared cache")
+        return False
+
+
+async def delete_shared_cache(namespace: str, key: str) -> bool:
+    try:
+        async with Session.begin() as session:
+            await session.execute(
+                delete(SharedCacheEntry).where(SharedCacheEntry.namespace == namespace, SharedCacheEntry.key == key)
             )
-            insert_stmt = insert_stmt.on_conflict_do_nothing(index_elements=["id"])
-            session.execute(insert_stmt)
         return True
-    except Exception as e:
-        print(e)
+    except Exception:
+        logger.exception("Failed to delete shared cache")
         return False
+
+
+async def get_rate_limit_bucket(key: str) -> tuple[float, float, float, float, int] | None:
+    """返回 (tokens, rate, updated_at, blocked_until, version)，不存在时返回 None。
+    与其他函数不同，出错时直接抛出异常，由调用者决定如何处理
+    """
+    async with Session() as session:
+        row = (
+            await session.execute(
+                select(
+                    RateLimitBucket.tokens,
+                    RateLimitBucket.rate,
+                    RateLimitBucket.updated_at,
+                    RateLimitBucket.blocked_until,
+                    RateLimitBucket.version,
+                ).where(RateLimitBucket.key == key)
+            )
+        ).first()
+    return None if row is None else tuple(row)
+
+
+async def save_rate_limit_bucket(
+    key: str, tokens: float, rate: float, updated_at: float, blocked_until: float, version: int | None
+) -> bool:
+    """version 是读取时的 version（不存在时为 None）。期间被其他 worker 修改过时不写入，返回 False。出错时抛出异常"""
+    values = dict(tokens=tokens, rate=rate, updated_at=updated_at, blocked_until=blocked_until)
+    with db_write_duration.time(operation="rate_limit_bucket", status="error") as labels:
+        async with Session.begin() as session:
+            if version is None:
+                stmt = insert(RateLimitBucket).values(key=key, version=1, **values).on_conflict_do_nothing()
+            else:
+                stmt = (
+                    update(RateLimitBucket)
+                    .where(RateLimitBucket.key == key, RateLimitBucket.version == version)
+                    .values(version=version + 1, **values)
+                )
+            saved = (await session.execute(stmt)).rowcount == 1
+        labels["status"] = "ok" if saved else "conflict"
+    return saved
+
+
+async def delete_expired_shared_state() -> None:
+    """删除过期的缓存，以及一天没有使用过的令牌桶（之后再使用时会重新创建一个满的桶）"""
+    try:
+        async with Session.begin() as session:
+            await session.execute(delete(SharedCacheEntry).where(SharedCacheEntry.expires_at <= _utc_now()))
+            await session.execute(delete(RateLimitBucket).where(RateLimitBucket.updated_at < time.time() - 24 * 3600))
+    except Exception:
+        logger.exception("Failed to delete expired shared state")
+
+
+# 以下是 database 本地副本（见 notion_api/database_mirror.py）的读写。与 get_rate_limit_bucket 相同，出错时直接抛出异常
+
+
+async def get_mirror_sync_state(database_id: str) -> tuple[str | None, str, datetime] | None:
+    """返回 (cursor, columns, synced_at)，从未同步过时返回 None"""
+    async with Session() as session:
+        row = (
+            await session.execute(
+                select(MirrorSyncState.cursor, MirrorSyncState.columns, MirrorSyncState.synced_at).where(
+                    MirrorSyncState.database_id == database_id
+                )
+            )
+        ).first()
+    return None if row is None else tuple(row)
+
+
+async def get_mirror_edited_times(database_id: str, page_ids: list[str] | None = None) -> dict[str, str]:
+    """返回本地副本中 page 的 last_edited_time，key 是 page id。page_ids 为 None 时返回所有 page"""
+    edited_times = {}
+    async with Session() as session:
+        if page_ids is None:
+            rows = await session.execute(
+                select(MirrorPage.page_id, MirrorPage.last_edited_time).where(MirrorPage.database_id == database_id)
+            )
+            return dict(rows.all())
+        for i in range(0, len(page_ids), _MAX_SQL_PARAMS):
+            rows = await session.execute(
+                select(MirrorPage.page_id, MirrorPage.last_edited_time).where(
+                    MirrorPage.database_id == database_id, MirrorPage.page_id.in_(page_ids[i : i + _MAX_SQL_PARAMS])
+                )
+            )
+            edited_times.update(dict(rows.all()))
+    return edited_times
+
+
+async def save_mirror_pages(
+    database_id: str, pages: list[dict], terms: list[dict], deleted: list[str], cursor: str | None, columns: str
+) -> None:
+    """在一个事务中写入一批 page 及其索引，并更新同步进度。
+    pages 的每一项是 MirrorPage 的各列（不含 database_id），terms 的每一项是 dict(page_id, term, weight)，
+    deleted 是需要删除的 page id。pages 中的 page 原来的词会先被删除
+    """
+    page_ids = [page["page_id"] for page in pages] + deleted
+    db_rows_written.inc(len(pages) + len(terms), operation="mirror")
+    with db_write_duration.time(operation="mirror", status="error") as labels:
+        async with Session.begin() as session:
+            for i in range(0, len(page_ids), _MAX_SQL_PARAMS):
+                chunk = page_ids[i : i + _MAX_SQL_PARAMS]
+                await session.execute(
+                    delete(MirrorTerm).where(MirrorTerm.database_id == database_id, MirrorTerm.page_id.in_(chunk))
+                )
+            for i in range(0, len(deleted), _MAX_SQL_PARAMS):
+                chunk = deleted[i : i + _MAX_SQL_PARAMS]
+                await session.execute(
+                    delete(MirrorPage).where(MirrorPage.database_id == database_id, MirrorPage.page_id.in_(chunk))
+                )
+            if pages:
+                insert_stmt = insert(MirrorPage)
+                insert_stmt = insert_stmt.on_conflict_do_update(
+                    index_elements=["database_id", "page_id"],
+                    set_={
+                        name: insert_stmt.excluded[name]
+                        for name in ("title", "authors", "abstract", "doi", "url", "last_edited_time")
+                    },
+                )
+                # 传入多行参数时使用 executemany，不受 sql 参数数量的限制
+                await session.execute(insert_stmt, [dict(database_id=database_id, **page) for page in pages])
+            if terms:
+                # 多个 worker 同时同步同一个 database 时，其他 worker 可能已经写入了相同的词
+                insert_stmt = insert(MirrorTerm)
+                insert_stmt = insert_stmt.on_conflict_do_update(
+                    index_elements=["database_id", "term", "page_id"], set_=dict(weight=insert_stmt.excluded.weight)
+                )
+                await session.execute(insert_stmt, [dict(database_id=database_id, **term) for term in terms])
+            insert_stmt = insert(MirrorSyncState).values(
+                database_id=database_id, cursor=cursor, columns=columns, synced_at=_utc_now()
+            )
+            insert_stmt = insert_stmt.on_conflict_do_update(
+                index_elements=["database_id"],
+                set_=dict(
+                    cursor=insert_stmt.excluded.cursor,
+                    columns=insert_stmt.excluded.columns,
+                    synced_at=insert_stmt.excluded.synced_at,
+                ),
+            )
+            await session.execute(insert_stmt)
+        labels["status"] = "ok"
+
+
+async def search_mirror(database_id: str, terms: list[str], prefix: str | None, limit: int) -> list[dict]:
+    """返回包含所有 terms、并且有以 prefix 开头的词的 page，按匹配的权重之和从高到低排序。
+    每一项是 MirrorPage 的各列（不含 database_id）以及 score
+    """
+    # 每个词分别查询，都可以使用主键索引。
+    # 前缀匹配使用 LIKE（prefix 中的 %、_ 会被转义）：按范围比较时结果取决于 postgresql 的排序规则（collation）。
+    # position 是查询中的第几个词，page 必须匹配到查询中所有的词
+    conditions = [(MirrorTerm.term == term, i) for i, term in enumerate(terms)]
+    if prefix:
+        conditions.append((MirrorTerm.term.startswith(prefix, autoescape=True), len(terms)))
+        # 与 prefix 完全相同的词再计算一次权重，排在只是前缀相同的前面
+        conditions.append((MirrorTerm.term == prefix, len(terms)))
+    if not conditions:
+        return []
+    matched = union_all(
+        *[
+            select(MirrorTerm.page_id, MirrorTerm.weight, literal(position).label("position")).where(
+                MirrorTerm.database_id == database_id, condition
+            )
+            for condition, position in conditions
+        ]
+    ).subquery()
+    scores = (
+        select(matched.c.page_id, func.sum(matched.c.weight).label("score"))
+        .group_by(matched.c.page_id)
+        .having(func.count(distinct(matched.c.position)) == len(terms) + bool(prefix))
+        .subquery()
+    )
+    async with Session() as session:
+        rows = await session.execute(
+            select(
+                MirrorPage.page_id,
+                MirrorPage.title,
+                MirrorPage.authors,
+                MirrorPage.abstract,
+                MirrorPage.doi,
+                MirrorPage.url,
+                MirrorPage.last_edited_time,
+                scores.c.score,
+            )
+            .join(scores, and_(MirrorPage.database_id == database_id, MirrorPage.page_id == scores.c.page_id))
+            .order_by(scores.c.score.desc(), MirrorPage.last_edited_time.desc())
+            .limit(limit)
+        )
+        return [dict(row._mapping) for row in rows.all()]
@@ -1,3 +1,6 @@
+from datetime import datetime
+
+from sqlalchemy import func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -49,3 +52,118 @@ class User(Base):
     email: Mapped[str | None] = mapped_column(nullable=True, unique=True)
     name: Mapped[str | None] = mapped_column(nullable=True)
     avatar_url: Mapped[str | None] = mapped_column(nullable=True)
+
+
+class UploadLedger(Base):
+    """记录每一篇成功上传的文献，用于在上传前判断该文献是否已经存在于目标 database 中，无需查询 notion。
+    一篇文献可能有多个标识（DOI、平台 id），每个标识一行，见 upload_ledger.work_identifiers
+    """
+
+    __tablename__ = "upload_ledger"
+    database_id: Mapped[str] = mapped_column(primary_key=True)
+    # 形如 "doi:10.1000/xyz123" 或 "arXiv:2101.00001"
+    work_identifier: Mapped[str] = mapped_column(primary_key=True)
+    page_id: Mapped[str] = mapped_column()
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class DOIMetadata(Base):
+    """从 crossref 获取的 DOI 对应的文献信息的缓存，所有用户共用"""
+
+    __tablename__ = "doi_metadata"
+    # 统一转换为小写，见 scrapers.doi.normalize_doi
+    doi: Mapped[str] = mapped_column(primary_key=True)
+    # Work 的 json 字符串。为 None 表示 crossref 中没有该 DOI
+    work: Mapped[str | None] = mapped_column(nullable=True)
+    # UTC 时间，过期后重新从 crossref 获取
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
+
+class UploadResult(Base):
+    """带有 idempotency key 的上传请求中，上传成功的每一条内容及创建的 page。
+    客户端用同一个 key 重试时，这些内容直接返回之前的结果，不再重复创建 page
+    """
+
+    __tablename__ = "upload_result"
+    # sha256(access token + idempotency key)，不同用户使用相同的 key 不会冲突
+    idempotency_key: Mapped[str] = mapped_column(primary_key=True)
+    # 在上传内容列表中的下标
+    item_index: Mapped[int] = mapped_column(primary_key=True)
+    # 上传内容的 sha256，重试时内容变了则重新上传
+    item_hash: Mapped[str] = mapped_column()
+    page_id: Mapped[str] = mapped_column()
+    # UTC 时间，过期后该 key 可以被重新使用
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
+
+class SharedCacheEntry(Base):
+    """Config.SHARED_STATE_BACKEND 为 database 时，schema、搜索结果、后台任务状态等缓存保存在这里，所有 worker 共用"""
+
+    __tablename__ = "shared_cache"
+    # 缓存的种类，如 schema、search
+    namespace: Mapped[str] = mapped_column(primary_key=True)
+    # 原始 key 的 sha256，key 中可能包含 access token，不直接保存
+    key: Mapped[str] = mapped_column(primary_key=True)
+    # json 字符串
+    value: Mapped[str] = mapped_column()
+    # UTC 时间
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
+
+class RateLimitBucket(Base):
+    """Config.SHARED_STATE_BACKEND 为 database 时，每个 access token 的令牌桶保存在这里，所有 worker 共用，
+    见 notion_api.rate_limiter.SharedTokenBucket。时间都是 unix 时间戳（秒）
+    """
+
+    __tablename__ = "rate_limit_bucket"
+    # access token 的 sha256
+    key: Mapped[str] = mapped_column(primary_key=True)
+    tokens: Mapped[float] = mapped_column()
+    rate: Mapped[float] = mapped_column()
+    updated_at: Mapped[float] = mapped_column(index=True)
+    blocked_until: Mapped[float] = mapped_column()
+    # 每次修改加 1。先读取再按 version 更新，version 变了说明其他 worker 同时修改过，需要重新读取
+    version: Mapped[int] = mapped_column()
+
+
+class MirrorPage(Base):
+    """用户 database 中每个 page 的本地副本，只保存搜索和展示需要的内容，见 notion_api/database_mirror.py"""
+
+    __tablename__ = "mirror_page"
+    database_id: Mapped[str] = mapped_column(primary_key=True)
+    page_id: Mapped[str] = mapped_column(primary_key=True)
+    title: Mapped[str] = mapped_column()
+    # 多个作者以 ", " 分隔
+    authors: Mapped[str] = mapped_column()
+    abstract: Mapped[str] = mapped_column()
+    doi: Mapped[str] = mapped_column()
+    url: Mapped[str] = mapped_column()
+    # notion 返回的 ISO 8601 字符串（UTC），格式固定，可以直接按字符串比较
+    last_edited_time: Mapped[str] = mapped_column()
+
+
+class MirrorTerm(Base):
+    """MirrorPage 的倒排索引，每个 page 中的每个词一行。
+    主键以 (database_id, term) 开头，按词查找使用主键索引；按前缀查找（LIKE）只能用到 database_id，需要扫描该 database 的所有词
+    """
+
+    __tablename__ = "mirror_term"
+    database_id: Mapped[str] = mapped_column(primary_key=True)
+    term: Mapped[str] = mapped_column(primary_key=True)
+    # page 更新时按 page_id 删除原来的词
+    page_id: Mapped[str] = mapped_column(primary_key=True, index=True)
+    # 词出现在哪些列中，标题中的权重最高，见 database_mirror.FIELD_WEIGHTS
+    weight: Mapped[int] = mapped_column()
+
+
+class MirrorSyncState(Base):
+    """每个 database 上一次同步到了哪里，下一次只获取 last_edited_time 不早于 cursor 的 page"""
+
+    __tablename__ = "mirror_sync_state"
+    database_id: Mapped[str] = mapped_column(primary_key=True)
+    # 已经同步的 page 中最大的 last_edited_time
+    cursor: Mapped[str | None] = mapped_column(nullable=True)
+    # 建立索引时标题、作者等分别使用的是哪一列（json），列变化后需要重新建立所有 page 的索引
+    columns: Mapped[str] = mapped_column()
+    # UTC 时间
+    synced_at: Mapped[datetime] = mapped_column()
@@ -0,0 +1,97 @@
+"""
+用户登录时 save_access_token、save_user 各自开一个事务，只插入一行。用户集中注册时会产生大量很小的事务。
+这里先把要插入的行放在内存中，数量达到 batch_size 或者距离上次写入超过 flush_interval 秒时，
+对每张表执行一次多行的 INSERT ... ON CONFLICT DO NOTHING。FastAPI 关闭时会把剩余的行全部写入。
+"""
+import asyncio
+import logging
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.database.db_models import Base
+from src.metrics import db_write_duration, db_rows_written
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self, session_maker: async_sessionmaker, insert: Callable, batch_size: int, flush_interval: float):
+        self.session_maker = session_maker
+        self.insert = insert
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # key 是 (表对应的 model, 冲突时判断的列)，value 是等待写入的行
+        self._pending: dict[tuple[type[Base], str], list[dict[str, Any]]] = {}
+        self._pending_count = 0
+        self._full = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def add(self, model: type[Base], row: dict[str, Any], conflict_column: str) -> None:
+        self._pending.setdefault((model, conflict_column), []).append(row)
+        self._pending_count += 1
+        if self._pending_count >= self.batch_size:
+            self._full.set()
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """不取消 _run，而是等它写完正在写入的这一批后退出，避免这一批丢失，之后再写入剩余的行"""
+        self._stopping.set()
+        self._full.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            pending, self._pending, self._pending_count = list(self._pending.items()), {}, 0
+            for i, ((model, conflict_column), rows) in enumerate(pending):
+                try:
+                    await self._write(model, rows, conflict_column)
+                except asyncio.CancelledError:
+                    # 被取消时，还没有写入的行放回 _pending，由之后的 flush 写入
+                    for key, remaining in pending[i:]:
+                        self._pending.setdefault(key, []).extend(remaining)
+                        self._pending_count += len(remaining)
+                    raise
+
+    async def _write(self, model: type[Base], rows: list[dict[str, Any]], conflict_column: str) -> None:
+        # 同一批次中重复的行只保留第一个，与逐行 ON CONFLICT DO NOTHING 的结果一致
+        unique_rows = {}
+        for row in rows:
+            unique_rows.setdefault(row[conflict_column], row)
+        unique_rows = list(unique_rows.values())
+        try:
+            await self._insert(model, unique_rows, conflict_column)
+        except Exception as e:
+            # 其中某一行违反了其他约束（如 user.email 唯一）时整批都会失败，此时改为逐行写入，只丢弃出错的行
+            logger.warning("Batch insert into %s failed, retrying row by row: %s", model.__tablename__, e)
+            for row in unique_rows:
+                try:
+                    await self._insert(model, [row], conflict_column)
+                except Exception as row_error:
+                    logger.error("Insert into %s failed: %s", model.__tablename__, row_error)
+
+    async def _insert(self, model: type[Base], rows: list[dict[str, Any]], conflict_column: str) -> None:
+        operation = f"write_buffer.{model.__tablename__}"
+        db_rows_written.inc(len(rows), operation=operation)
+        with db_write_duration.time(operation=operation, status="error") as labels:
+            async with self.session_maker.begin() as session:
+                insert_stmt = self.insert(model).values(rows).on_conflict_do_nothing(index_elements=[conflict_column])
+                await session.execute(insert_stmt)
+            labels["status"] = "ok"
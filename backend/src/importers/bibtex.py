@@ -0,0 +1,155 @@
+"""
+逐条解析 BibTeX 文件。只在内存中保留当前正在解析的一条记录，文件再大也不会全部读入内存。
+"""
+import re
+from typing import Iterable, Iterator
+
+from src.importers.common import build_work, parse_author_name, normalize_month, split_keywords
+from src.models import Work
+
+# BibTeX 的文献类型与 WorkType 的对应关系，不在其中的视为 other
+ENTRY_TYPES = {
+    "article": "journal-article",
+    "inproceedings": "proceedings-article",
+    "conference": "proceedings-article",
+    "proceedings": "proceedings",
+    "book": "book",
+    "inbook": "book-chapter",
+    "incollection": "book-chapter",
+    "phdthesis": "dissertation",
+    "mastersthesis": "dissertation",
+    "techreport": "report",
+    "dataset": "dataset",
+}
+# 这几种不是文献，跳过
+SKIPPED_TYPES = {"string", "comment", "preamble"}
+
+_ENTRY_START = re.compile(r"@\s*(\w+)\s*[{(]")
+_BRACES = re.compile(r"[{}]")
+_PARENTHESES = re.compile(r"[()]")
+_FIELD_NAME = re.compile(r"\s*,?\s*([\w\-:.]+)\s*=\s*")
+_LATEX_COMMAND = re.compile(r"\\[a-zA-Z]+\s*")
+
+
+def iter_raw_entries(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """依次返回 (文献类型, 括号内的内容)。记录可以用 {} 或 () 包围，只按开始时的那种括号计算层数；
+    一行中可以有多条记录
+    """
+    parts: list[str] = []
+    depth = 0
+    entry_type = None
+    delimiters = _BRACES
+    for line in lines:
+        pos = 0
+        while pos < len(line):
+            if entry_type is None:
+                match = _ENTRY_START.search(line, pos)
+                if not match:
+                    break
+                entry_type = match.group(1).lower()
+                delimiters = _BRACES if match.group(0)[-1] == "{" else _PARENTHESES
+                pos = match.end()
+                depth = 1
+                parts = []
+            for delimiter in delimiters.finditer(line, pos):
+                depth += 1 if delimiter.group() in "{(" else -1
+                if depth == 0:
+                    parts.append(line[pos : delimiter.start()])
+                    if entry_type not in SKIPPED_TYPES:
+                        yield entry_type, "".join(parts)
+                    entry_type = None
+                    pos = delimiter.end()
+                    break
+            else:
+                parts.append(line[pos:])
+                break
+
+
+def _read_value(body: str, pos: int) -> tuple[str, int]:
+    """从 pos 开始读取一个字段值，值可能是 {...}、"..." 或数字。返回 (值, 值结束后的位置)"""
+    if pos >= len(body):
+        return "", pos
+    if body[pos] == "{":
+        depth = 0
+        for i in range(pos, len(body)):
+            if body[i] == "{":
+                depth += 1
+            elif body[i] == "}":
+                depth -= 1
+                if depth == 0:
+                    return body[pos + 1 : i], i + 1
+        return body[pos + 1 :], len(body)
+    if body[pos] == '"':
+        depth = 0
+        for i in range(pos + 1, len(body)):
+            if body[i] == "{":
+                depth += 1
+            elif body[i] == "}":
+                depth -= 1
+            elif body[i] == '"' and depth == 0:
+                return body[pos + 1 : i], i + 1
+        return body[pos + 1 :], len(body)
+    end = body.find(",", pos)
+    end = len(body) if end == -1 else end
+    return body[pos:end].strip(), end
+
+
+def _clean(value: str) -> str:
+    """去掉 LaTeX 的大括号、命令和多余的空白"""
+    value = value.replace("\\&", "&").replace("~", " ").replace("--", "-")
+    value = _LATEX_COMMAND.sub("", value)
+    value = value.replace("{", "").replace("}", "").replace("\\", "")
+    return " ".join(value.split())
+
+
+def parse_fields(body: str) -> dict[str, str]:
+    """body 是 @article{ 之后的内容，第一个逗号前是 citation key"""
+    fields = {}
+    pos = body.find(",")
+    if pos == -1:
+        return fields
+    while True:
+        match = _FIELD_NAME.match(body, pos)
+        if not match:
+            break
+        value, pos = _read_value(body, match.end())
+        fields[match.group(1).lower()] = value
+    return fields
+
+
+def entry_to_work(entry_type: str, fields: dict[str, str]) -> Work | None:
+    get = lambda name: _clean(fields[name]) if fields.get(name) else None
+    authors = [
+        parse_author_name(name) for name in re.split(r"\s+and\s+", get("author") or "") if name.strip()
+    ]
+    eprint = get("eprint")
+    is_arxiv = eprint and (get("archiveprefix") or get("eprinttype") or "").lower() == "arxiv"
+    return build_work(
+        {
+            "title": get("title"),
+            "authors": authors,
+            "abstract": get("abstract"),
+            "subjects": split_keywords(get("keywords")),
+            "DOI": get("doi"),
+            "url": get("url"),
+            "platform": "arXiv" if is_arxiv else None,
+            "platformId": eprint if is_arxiv else None,
+            "type": ENTRY_TYPES.get(entry_type, "other"),
+            "ISBN": [get("isbn")] if get("isbn") else None,
+            "publishInfo": {
+                "publisher": get("publisher") or get("institution") or get("school"),
+                "containerTitle": get("journal") or get("booktitle") or get("journaltitle"),
+                "issue": get("number"),
+                "volume": get("volume"),
+                "pages": get("pages"),
+                "year": get("year"),
+                "month": normalize_month(get("month")),
+            },
+        }
+    )
+
+
+def iter_works(lines: Iterable[str]) -> Iterator[Work | None]:
+    """依次返回每条记录解析得到的 Work，无法解析的记录返回 None"""
+    for entry_type, body in iter_raw_entries(lines):
+        yield entry_to_work(entry_type, parse_fields(body))
@@ -0,0 +1,63 @@
+from typing import Any
+
+from pydantic import ValidationError
+
+from src.models import Work
+
+MONTHS = {
+    "jan": "01",
+    "feb": "02",
+    "mar": "03",
+    "apr": "04",
+    "may": "05",
+    "jun": "06",
+    "jul": "07",
+    "aug": "08",
+    "sep": "09",
+    "oct": "10",
+    "nov": "11",
+    "dec": "12",
+}
+
+
+def build_work(data: dict[str, Any]) -> Work | None:
+    """将 dict 转换为 Work。导入的数据不一定规范（如链接格式不对），去掉无法解析的字段后重试"""
+    data = {key: value for key, value in data.items() if value not in (None, "", [], {})}
+    for _ in range(len(data) + 1):
+        try:
+            return Work.model_validate(data)
+        except ValidationError as e:
+            for error in e.errors():
+                data.pop(error["loc"][0], None)
+    return None
+
+
+def parse_author_name(name: str) -> dict[str, str | None]:
+    """作者名可能是 "Last, First" 或 "First Last" 的格式"""
+    name = " ".join(name.split())
+    if "," in name:
+        family_name, given_name = (part.strip() for part in name.split(",", 1))
+    else:
+        given_name, _, family_name = name.rpartition(" ")
+    return {
+        "familyName": family_name or None,
+        "givenName": given_name or None,
+        "fullName": " ".join(filter(None, [given_name, family_name])) or None,
+    }
+
+
+def normalize_month(month: str | int | None) -> str | None:
+    """月份可能是数字，也可能是英文月份名或缩写"""
+    if month is None:
+        return None
+    month = str(month).strip().lower()
+    if month.isdigit() and 1 <= int(month) <= 12:
+        return f"{int(month):02d}"
+    return MONTHS.get(month[:3])
+
+
+def split_keywords(keywords: str | None) -> list[str] | None:
+    if not keywords:
+        return None
+    separator = ";" if ";" in keywords else ","
+    return [keyword.strip() for keyword in keywords.split(separator) if keyword.strip()] or None
@@ -0,0 +1,165 @@
+"""
+解析 CSL-JSON 文件（Zotero 等文献管理软件可以导出）。文件是一个 JSON 数组，
+这里按固定大小分段读入，找到一个完整的数组元素后立即解析并返回，不会将整个文件读入内存。
+有的文件压缩成了一行，因此不能按行读取。
+字段含义见 https://citeproc-js.readthedocs.io/en/latest/csl-json/markup.html
+"""
+import json
+import re
+from typing import Iterable, Iterator
+
+from src.importers.common import build_work, split_keywords
+from src.models import Work
+
+# CSL 的文献类型与 WorkType 的对应关系，不在其中的视为 other
+ENTRY_TYPES = {
+    "article-journal": "journal-article",
+    "article": "posted-content",
+    "paper-conference": "proceedings-article",
+    "book": "book",
+    "chapter": "book-chapter",
+    "thesis": "dissertation",
+    "report": "report",
+    "dataset": "dataset",
+    "standard": "standard",
+}
+
+# 每次从文件中读入的字符数
+CHUNK_SIZE = 64 * 1024
+# 查找元素的边界时只需要关心这些字符
+_SPECIAL = re.compile(r'[\\"{}\[\],]')
+
+
+class CSLJSONError(ValueError):
+    pass
+
+
+def _chunks(source: Iterable[str]) -> Iterator[str]:
+    """文件对象按 CHUNK_SIZE 读取，其他的（如字符串列表）按原样返回"""
+    read = getattr(source, "read", None)
+    if read is None:
+        yield from source
+    else:
+        yield from iter(lambda: read(CHUNK_SIZE), "")
+
+
+def _decode(text: str) -> dict | None:
+    try:
+        item = json.loads(text)
+    except ValueError:
+        return None
+    return item if isinstance(item, dict) else None
+
+
+def iter_raw_entries(source: Iterable[str]) -> Iterator[dict | None]:
+    """依次返回数组中的每个元素，不是合法的 JSON 对象的元素返回 None，不影响其他元素。
+    文件不是 JSON 数组或者不完整时抛出 CSLJSONError。
+    读入的内容只扫描一次：按引号、括号找到数组中的逗号，两个逗号之间就是一个元素
+    """
+    started = False
+    # 数组本身算一层，depth 为 1 时的逗号和 ] 是元素的边界
+    depth = 1
+    in_string = False
+    # 上一段以反斜杠结尾时，这一段的第一个字符被转义
+    escaped = False
+    element: list[str] = []
+    for chunk in _chunks(source):
+        start = 0
+        if not started:
+            stripped = chunk.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] != "[":
+                raise CSLJSONError("CSL-JSON file must be a JSON array")
+            started = True
+            start = len(chunk) - len(stripped) + 1
+        escaped_pos = 0 if escaped else -1
+        for match in _SPECIAL.finditer(chunk, start):
+            char, pos = match.group(), match.start()
+            if pos == escaped_pos:
+                continue
+            if in_string:
+                if char == "\\":
+                    escaped_pos = pos + 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]" and depth > 1:
+                depth -= 1
+            elif char in ",]" and depth == 1:
+                element.append(chunk[start:pos])
+                start = pos + 1
+                text = "".join(element).strip()
+                element = []
+                # 空的数组、最后一个元素后面多出的逗号
+                if text:
+                    yield _decode(text)
+                if char == "]":
+                    return
+        element.append(chunk[start:])
+        escaped = escaped_pos == len(chunk)
+    raise CSLJSONError("Unexpected end of CSL-JSON file")
+
+
+def _date(item: dict, name: str) -> list:
+    value = item.get(name)
+    parts = value.get("date-parts") if isinstance(value, dict) else None
+    if not isinstance(parts, list) or not parts or not isinstance(parts[0], list):
+        return []
+    return [str(part) for part in parts[0]]
+
+
+def _authors(item: dict) -> list[dict]:
+    authors = item.get("author") or []
+    return [
+        {
+            "familyName": author.get("family"),
+            "givenName": author.get("given"),
+            "fullName": " ".join(filter(None, [author.get("given"), author.get("family")])) or author.get("literal"),
+        }
+        for author in (authors if isinstance(authors, list) else [])
+        if isinstance(author, dict)
+    ]
+
+
+def entry_to_work(item: dict) -> Work | None:
+    date_parts = _date(item, "issued") or _date(item, "published-print") or _date(item, "published-online")
+    return build_work(
+        {
+            "title": item.get("title"),
+            "subtitle": item.get("subtitle"),
+            "authors": _authors(item),
+            "abstract": item.get("abstract"),
+            "subjects": split_keywords(item["keyword"]) if isinstance(item.get("keyword"), str) else None,
+            "DOI": item.get("DOI"),
+            "url": item.get("URL"),
+            "type": ENTRY_TYPES.get(item.get("type"), "other"),
+            "ISBN": [item["ISBN"]] if item.get("ISBN") else None,
+            "publishInfo": {
+                "publisher": item.get("publisher"),
+                "containerTitle": item.get("container-title"),
+                "issue": str(item["issue"]) if item.get("issue") else None,
+                "volume": str(item["volume"]) if item.get("volume") else None,
+                "pages": item.get("page"),
+                "year": date_parts[0] if len(date_parts) > 0 else None,
+                "month": f"{int(date_parts[1]):02d}" if len(date_parts) > 1 and date_parts[1].isdigit() else None,
+                "day": f"{int(date_parts[2]):02d}" if len(date_parts) > 2 and date_parts[2].isdigit() else None,
+            },
+        }
+    )
+
+
+def iter_works(source: Iterable[str]) -> Iterator[Work | None]:
+    """source 是打开的文件，依次返回每条记录解析得到的 Work，无法解析的记录返回 None"""
+    for item in iter_raw_entries(source):
+        work = None
+        if item is not None:
+            # 字段的类型不符合 CSL-JSON 规范（如 "type": [] ）时只影响这一条记录
+            try:
+                work = entry_to_work(item)
+            except (TypeError, ValueError, AttributeError):
+                work = None
+        yield work
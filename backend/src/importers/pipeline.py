@@ -0,0 +1,120 @@
+"""
+批量导入 BibTeX、RIS、CSL-JSON 文件，作为后台上传任务执行（见 upload_jobs.py），通过 /upload-jobs/{job_id} 查询进度。
+
+文件先保存到临时文件中，之后边解析边上传：解析出的文献每 Config.IMPORT_BATCH_SIZE 条放入队列，
+由 Config.IMPORT_UPLOADERS 个 uploader 从队列中取出并调用 upload_raw_works。
+队列的长度有限，上传速度跟不上时解析会暂停，因此无论文件多大，内存中都只有少量文献。
+"""
+import asyncio
+import os
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Literal
+
+from src.config import Config
+from src.importers import bibtex, ris, csl_json
+from src.models import PDToWorkMappingItem, Work, PageBodyField, ImportFormat
+from src.notion_api.api import upload_raw_works, ErrorResult, DuplicateResult
+from src.notion_api.upload_jobs import UploadJob
+
+PARSERS: dict[str, Callable[[Iterable[str]], Iterator[Work | None]]] = {
+    "bibtex": bibtex.iter_works,
+    "ris": ris.iter_works,
+    "csl-json": csl_json.iter_works,
+}
+
+
+def create_import_job(
+    file_path: str,
+    file_format: ImportFormat,
+    mapping: dict[str, PDToWorkMappingItem | None],
+    database_id: str,
+    access_token: str,
+    on_duplicate: Literal["upload", "skip"] = "upload",
+    page_body: list[PageBodyField] | None = None,
+) -> UploadJob:
+    """file_path 是保存上传文件的临时文件，任务结束后会被删除"""
+
+    async def runner(job: UploadJob) -> None:
+        await _run_import(job, file_path, file_format, mapping, database_id, on_duplicate, page_body)
+
+    return UploadJob(access_token=access_token, data=None, total=0, runner=runner)
+
+
+def _next_batch(works: Iterator[Work | None], size: int) -> list[Work | None]:
+    return list(islice(works, size))
+
+
+async def _run_import(
+    job: UploadJob,
+    file_path: str,
+    file_format: ImportFormat,
+    mapping: dict[str, PDToWorkMappingItem | None],
+    database_id: str,
+    on_duplicate: Literal["upload", "skip"],
+    page_body: list[PageBodyField] | None,
+) -> None:
+    queue: asyncio.Queue[list[tuple[int, Work]] | None] = asyncio.Queue(maxsize=Config.IMPORT_QUEUE_SIZE)
+    uploaders = [
+        asyncio.create_task(_upload_batches(job, queue, mapping, database_id, on_duplicate, page_body))
+        for _ in range(Config.IMPORT_UPLOADERS)
+    ]
+    try:
+        # 文件中可能有 BOM 或者非 utf-8 的字符，不能因为个别字符导致整个文件无法导入
+        with open(file_path, encoding="utf-8-sig", errors="replace") as f:
+            works = PARSERS[file_format](f)
+            while True:
+                # 读文件和解析都是同步操作，放到线程中执行，避免阻塞 event loop
+                batch = await asyncio.to_thread(_next_batch, works, Config.IMPORT_BATCH_SIZE)
+                if not batch:
+                    break
+                items = []
+                for work in batch:
+                    idx = job.add_item()
+                    if work is None or not work.title:
+                        job.set_result(idx, ErrorResult(message="Failed to parse entry", code="parse_error", data=idx))
+                    else:
+                        items.append((idx, work))
+                if items:
+                    await queue.put(items)
+        for _ in uploaders:
+            await queue.put(None)
+        await asyncio.gather(*uploaders)
+    finally:
+        for uploader in uploaders:
+            uploader.cancel()
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+async def _upload_batches(
+    job: UploadJob,
+    queue: asyncio.Queue[list[tuple[int, Work]] | None],
+    mapping: dict[str, PDToWorkMappingItem | None],
+    database_id: str,
+    on_duplicate: Literal["upload", "skip"],
+    page_body: list[PageBodyField] | None,
+) -> None:
+    """从队列中取出文献上传，直到取出 None。上传出错时只记录到对应的文献上，不会中断整个任务"""
+    while (items := await queue.get()) is not None:
+        indices = [idx for idx, _ in items]
+        try:
+            results = await upload_raw_works(
+                works=[work for _, work in items],
+                mapping=mapping,
+                database_id=database_id,
+                access_token=job.access_token,
+                on_duplicate=on_duplicate,
+                page_body=page_body,
+            )
+        except Exception as e:
+            results = ErrorResult(message=str(e), code=500)
+        if isinstance(results, ErrorResult):
+            for idx in indices:
+                job.set_result(idx, ErrorResult(message=results.message, code=results.code, data=idx))
+            continue
+        for idx, result in zip(indices, results):
+            if isinstance(result, (ErrorResult, DuplicateResult)):
+                result.data = idx
+            job.set_result(idx, result)
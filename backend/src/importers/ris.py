@@ -0,0 +1,97 @@
+"""
+逐条解析 RIS 文件。每行的格式为 "TY  - JOUR"，一条记录以 TY 开始、以 ER 结束。
+标签含义见 https://en.wikipedia.org/wiki/RIS_(file_format)
+"""
+import re
+from typing import Iterable, Iterator
+
+from src.importers.common import build_work, parse_author_name, normalize_month
+from src.models import Work
+
+# RIS 的文献类型与 WorkType 的对应关系，不在其中的视为 other
+ENTRY_TYPES = {
+    "JOUR": "journal-article",
+    "EJOUR": "journal-article",
+    "BOOK": "book",
+    "EBOOK": "book",
+    "CHAP": "book-chapter",
+    "ECHAP": "book-chapter",
+    "CONF": "proceedings-article",
+    "CPAPER": "proceedings-article",
+    "THES": "dissertation",
+    "RPRT": "report",
+    "DATA": "dataset",
+    "STAND": "standard",
+}
+
+_LINE = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+
+
+def iter_raw_entries(lines: Iterable[str]) -> Iterator[dict[str, list[str]]]:
+    """依次返回每条记录，key 是标签，value 是该标签的所有值。不符合格式的行视为上一行的延续"""
+    entry: dict[str, list[str]] | None = None
+    last_tag = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        match = _LINE.match(line)
+        if not match:
+            if entry is not None and last_tag and line.strip():
+                entry[last_tag][-1] += " " + line.strip()
+            continue
+        tag, value = match.group(1), (match.group(2) or "").strip()
+        if tag == "TY":
+            entry = {}
+        if entry is None:
+            continue
+        if tag == "ER":
+            yield entry
+            entry, last_tag = None, None
+            continue
+        entry.setdefault(tag, []).append(value)
+        last_tag = tag
+
+
+def _parse_date(value: str | None) -> tuple[str | None, str | None, str | None]:
+    """PY、DA 的格式为 YYYY/MM/DD/other，除年份外都可以省略"""
+    if not value:
+        return None, None, None
+    parts = (value.split("/") + [None, None])[:3]
+    year = parts[0][:4] if parts[0] and parts[0][:4].isdigit() else None
+    day = f"{int(parts[2]):02d}" if parts[2] and parts[2].isdigit() else None
+    return year, normalize_month(parts[1]), day
+
+
+def entry_to_work(entry: dict[str, list[str]]) -> Work | None:
+    first = lambda *tags: next((entry[tag][0] for tag in tags if entry.get(tag) and entry[tag][0]), None)
+    year, month, day = _parse_date(first("PY", "Y1", "DA"))
+    start_page, end_page = first("SP"), first("EP")
+    pages = f"{start_page}-{end_page}" if start_page and end_page else start_page
+    authors = [name for tag in ("AU", "A1") for name in entry.get(tag, [])]
+    return build_work(
+        {
+            "title": first("TI", "T1"),
+            "authors": [parse_author_name(name) for name in authors if name],
+            "abstract": first("AB", "N2"),
+            "subjects": [keyword for keyword in entry.get("KW", []) if keyword],
+            "DOI": first("DO"),
+            "url": first("UR"),
+            "type": ENTRY_TYPES.get(first("TY"), "other"),
+            "ISBN": [first("SN")] if first("TY") in ("BOOK", "EBOOK", "CHAP", "ECHAP") and first("SN") else None,
+            "publishInfo": {
+                "publisher": first("PB"),
+                "containerTitle": first("T2", "JO", "JF", "JA"),
+                "issue": first("IS"),
+                "volume": first("VL"),
+                "pages": pages,
+                "year": year,
+                "month": month,
+                "day": day,
+            },
+        }
+    )
+
+
+def iter_works(lines: Iterable[str]) -> Iterator[Work | None]:
+    """依次返回每条记录解析得到的 Work，无法解析的记录返回 None"""
+    for entry in iter_raw_entries(lines):
+        yield entry_to_work(entry)
@@ -1,7 +1,23 @@
-from src.models.api_models import SearchByTitleRequest, ApiResponse
+from src.models.api_models import (
+    SearchByTitleRequest,
+    ApiResponse,
+    UploadJobStatus,
+    UploadJobFailure,
+    PDToWorkMappingItem,
+    UploadRawWorksRequest,
+    PageBodyField,
+    ImportFormat,
+    ResolveDOIsRequest,
+    ArxivWorksRequest,
+    MirrorSyncRequest,
+    MirrorSyncStatus,
+    MirrorSearchRequest,
+    MirrorSearchHit,
+)
 from src.models.models_auto import (
     Work,
     NPDInfo,
+    NProperty,
     NUser,
     NAccessToken,
     NAccessTokenOwnerUser,
@@ -1,6 +1,12 @@
 from typing import Any, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from src.models.models_auto import NProperty, Work
+
+PageBodyField = Literal["abstract", "highlights", "authorComments"]
+# /import-works 支持的文件格式，解析见 src/importers
+ImportFormat = Literal["bibtex", "ris", "csl-json"]
 
 
 class SearchByTitleRequest(BaseModel):
@@ -14,3 +20,94 @@ class ApiResponse(BaseModel):
     message: str = ""
     data: Any = None
     code: int = 0
+
+
+class UploadJobFailure(BaseModel):
+    index: int
+    message: str
+    code: int | str
+
+
+class UploadJobStatus(BaseModel):
+    job_id: str
+    status: Literal["pending", "running", "finished", "failed"]
+    message: str = ""
+    total: int
+    # 已经上传完成（无论成功失败）的数量
+    done: int
+    failures: list[UploadJobFailure]
+    # key 是上传成功的文献在 data 中的下标，value 是创建的 page id
+    page_ids: dict[int, str]
+    # key 是因为已经上传过而跳过的文献的下标，value 是之前创建的 page id
+    duplicates: dict[int, str] = {}
+
+
+class PDToWorkMappingItem(BaseModel):
+    """与前端 PDToWorkMapping 的 value 格式相同"""
+
+    PDPropertyName: str
+    PDProperty: NProperty
+    # Work 的字段名，或者 PublishInfo、DigitalResource 的字段名，或者 'date'（由 year、month、day 组合得到）
+    workPropertyName: str
+    workPropertyLabel: str = ""
+
+
+class UploadRawWorksRequest(BaseModel):
+    access_token: str
+    database_id: str
+    # key 是 database 的列名，value 为 None 表示这一列不对应任何 Work 字段
+    mapping: dict[str, PDToWorkMappingItem | None]
+    works: list[Work]
+    # skip: 根据本地上传记录，跳过之前已经上传到该 database 的文献
+    on_duplicate: Literal["upload", "skip"] = "upload"
+    # 这些字段会完整地写入 page 的正文，不受列中文本 2000 个字符的限制
+    page_body: list[PageBodyField] = []
+    # 关联到同一个 database 的 relation 列。设置后会同时上传 works 的参考文献，并通过这一列关联，见 citation_graph.py
+    references_property: str | None = None
+
+
+class ResolveDOIsRequest(BaseModel):
+    dois: list[str]
+
+
+class ArxivWorksRequest(BaseModel):
+    # 如 2101.00001、2101.00001v2、hep-th/9901001，也可以是详情页链接
+    ids: list[str]
+
+
+class MirrorSyncRequest(BaseModel):
+    access_token: str
+    database_id: str
+    # 与 /upload-raw-works 的 mapping 相同，用于确定作者、摘要、DOI 是哪一列。没有对应的列时按列名查找
+    mapping: dict[str, PDToWorkMappingItem | None] = {}
+    # 获取所有 page，并删除本地多出来的（notion 中已经删除的）。增量同步无法发现被删除的 page
+    full: bool = False
+
+
+class MirrorSyncStatus(BaseModel):
+    database_id: str
+    full: bool
+    # 从 notion 获取的 page 数
+    fetched: int = 0
+    # 其中内容有变化，重新建立了索引的
+    updated: int = 0
+    deleted: int = 0
+
+
+class MirrorSearchRequest(BaseModel):
+    access_token: str
+    database_id: str
+    query: str
+    limit: int = Field(20, ge=1, le=100)
+
+
+class MirrorSearchHit(BaseModel):
+    page_id: str
+    title: str
+    authors: str
+    abstract: str
+    doi: str
+    url: str
+    last_edited_time: str
+    # 匹配到的词的权重之和，见 database_mirror.FIELD_WEIGHTS
+    score: int
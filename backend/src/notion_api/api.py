@@ -1,8 +1,8 @@
 """
-TODO: 自动调整 api 发送速率
 根据 https://developers.notion.com/reference/request-limits，每15分钟最多 2700 个请求。
 目前尚不清楚这个是整个 app 的限制，还是根据 user access token 的 per user 限制（有网友表示是 per user）。
 如果返回的 HTTP 代码是 429，表示超过了限制，此时返回结果的 header 中会包含多少秒后可以重试。
+限速逻辑见 rate_limiter.py，目前按 per user（即 per access token）处理。
 
 Notion API 的信息
 1. 创建 database 的新 item 时：
@@ -26,24 +26,70 @@ Notion API 的信息
     * URL 类型数据传入的是普通字符串
         * 插入成功
 """
+import asyncio
 import json
 import string
+import weakref
 from dataclasses import dataclass
-from typing import Literal, Any
+from typing import Literal, Any, Callable
 
 import httpx
-from notion_client import APIResponseError, AsyncClient
+from notion_client import APIResponseError
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
 from notion_client.helpers import async_collect_paginated_api
 
+from src.cache import SingleFlight
 from src.config import Config
 from src.database.db_client import save_user, save_access_token
-from src.models import NPDInfo, NUser, NAccessToken
+from src.metrics import uploads_in_flight, preflight_rejections
+from src.models import NPDInfo, NUser, NAccessToken, Work, PDToWorkMappingItem
+from src.notion_api.database_work_mapping import transform_works_to_pages, update_mapping_with_schema
+from src.notion_api.http_clients import http_clients
+from src.notion_api.idempotency import (
+    scoped_key,
+    item_hash,
+    find_completed_items,
+    record_completed_item,
+    get_lock as get_idempotency_lock,
+)
+from src.notion_api.page_content import split_children, work_to_blocks, PageBodyField
+from src.notion_api.property_validator import validate_page_properties
+from src.notion_api.rate_limiter import RateLimitedAsyncClient, RateLimiter
+from src.notion_api.retry import NOTION_ERRORS
+from src.notion_api.upload_ledger import work_identifiers, find_uploaded_works, record_uploaded_works
+from src.shared_state import create_cache
 
-notion = AsyncClient(auth=Config.NOTION_SECRET)
+notion = RateLimitedAsyncClient(
+    auth=Config.NOTION_SECRET,
+    base_url=Config.NOTION_API_URL,
+    rate_limiter=RateLimiter(
+        rate=Config.NOTION_RATE_LIMIT, capacity=Config.NOTION_RATE_LIMIT_BURST, min_rate=Config.NOTION_RATE_LIMIT_MIN
+    ),
+)
 # 这个 httpx_auth 可以直接作为参数传递给 httpx.Client，这样所有请求都会带上这个 auth。也可以在每次请求时传递。
 # 这个 auth 本质上就是将 username 和 password 拼接后，转换为 base64 字符串，再添加到请求 header 中，这是 http 协议的基础认证方法
 httpx_auth = httpx.BasicAuth(username=Config.NOTION_CLIENT_ID, password=Config.NOTION_SECRET)
-httpx_client = httpx.Client()
+# 每个 access token 对应一个 semaphore，用于限制同一用户同时上传的数量。
+# 使用 WeakValueDictionary，当没有上传任务持有某个 semaphore 时，会被自动回收，不会无限增长
+_upload_semaphores: weakref.WeakValueDictionary[str, asyncio.Semaphore] = weakref.WeakValueDictionary()
+# page/database 的 schema 缓存，key 是 (access_token, pd_type, pd_id)。用户的目标 database 的列几乎不会变化
+# 运行多个 worker 时可以保存在数据库中共用，见 shared_state.py
+schema_cache = create_cache("schema", ttl=Config.SCHEMA_CACHE_TTL, max_size=Config.SCHEMA_CACHE_SIZE)
+# 搜索结果缓存，key 是 (access_token, query, search_for)。前端打开 database 选择框、用户输入时会反复搜索
+search_cache = create_cache("search", ttl=Config.SEARCH_CACHE_TTL, max_size=Config.SEARCH_CACHE_SIZE)
+_search_single_flight = SingleFlight()
+
+
+async def open_http_clients() -> None:
+    """在 FastAPI 启动时调用。notion-client 和 oauth 请求共用 http_clients 的连接池"""
+    http_clients.open()
+    notion.client = http_clients.create_client()
+    # notion-client 设置 client 时会用自己的 timeout 覆盖，这里改回统一配置的 timeout
+    notion.client.timeout = http_clients.timeout
+
+
+async def close_http_clients() -> None:
+    await http_clients.close()
 
 
 @dataclass
@@ -53,10 +99,41 @@ class ErrorResult:
     data: Any | None = None
 
 
+def to_error_result(error: Exception, data: Any = None) -> ErrorResult:
+    """notion 请求失败（暂时性错误已经重试过，见 retry.py）时，转换为返回给用户的 ErrorResult"""
+    if isinstance(error, APIResponseError):
+        return ErrorResult(message=json.loads(error.body).get("message", "Notion API error"), code=error.code, data=data)
+    if isinstance(error, HTTPResponseError):
+        return ErrorResult(message=str(error), code=error.status, data=data)
+    if isinstance(error, RequestTimeoutError):
+        return ErrorResult(message=str(error), code=error.code, data=data)
+    return ErrorResult(message=f"Failed to connect to Notion: {error}", code="connection_error", data=data)
+
+
+@dataclass
+class DuplicateResult:
+    """文献之前已经上传到了目标 database，page_id 是当时创建的 page"""
+
+    page_id: str
+    data: Any | None = None
+
+
 async def search_by_title(
     query: str, search_for: Literal["database", "page"], access_token: str = ""
 ) -> list[NPDInfo] | ErrorResult:
-    """根据标题查找 page 或 database"""
+    """根据标题查找 page 或 database。
+    结果会缓存 Config.SEARCH_CACHE_TTL 秒；同时进行的相同搜索只会向 notion 发送一次请求
+    """
+    key = (access_token, query, search_for)
+    cached = await search_cache.get(key)
+    if cached is not None:
+        return cached
+    return await _search_single_flight.do(key, lambda: _search_by_title(query, search_for, access_token))
+
+
+async def _search_by_title(
+    query: str, search_for: Literal["database", "page"], access_token: str
+) -> list[NPDInfo] | ErrorResult:
     # page_size 最大值就是 100，即每次最多返回 100 条结果
     options = {
         "query": query,
@@ -71,42 +148,256 @@ async def search_by_title(
             notion.search,
             **options,
         )
-        return search_results
-    except APIResponseError as error:
-        return ErrorResult(message="Notion API error", code=error.status)
+    except NOTION_ERRORS as error:
+        return to_error_result(error)
+    await search_cache.set((access_token, query, search_for), search_results)
+    await _revalidate_cached_schemas(search_results, access_token)
+    return search_results
 
 
-async def upload_works(work_to_database_properties: list[dict], access_token: str) -> list[NPDInfo | ErrorResult]:
-    """work_to_database_properties 是已经整理好格式的上传内容，直接将元素传递给 notion.pages.create 即可"""
-    results = []
-    for idx, properties in enumerate(work_to_database_properties):
+async def _revalidate_cached_schemas(search_results: list[NPDInfo], access_token: str) -> None:
+    """search 返回的是完整的 page/database 信息（包括 properties），顺便用来刷新 schema 缓存。
+    last_edited_time 没变说明 schema 没有变化，只需延长缓存时间；变了则用新的结果替换。
+    只刷新已经缓存了的，不把所有搜索结果都放入缓存。所有结果一次读取缓存（database 缓存只查询一次）
+    """
+    pds = {(access_token, pd["object"], pd["id"]): pd for pd in search_results}
+    for key, cached in (await schema_cache.get_many(pds)).items():
+        pd = pds[key]
+        await schema_cache.set(key, cached if cached["last_edited_time"] == pd["last_edited_time"] else pd)
+
+
+def _get_upload_semaphore(access_token: str) -> asyncio.Semaphore:
+    semaphore = _upload_semaphores.get(access_token)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(Config.UPLOAD_CONCURRENCY)
+        _upload_semaphores[access_token] = semaphore
+    return semaphore
+
+
+UploadResultCallback = Callable[[int, NPDInfo | ErrorResult], None]
+
+
+async def _upload_work(
+    idx: int,
+    properties: dict,
+    access_token: str,
+    semaphore: asyncio.Semaphore,
+    on_result: UploadResultCallback | None = None,
+) -> NPDInfo | ErrorResult:
+    # 创建 page 时最多带 100 个 block，剩余的创建后再分批追加，见 page_content.py
+    children, append_batches = split_children(properties.get("children") or [])
+    if append_batches:
+        properties = {**properties, "children": children}
+    async with semaphore:
+        with uploads_in_flight.track_inprogress():
+            try:
+                result = await notion.pages.create(**properties, auth=access_token)
+            except NOTION_ERRORS as error:
+                result = to_error_result(error, data=idx)
+            else:
+                result = await _append_children(idx, result, append_batches, access_token)
+    if on_result is not None:
+        on_result(idx, result)
+    return result
+
+
+async def _append_children(
+    idx: int, page: NPDInfo, append_batches: list[list[dict]], access_token: str
+) -> NPDInfo | ErrorResult:
+    """同一个 page 的 block 需要按顺序追加。追加失败时将 page 移到回收站，避免重试时留下内容不完整的重复 page"""
+    try:
+        for batch in append_batches:
+            await notion.blocks.children.append(block_id=page["id"], children=batch, auth=access_token)
+    except NOTION_ERRORS as error:
         try:
-            results.append(await notion.pages.create(**properties, auth=access_token))
-        except APIResponseError as error:
-            results.append(
-                ErrorResult(
-                    message=json.loads(error.body).get("message", "Notion API error"), code=error.code, data=idx
+            await notion.pages.update(page_id=page["id"], archived=True, auth=access_token)
+        except NOTION_ERRORS:
+            pass
+        return to_error_result(error, data=idx)
+    return page
+
+
+async def upload_works(
+    work_to_database_properties: list[dict],
+    access_token: str,
+    on_result: UploadResultCallback | None = None,
+    idempotency_key: str | None = None,
+) -> list[NPDInfo | ErrorResult]:
+    """work_to_database_properties 是已经整理好格式的上传内容，直接将元素传递给 notion.pages.create 即可
+    同一 access token 下最多同时上传 Config.UPLOAD_CONCURRENCY 个，返回结果的顺序与传入顺序一致
+    on_result 会在每一条上传完成（无论成功失败）时被调用，参数是该条的下标和结果，用于汇报进度
+    传入 idempotency_key 时，之前用同一个 key 上传成功的内容不会重新上传，
+    返回的结果只包含之前创建的 page 的 object 和 id，见 idempotency.py
+    """
+    if idempotency_key is None:
+        return await _upload_all(work_to_database_properties, access_token, on_result)
+    key = scoped_key(access_token, idempotency_key)
+    async with get_idempotency_lock(key):
+        hashes = [item_hash(properties) for properties in work_to_database_properties]
+        completed = await find_completed_items(key, hashes)
+        results: list[NPDInfo | ErrorResult | None] = [None] * len(work_to_database_properties)
+        for idx, page_id in completed.items():
+            results[idx] = {"object": "page", "id": page_id}
+            if on_result is not None:
+                on_result(idx, results[idx])
+
+        pending = [idx for idx in range(len(work_to_database_properties)) if idx not in completed]
+        record_tasks = []
+
+        def record(pending_idx: int, result: NPDInfo | ErrorResult) -> None:
+            # 每条上传成功后立即记录，即使请求中途被中断，已经成功的也不会在重试时重复上传
+            idx = pending[pending_idx]
+            if isinstance(result, ErrorResult):
+                result.data = idx
+            else:
+                record_tasks.append(asyncio.create_task(record_completed_item(key, idx, hashes[idx], result["id"])))
+            results[idx] = result
+            if on_result is not None:
+                on_result(idx, result)
+
+        await _upload_all([work_to_database_properties[idx] for idx in pending], access_token, record)
+        await asyncio.gather(*record_tasks)
+    return results
+
+
+async def _upload_all(
+    work_to_database_properties: list[dict], access_token: str, on_result: UploadResultCallback | None = None
+) -> list[NPDInfo | ErrorResult]:
+    semaphore = _get_upload_semaphore(access_token)
+    rejected = await _validate_before_upload(work_to_database_properties, access_token)
+
+    async def upload(idx: int, properties: dict) -> NPDInfo | ErrorResult:
+        if idx in rejected:
+            if on_result is not None:
+                on_result(idx, rejected[idx])
+            return rejected[idx]
+        return await _upload_work(idx, properties, access_token, semaphore, on_result)
+
+    return list(
+        await asyncio.gather(*(upload(idx, properties) for idx, properties in enumerate(work_to_database_properties)))
+    )
+
+
+async def _validate_before_upload(work_to_database_properties: list[dict], access_token: str) -> dict[int, ErrorResult]:
+    """根据目标 database 的 schema 在本地检查上传内容，返回检查不通过的下标及错误，见 property_validator.py"""
+    if not Config.NOTION_PREFLIGHT_VALIDATION:
+        return {}
+    by_database: dict[str, list[int]] = {}
+    for idx, properties in enumerate(work_to_database_properties):
+        database_id = (properties.get("parent") or {}).get("database_id")
+        if database_id:
+            by_database.setdefault(database_id, []).append(idx)
+    rejected = {}
+    for database_id, messages in zip(
+        by_database,
+        await asyncio.gather(
+            *(
+                _validate_database_items(
+                    database_id, [work_to_database_properties[idx] for idx in indices], access_token
                 )
+                for database_id, indices in by_database.items()
             )
+        ),
+    ):
+        for i, message in messages.items():
+            idx = by_database[database_id][i]
+            rejected[idx] = ErrorResult(message=message, code="validation_error", data=idx)
+    if rejected:
+        preflight_rejections.inc(len(rejected))
+    return rejected
+
+
+async def _validate_database_items(database_id: str, items: list[dict], access_token: str) -> dict[int, str]:
+    """返回 items 中不符合 database schema 的下标及错误信息。获取不到 schema 时不检查，交给 notion 判断"""
+    was_cached = await schema_cache.get((access_token, "database", database_id)) is not None
+    database = await get_page_database_by_id(pd_id=database_id, pd_type="database", access_token=access_token)
+    if isinstance(database, ErrorResult):
+        return {}
+    messages = _validate_items(items, database["properties"])
+    if messages and was_cached:
+        # 缓存的 schema 可能已经过期（如用户刚刚在 notion 中添加了列），重新获取后再检查一次，避免误判
+        database = await get_page_database_by_id(
+            pd_id=database_id, pd_type="database", access_token=access_token, refresh=True
+        )
+        if isinstance(database, ErrorResult):
+            return {}
+        messages = _validate_items(items, database["properties"])
+    return messages
+
+
+def _validate_items(items: list[dict], schema: dict[str, dict]) -> dict[int, str]:
+    messages = {}
+    for i, item in enumerate(items):
+        message = validate_page_properties(item.get("properties") or {}, schema)
+        if message is not None:
+            messages[i] = message
+    return messages
+
+
+async def upload_raw_works(
+    works: list[Work],
+    mapping: dict[str, PDToWorkMappingItem | None],
+    database_id: str,
+    access_token: str,
+    on_duplicate: Literal["upload", "skip"] = "upload",
+    page_body: list[PageBodyField] | None = None,
+) -> list[NPDInfo | ErrorResult | DuplicateResult] | ErrorResult:
+    """将原始的 Work 按照 mapping 转换后上传到 database_id。返回结果的顺序与 works 一致，ErrorResult.data 是在 works 中的下标。
+    on_duplicate 为 skip 时，本地记录中已经上传过的文献不再上传，返回 DuplicateResult
+    page_body 中的字段会完整地写入 page 的正文，见 page_content.py
+    """
+    database = await get_page_database_by_id(pd_id=database_id, pd_type="database", access_token=access_token)
+    if isinstance(database, ErrorResult):
+        return database
+    mapping = update_mapping_with_schema(mapping, database["properties"])
+    identifiers = [work_identifiers(work) for work in works]
+    duplicates = await find_uploaded_works(database_id, identifiers) if on_duplicate == "skip" else {}
+    results: list[NPDInfo | ErrorResult | DuplicateResult | None] = [None] * len(works)
+    for idx, page_id in duplicates.items():
+        results[idx] = DuplicateResult(page_id=page_id, data=idx)
+
+    to_upload = [idx for idx in range(len(works)) if idx not in duplicates]
+    upload_data = transform_works_to_pages(database_id, mapping, [works[idx] for idx in to_upload])
+    if page_body:
+        for idx, page in zip(to_upload, upload_data):
+            blocks = work_to_blocks(works[idx], page_body)
+            if blocks:
+                page["children"] = blocks
+    uploaded = []
+    for idx, result in zip(to_upload, await upload_works(upload_data, access_token)):
+        if isinstance(result, ErrorResult):
+            result.data = idx
+        else:
+            uploaded.append((identifiers[idx], result["id"]))
+        results[idx] = result
+    await record_uploaded_works(database_id, uploaded)
     return results
 
 
 async def get_page_database_by_id(
-    pd_id: str, pd_type: Literal["page", "database"], access_token: str
+    pd_id: str, pd_type: Literal["page", "database"], access_token: str, refresh: bool = False
 ) -> NPDInfo | ErrorResult:
+    """优先从 schema_cache 中读取。refresh 为 True 时忽略缓存，重新从 notion 获取"""
+    key = (access_token, pd_type, pd_id)
+    if not refresh:
+        cached = await schema_cache.get(key)
+        if cached is not None:
+            return cached
     try:
         if pd_type == "page":
             pd = await notion.pages.retrieve(page_id=pd_id, auth=access_token)
         else:
             pd = await notion.databases.retrieve(database_id=pd_id, auth=access_token)
-        return pd
-    except APIResponseError as error:
-        return ErrorResult(message=json.loads(error.body).get("message", "Notion API error"), code=error.code)
+    except NOTION_ERRORS as error:
+        await schema_cache.pop(key)
+        return to_error_result(error)
+    await schema_cache.set(key, pd)
+    return pd
 
 
 async def exchange_code_for_token(code: str) -> NAccessToken | ErrorResult:
     """用户通过 notion 的 oauth 登录后，拿到的是一个 code，将这个 code 发送到后端，由后端再次向 notion 获取 access token"""
-    token_url = "https://api.notion.com/v1/oauth/token"
+    token_url = f"{Config.NOTION_API_URL}/v1/oauth/token"
     token_data = {
         "grant_type": "authorization_code",
         "code": code,
@@ -115,8 +406,7 @@ async def exchange_code_for_token(code: str) -> NAccessToken | ErrorResult:
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(token_url, json=token_data, headers=token_headers, auth=httpx_auth)
+    response = await http_clients.oauth.post(token_url, json=token_data, headers=token_headers, auth=httpx_auth)
     response_json = response.json()
     if response_json.get("error"):  # 有 error 字段说明出错了
         return ErrorResult(message=response_json.get("error_description"), code=400)
@@ -124,7 +414,7 @@ async def exchange_code_for_token(code: str) -> NAccessToken | ErrorResult:
         access_token_model = NAccessToken.parse_obj(response_json)
     except Exception as e:
         return ErrorResult(message=str(e), code=500)
-    save_access_token(access_token_model=access_token_model)
+    await save_access_token(access_token_model=access_token_model)
     return access_token_model
 
 
@@ -132,7 +422,7 @@ async def get_user_info(user_id: string, access_token: string) -> NUser | ErrorR
     try:
         user_dict = await notion.users.retrieve(user_id=user_id, auth=access_token)
         user_model = NUser.parse_obj(user_dict)
-        save_user(user=user_model)
+        await save_user(user=user_model)
         return user_model
     except APIResponseError as error:
         return ErrorResult(message=error.body, code=error.status)
@@ -0,0 +1,189 @@
+"""
+上传文献的同时上传其参考文献（Work.references），参考文献也作为同一个 database 中的 page，
+并通过 relation 类型的列（references_property）将文献与其参考文献关联起来。
+
+1. 整批文献及其参考文献（包括参考文献的参考文献）按 DOI、arxiv id、标题去重，同一篇只创建一个 page
+2. 之前已经上传到该 database 的参考文献（见 upload_ledger.py）直接使用原来的 page，不再创建
+3. 创建 page 时需要知道参考文献的 page id，因此按依赖关系分为若干轮：
+   第一轮上传没有参考文献（或参考文献都已存在）的，之后每一轮上传参考文献都已经创建完的。
+   同一轮内并发上传，因此一篇文献加 40 篇参考文献只需要两轮
+4. 出现互相引用时，环中的文献只关联已经创建完的参考文献，不会一直等待
+
+已经存在的 page 不会被修改，即不会为其补充 relation。
+"""
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Literal
+
+from src.models import NPDInfo, PDToWorkMappingItem, PageBodyField, Work
+from src.notion_api.api import (
+    ErrorResult,
+    DuplicateResult,
+    get_page_database_by_id,
+    upload_works,
+)
+from src.notion_api.database_work_mapping import transform_works_to_pages, update_mapping_with_schema
+from src.notion_api.page_content import work_to_blocks
+from src.notion_api.upload_ledger import work_identifiers, find_uploaded_works, record_uploaded_works
+
+# notion 的 relation 列一次最多关联 100 个 page
+MAX_RELATIONS = 100
+
+CitationResult = NPDInfo | ErrorResult | DuplicateResult
+
+
+@dataclass
+class _Node:
+    work: Work
+    # 用于去重的标识，包括 work_identifiers 和标题。只有标题相同时，至少一方没有 DOI 等标识才视为同一篇
+    keys: set[str]
+    # 参考文献的节点下标，按在 references 中出现的顺序
+    references: list[int] = field(default_factory=list)
+    # 是否是用户直接上传的文献（而不只是参考文献）
+    is_root: bool = False
+    result: CitationResult | None = None
+
+    @property
+    def page_id(self) -> str | None:
+        if isinstance(self.result, DuplicateResult):
+            return self.result.page_id
+        if self.result is not None and not isinstance(self.result, ErrorResult):
+            return self.result["id"]
+        return None
+
+
+def _title_key(work: Work) -> str | None:
+    if not work.title:
+        return None
+    return "title:" + " ".join(work.title.lower().split())
+
+
+class _CitationGraph:
+    def __init__(self) -> None:
+        self.nodes: list[_Node] = []
+        self._index: dict[str, int] = {}
+
+    def add(self, work: Work, is_root: bool = False) -> int | None:
+        """返回 work 对应的节点下标。已经有相同标识的节点时合并到该节点；没有标题的参考文献无法上传，返回 None"""
+        identifiers = set(work_identifiers(work))
+        title_key = _title_key(work)
+        keys = identifiers | {title_key} if title_key is not None else identifiers
+        existing = next((self._index[key] for key in identifiers if key in self._index), None)
+        if existing is None and title_key in self._index:
+            candidate = self._index[title_key]
+            # 标题相同但 DOI 等标识不同的，视为不同的文献
+            if not identifiers or self.nodes[candidate].keys == {title_key}:
+                existing = candidate
+        if existing is None:
+            if title_key is None and not is_root:
+                return None
+            existing = len(self.nodes)
+            self.nodes.append(_Node(work=work, keys=set()))
+        node = self.nodes[existing]
+        node.keys |= keys
+        node.is_root = node.is_root or is_root
+        for key in keys:
+            self._index.setdefault(key, existing)
+        return existing
+
+    def build(self, works: list[Work]) -> list[int]:
+        """返回 works 中每一篇对应的节点下标。先添加所有直接上传的文献，保证合并时保留的是内容最完整的 Work"""
+        roots = [self.add(work, is_root=True) for work in works]
+        stack = list(dict.fromkeys(roots))
+        visited = set()
+        while stack:
+            idx = stack.pop()
+            if idx in visited:
+                continue
+            visited.add(idx)
+            node = self.nodes[idx]
+            for reference in node.work.references or []:
+                ref_idx = self.add(reference)
+                if ref_idx is not None and ref_idx != idx and ref_idx not in node.references:
+                    node.references.append(ref_idx)
+                    stack.append(ref_idx)
+        return roots
+
+    def waves(self, pending: set[int]) -> list[list[int]]:
+        """将 pending 中的节点按依赖关系分为若干轮，每一轮的节点只依赖之前几轮的节点或者不在 pending 中的节点"""
+        waves = []
+        remaining = set(pending)
+        while remaining:
+            ready = [idx for idx in sorted(remaining) if not remaining.intersection(self.nodes[idx].references)]
+            if not ready:
+                # 剩余的节点都在环中，先上传依赖最少的一个
+                ready = [min(sorted(remaining), key=lambda i: len(remaining.intersection(self.nodes[i].references)))]
+            waves.append(ready)
+            remaining.difference_update(ready)
+        return waves
+
+
+def _check_references_property(database: NPDInfo, references_property: str) -> str | None:
+    """references_property 必须是关联到同一个 database 的 relation 列，返回错误信息"""
+    pd_property = database["properties"].get(references_property)
+    if pd_property is None:
+        return f"{references_property} is not a property that exists."
+    if pd_property["type"] != "relation":
+        return f"{references_property} is expected to be relation."
+    related_database_id = (pd_property.get("relation") or {}).get("database_id")
+    if related_database_id and related_database_id.replace("-", "") != database["id"].replace("-", ""):
+        return f"{references_property} must be a relation to the same database."
+    return None
+
+
+async def upload_citation_graph(
+    works: list[Work],
+    mapping: dict[str, PDToWorkMappingItem | None],
+    database_id: str,
+    access_token: str,
+    references_property: str,
+    on_duplicate: Literal["upload", "skip"] = "upload",
+    page_body: list[PageBodyField] | None = None,
+) -> list[CitationResult] | ErrorResult:
+    """与 api.upload_raw_works 相同，返回结果与 works 一一对应，只包括 works 本身，不包括参考文献。
+    参考文献之前已经上传过时总是使用原来的 page；works 本身是否使用原来的 page 由 on_duplicate 决定
+    """
+    database = await get_page_database_by_id(pd_id=database_id, pd_type="database", access_token=access_token)
+    if isinstance(database, ErrorResult):
+        return database
+    message = _check_references_property(database, references_property)
+    if message is not None:
+        return ErrorResult(message=message, code="validation_error")
+    mapping = update_mapping_with_schema(mapping, database["properties"])
+    # references_property 由这里填写，忽略 mapping 中的设置
+    mapping = {name: item for name, item in mapping.items() if name != references_property}
+
+    graph = _CitationGraph()
+    roots = graph.build(works)
+    nodes = graph.nodes
+    # 合并后的节点可能有多个 Work 的标识
+    identifiers = [sorted(key for key in node.keys if not key.startswith("title:")) for node in nodes]
+    for idx, page_id in (await find_uploaded_works(database_id, identifiers)).items():
+        if not nodes[idx].is_root or on_duplicate == "skip":
+            nodes[idx].result = DuplicateResult(page_id=page_id)
+
+    for wave in graph.waves({idx for idx, node in enumerate(nodes) if node.result is None}):
+        pages = transform_works_to_pages(database_id, mapping, [nodes[idx].work for idx in wave])
+        for idx, page in zip(wave, pages):
+            related = [nodes[ref].page_id for ref in nodes[idx].references if nodes[ref].page_id is not None]
+            if related:
+                page["properties"][references_property] = {
+                    "relation": [{"id": page_id} for page_id in related[:MAX_RELATIONS]]
+                }
+            blocks = work_to_blocks(nodes[idx].work, page_body) if page_body else []
+            if blocks:
+                page["children"] = blocks
+        uploaded = []
+        for idx, result in zip(wave, await upload_works(pages, access_token)):
+            nodes[idx].result = result
+            if not isinstance(result, ErrorResult):
+                uploaded.append((identifiers[idx], result["id"]))
+        await record_uploaded_works(database_id, uploaded)
+
+    # 同一篇文献在 works 中出现多次时，每一次都需要单独的 data
+    return [
+        dataclasses.replace(nodes[root].result, data=i)
+        if isinstance(nodes[root].result, (ErrorResult, DuplicateResult))
+        else nodes[root].result
+        for i, root in enumerate(roots)
+    ]
@@ -0,0 +1,219 @@
+"""
+用户 database 的本地副本及全文搜索。notion.search 只匹配标题，而且每次都要请求 notion，
+同步到本地后可以按标题、作者、摘要、DOI 搜索，不再请求 notion。
+
+同步（sync_database）：
+1. 通过 databases.query 获取 last_edited_time 不早于上一次同步进度（MirrorSyncState.cursor）的 page，
+   按 last_edited_time 从早到晚排序，每 100 个写入一次数据库并更新进度，中途出错时下一次从出错的地方继续
+2. notion 的 last_edited_time 只精确到分钟，因此与上一次同步的最后一分钟内修改过的 page 会被再次获取，
+   last_edited_time 与本地相同的不会重新建立索引
+3. 增量同步无法发现被删除（移到回收站）的 page，full 为 True 时获取所有 page，并删除本地多出来的
+4. 建立索引使用的列变化后（如 mapping 中换了作者列），自动进行一次 full 同步
+
+搜索（search_mirror）只读取本地数据库，索引见 db_models.MirrorTerm。
+查询中的每个词都必须匹配，最后一个词按前缀匹配，便于边输入边搜索。
+副本按 database 保存，所有能访问该 database 的用户共用，搜索前会确认当前用户可以访问该 database。
+"""
+import json
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any
+
+from src.cache import SingleFlight
+from src.database.db_client import (
+    get_mirror_sync_state,
+    get_mirror_edited_times,
+    save_mirror_pages,
+    search_mirror as search_mirror_pages,
+)
+from src.models import MirrorSearchHit, MirrorSyncStatus, PDToWorkMappingItem
+from src.notion_api.api import ErrorResult, get_page_database_by_id, notion, to_error_result
+from src.notion_api.retry import NOTION_ERRORS
+from src.shared_state import hash_key
+
+# 词出现在某一列中时的权重，同一个词出现在多列中时相加
+FIELD_WEIGHTS = {"title": 8, "authors": 4, "doi": 4, "abstract": 1}
+# Work 的字段名与副本中的列的对应关系，用于从 mapping 中找到作者、摘要、DOI 列
+_WORK_FIELDS = {"authors": "authors", "abstract": "abstract", "DOI": "doi"}
+# 没有 mapping 时按列名（不区分大小写）查找
+_COLUMN_NAMES = {"authors": ("authors", "author", "作者"), "abstract": ("abstract", "摘要"), "doi": ("doi",)}
+# 过长的词（如 url）没有搜索的意义
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+
+# 中文、日文的词之间没有空格，每个字作为一个词；其他文字按字母、数字的连续序列分词
+_CJK = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff"
+_TOKEN = re.compile(rf"[{_CJK}]|[^\W_{_CJK}]+")
+
+_sync_single_flight = SingleFlight()
+
+
+def tokenize(text: str) -> list[str]:
+    """转换为小写并去掉重音符号（é -> e），返回去重后的词，顺序与出现的顺序相同"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return list(dict.fromkeys(term for term in _TOKEN.findall(text) if len(term) <= MAX_TERM_LENGTH))
+
+
+def property_text(value: dict) -> str:
+    """databases.query 返回的 page 属性值转换为纯文本，relation、rollup 等无法转换的返回空字符串"""
+    pd_type = value.get("type")
+    content = value.get(pd_type)
+    if content is None:
+        return ""
+    if pd_type in ("title", "rich_text"):
+        return "".join(text.get("plain_text", "") for text in content)
+    if pd_type in ("select", "status"):
+        return content.get("name", "")
+    if pd_type == "multi_select":
+        return ", ".join(option.get("name", "") for option in content)
+    if pd_type == "people":
+        return ", ".join(person.get("name") or "" for person in content)
+    if pd_type in ("url", "email", "phone_number"):
+        return content
+    if pd_type == "number":
+        return str(content)
+    if pd_type == "formula":
+        result = content.get(content.get("type"))
+        return "" if result is None or isinstance(result, dict) else str(result)
+    return ""
+
+
+def index_columns(
+    properties: dict[str, dict], mapping: dict[str, PDToWorkMappingItem | None] | None
+) -> dict[str, str | None]:
+    """返回标题、作者、摘要、DOI 分别对应 database 的哪一列，没有对应的列时为 None。
+    标题是 title 类型的列；其他的优先按 mapping 查找，mapping 中没有时按列名查找
+    """
+    columns: dict[str, str | None] = {field: None for field in FIELD_WEIGHTS}
+    columns["title"] = next((name for name, prop in properties.items() if prop["type"] == "title"), None)
+    for name, item in (mapping or {}).items():
+        field = _WORK_FIELDS.get(item.workPropertyName) if item is not None else None
+        if field is not None and name in properties and columns[field] is None:
+            columns[field] = name
+    lower_names = {name.lower(): name for name in properties}
+    for field, candidates in _COLUMN_NAMES.items():
+        if columns[field] is None:
+            columns[field] = next((lower_names[c] for c in candidates if c in lower_names), None)
+    return columns
+
+
+def _page_to_row(page: dict, columns: dict[str, str | None]) -> dict[str, str]:
+    row = {"page_id": page["id"], "url": page.get("url") or "", "last_edited_time": page["last_edited_time"]}
+    for field, column in columns.items():
+        value = page["properties"].get(column) if column is not None else None
+        row[field] = property_text(value) if value is not None else ""
+    return row
+
+
+def _row_terms(row: dict[str, str]) -> list[dict[str, Any]]:
+    weights: dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(row[field]):
+            weights[term] = weights.get(term, 0) + weight
+    return [dict(page_id=row["page_id"], term=term, weight=weight) for term, weight in weights.items()]
+
+
+async def sync_database(
+    database_id: str,
+    access_token: str,
+    mapping: dict[str, PDToWorkMappingItem | None] | None = None,
+    full: bool = False,
+) -> MirrorSyncStatus | ErrorResult:
+    """将 database 同步到本地。同一个用户以相同的参数同时发起的同步只会进行一次，共享同一个结果；
+    access token 不同时需要分别确认能否访问该 database，mapping 不同时建立索引使用的列可能不同，都不会共享。
+    运行多个 worker 时，不同 worker 可能同时同步同一个 database，写入时使用 upsert，不会因为主键冲突出错
+    """
+    mapping_key = tuple(sorted((name, item.workPropertyName) for name, item in (mapping or {}).items() if item))
+    return await _sync_single_flight.do(
+        (database_id, full, hash_key(access_token), mapping_key),
+        lambda: _sync_database(database_id, access_token, mapping, full),
+    )
+
+
+async def _sync_database(
+    database_id: str,
+    access_token: str,
+    mapping: dict[str, PDToWorkMappingItem | None] | None,
+    full: bool,
+) -> MirrorSyncStatus | ErrorResult:
+    # 同时用于确认 access token 可以访问该 database
+    database = await get_page_database_by_id(
+        pd_id=database_id, pd_type="database", access_token=access_token, refresh=True
+    )
+    if isinstance(database, ErrorResult):
+        return database
+    columns = index_columns(database["properties"], mapping)
+    columns_json = json.dumps(columns, sort_keys=True)
+    try:
+        state = await get_mirror_sync_state(database_id)
+        reindex = state is None or state[1] != columns_json
+        full = full or reindex
+        # full 同步结束后，删除 notion 中已经不存在的 page
+        stale = set(await get_mirror_edited_times(database_id)) if full else set()
+    except Exception as e:
+        return ErrorResult(message=f"Failed to read the local mirror: {e}", code=500)
+    cursor = None if full else state[0]
+    status = MirrorSyncStatus(database_id=database_id, full=full)
+
+    options: dict[str, Any] = {
+        "database_id": database_id,
+        "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}],
+        "page_size": 100,
+        "auth": access_token,
+    }
+    if cursor is not None:
+        options["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor}}
+    while True:
+        try:
+            response = await notion.databases.query(**options)
+        except NOTION_ERRORS as error:
+            return to_error_result(error)
+        pages = response["results"]
+        status.fetched += len(pages)
+        try:
+            edited_times = {} if reindex else await get_mirror_edited_times(database_id, [p["id"] for p in pages])
+            rows, terms, deleted = [], [], []
+            for page in pages:
+                stale.discard(page["id"])
+                if page.get("archived") or page.get("in_trash"):
+                    deleted.append(page["id"])
+                elif edited_times.get(page["id"]) != page["last_edited_time"]:
+                    row = _page_to_row(page, columns)
+                    rows.append(row)
+                    terms.extend(_row_terms(row))
+                cursor = max(cursor or page["last_edited_time"], page["last_edited_time"])
+            if not response["has_more"]:
+                # 最后一批同时删除本地多出来的 page
+                deleted.extend(sorted(stale))
+            await save_mirror_pages(database_id, rows, terms, deleted, cursor, columns_json)
+        except Exception as e:
+            return ErrorResult(message=f"Failed to write the local mirror: {e}", code=500)
+        status.updated += len(rows)
+        status.deleted += len(deleted)
+        if not response["has_more"]:
+            break
+        options["start_cursor"] = response["next_cursor"]
+    return status
+
+
+async def search_mirror(
+    database_id: str, query: str, access_token: str, limit: int = 20
+) -> tuple[list[MirrorSearchHit], datetime] | ErrorResult:
+    """返回搜索结果及上一次同步的时间。从未同步过时返回 code 为 not_synced 的 ErrorResult"""
+    # schema 通常已经缓存，不会请求 notion
+    database = await get_page_database_by_id(pd_id=database_id, pd_type="database", access_token=access_token)
+    if isinstance(database, ErrorResult):
+        return database
+    try:
+        state = await get_mirror_sync_state(database_id)
+        if state is None:
+            return ErrorResult(message="The database has not been synced yet", code="not_synced")
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms:
+            return [], state[2]
+        rows = await search_mirror_pages(database_id, terms[:-1], terms[-1], limit)
+    except Exception as e:
+        return ErrorResult(message=f"Failed to search the local mirror: {e}", code=500)
+    return [MirrorSearchHit(**row) for row in rows], state[2]
@@ -0,0 +1,216 @@
+"""
+将 Work 转换为 notion.pages.create 所需的 properties，逻辑与前端 database-work-mapping.ts 中的
+transformFromWorkToPDItem 保持一致。
+
+mapping 的格式与前端的 PDToWorkMapping 相同：key 是 database 的列名，value 说明这一列对应 Work 的哪个字段。
+同一个 database 的 mapping 基本不会变化，因此每个 mapping 只编译一次，得到一个 Work -> properties 的函数并缓存，
+之后批量转换时直接调用，不再需要逐个字段判断类型。
+"""
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable
+
+from pydantic import AnyUrl, ValidationError
+
+from src.config import Config
+from src.models import Work, PDToWorkMappingItem, NProperty
+
+# notion 的 rich_text 等文本内容最多 2000 个字符
+MAX_TEXT_LENGTH = 2000
+
+PUBLISH_INFO_FIELDS = {"publisher", "containerTitle", "pages", "volume", "issue", "year"}
+
+WorkValue = str | int | float | bool | list[str] | None
+WorkTransformer = Callable[[Work], dict[str, Any]]
+
+
+def _to_plain(value: Any) -> Any:
+    """pydantic 模型中的 enum、url 等转换为普通的 str"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, AnyUrl):
+        return str(value)
+    return value
+
+
+def extract_date(work: Work) -> str | None:
+    publish_info = work.publishInfo
+    if publish_info is None or not publish_info.year:
+        return None
+    return "-".join([publish_info.year, publish_info.month or "01", publish_info.day or "01"])
+
+
+def _make_extractor(work_property_name: str) -> Callable[[Work], WorkValue]:
+    """根据 Work 的字段名，返回从 Work 中取值的函数"""
+    if work_property_name == "date":
+        return extract_date
+    if work_property_name in PUBLISH_INFO_FIELDS:
+        return lambda work: getattr(work.publishInfo, work_property_name, None) or None
+    if work_property_name == "resourceLink":
+
+        def extract_resource_link(work: Work) -> str | None:
+            if work.digitalResources and work.digitalResources[0].resourceLink:
+                return str(work.digitalResources[0].resourceLink)
+            return None
+
+        return extract_resource_link
+    if work_property_name == "authors":
+
+        def extract_authors(work: Work) -> list[str] | None:
+            if not work.authors:
+                return None
+            return [
+                author.fullName or " ".join(filter(None, [author.givenName, author.familyName]))
+                for author in work.authors
+            ]
+
+        return extract_authors
+    if work_property_name in Work.model_fields:
+        return lambda work: _to_plain(getattr(work, work_property_name))
+    return lambda work: None
+
+
+def _is_str_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(ele, str) for ele in value)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _truncate(value: WorkValue) -> WorkValue:
+    if isinstance(value, str):
+        return value[:MAX_TEXT_LENGTH]
+    if _is_str_list(value):
+        return [ele[:MAX_TEXT_LENGTH] for ele in value]
+    return value
+
+
+def _make_converter(pd_property_type: str) -> Callable[[WorkValue, Work], dict | None]:
+    """根据 database 列的类型，返回将 Work 字段值转换为 notion property 值的函数。
+    例如 rich_text 类型的列，"A dark green leafy vegetable" 会转换为
+    {"rich_text": [{"text": {"content": "A dark green leafy vegetable"}}]}
+    """
+    t = pd_property_type
+    if t in ("rich_text", "title"):
+
+        def convert_text(value: WorkValue, work: Work) -> dict | None:
+            if isinstance(value, str):
+                content = value
+            elif _is_number(value):
+                content = str(value)
+            elif _is_str_list(value):
+                content = ";\n".join(value)[:MAX_TEXT_LENGTH]
+            else:
+                content = None
+            return {t: [{"text": {"content": content}}]} if content else None
+
+        return convert_text
+    if t in ("select", "status"):
+        return lambda value, work: {t: {"name": value}}
+    if t == "multi_select":
+
+        def convert_multi_select(value: WorkValue, work: Work) -> dict:
+            if _is_str_list(value):
+                names = value
+            elif isinstance(value, str):
+                names = [value]
+            elif _is_number(value):
+                names = [str(value)]
+            else:
+                names = []
+            # notion 不允许 multi-select 中出现逗号，因此需要删除
+            return {t: [{"name": name.replace(",", "")} for name in names]}
+
+        return convert_multi_select
+    if t in ("url", "checkbox"):
+        return lambda value, work: {t: value}
+    if t == "number":
+
+        def convert_number(value: WorkValue, work: Work) -> dict | None:
+            if _is_number(value):
+                return {t: value}
+            try:
+                return {t: float(value)}
+            except (TypeError, ValueError):
+                return None
+
+        return convert_number
+    if t == "date":
+        return lambda value, work: {t: {"start": value}}
+    if t == "files":
+
+        def convert_files(value: WorkValue, work: Work) -> dict | None:
+            # 默认 value 是文件下载链接。使用 "external" 表示文件并非 notion 内的链接，而是外部链接
+            if not isinstance(value, str):
+                return None
+            file = {"external": {"url": value}}
+            if work.title:
+                file["name"] = work.title[:100]
+            return {t: [file]}
+
+        return convert_files
+    return lambda value, work: None
+
+
+@lru_cache(maxsize=Config.MAPPING_CACHE_SIZE)
+def _compile(mapping_key: tuple[tuple[str, str, str], ...]) -> WorkTransformer:
+    steps = [
+        (pd_property_name, _make_extractor(work_property_name), _make_converter(pd_property_type))
+        for pd_property_name, pd_property_type, work_property_name in mapping_key
+    ]
+
+    def transform(work: Work) -> dict[str, Any]:
+        result = {}
+        for pd_property_name, extract, convert in steps:
+            value = extract(work)
+            if value is None:
+                continue
+            pd_item_value = convert(_truncate(value), work)
+            if pd_item_value:
+                result[pd_property_name] = pd_item_value
+        return result
+
+    return transform
+
+
+def compile_mapping(mapping: dict[str, PDToWorkMappingItem | None]) -> WorkTransformer:
+    """转换时只用到了列名、列的类型以及对应的 Work 字段名，因此以这三者作为缓存的 key"""
+    mapping_key = tuple(
+        sorted(
+            (pd_property_name, item.PDProperty.type.value, item.workPropertyName)
+            for pd_property_name, item in mapping.items()
+            if item is not None
+        )
+    )
+    return _compile(mapping_key)
+
+
+def update_mapping_with_schema(
+    mapping: dict[str, PDToWorkMappingItem | None], properties: dict[str, dict]
+) -> dict[str, PDToWorkMappingItem | None]:
+    """根据 database 最新的 properties 更新 mapping，与前端的 updateExistedPDToWorkMapping 相同：
+    1. 数据库删除了列，删除 mapping 中对应的列
+    2. 数据库修改了某个列的数据类型，修改 mapping 中对应的列
+    """
+    updated = {}
+    for pd_property_name, item in mapping.items():
+        if item is None or pd_property_name not in properties:
+            continue
+        pd_property = properties[pd_property_name]
+        if pd_property["type"] != item.PDProperty.type.value:
+            try:
+                item = item.model_copy(update={"PDProperty": NProperty.model_validate(pd_property)})
+            except ValidationError:  # NProperty 中没有列出的类型，无法对应到 Work 的字段
+                continue
+        updated[pd_property_name] = item
+    return updated
+
+
+def transform_works_to_pages(
+    database_id: str, mapping: dict[str, PDToWorkMappingItem | None], works: list[Work]
+) -> list[dict]:
+    """返回的每一项都可以直接传递给 notion.pages.create"""
+    transform = compile_mapping(mapping)
+    parent = {"type": "database_id", "database_id": database_id}
+    return [{"parent": parent, "properties": transform(work)} for work in works]
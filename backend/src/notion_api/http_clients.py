@@ -0,0 +1,61 @@
+"""
+所有对外的 http 请求（notion-client 的请求、oauth 请求以及获取文献信息的请求）共用一个连接池，保持 keep-alive 连接，
+避免每次请求都重新建立 TLS 连接。连接池在 FastAPI 启动时创建，关闭时释放。
+"""
+import importlib.util
+import logging
+
+import httpx
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_enabled() -> bool:
+    """http2 需要安装 h2（pip install httpx[http2]），没有安装时退回 http1.1"""
+    if not Config.HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2 is enabled but h2 is not installed, falling back to HTTP/1.1")
+        return False
+    return True
+
+
+class HttpClients:
+    def __init__(self):
+        self.timeout = httpx.Timeout(Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT)
+        self._transport: httpx.AsyncHTTPTransport | None = None
+        # 用于 oauth 等不经过 notion-client 的请求
+        self.oauth: httpx.AsyncClient | None = None
+        # 用于 crossref、arxiv 等获取文献信息的请求
+        self.metadata: httpx.AsyncClient | None = None
+
+    def open(self) -> None:
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=_http2_enabled(),
+        )
+        self.oauth = self.create_client()
+        self.metadata = self.create_client()
+
+    def create_client(self) -> httpx.AsyncClient:
+        """返回的 client 都使用同一个连接池。还没有 open 时先 open"""
+        if self._transport is None:
+            self.open()
+        return httpx.AsyncClient(transport=self._transport, timeout=self.timeout)
+
+    async def close(self) -> None:
+        # 所有 client 共用 transport，关闭 transport 即关闭了所有连接
+        if self._transport is not None:
+            await self._transport.aclose()
+            self._transport = None
+            self.oauth = None
+            self.metadata = None
+
+
+http_clients = HttpClients()
@@ -0,0 +1,50 @@
+"""
+上传时可以带上 idempotency key（客户端为每一批上传内容生成的随机字符串，重试时使用同一个）。
+每一条上传成功后立即记录到数据库（见 db_models.UploadResult），之后用同一个 key 重试时：
+    * 之前上传成功、且内容没有变化的，直接返回之前创建的 page，不再请求 notion
+    * 之前上传失败或者还没来得及上传的，重新上传
+只记录成功的结果：失败的内容重试时总是要重新上传，记录下来也用不到。
+
+同一个 key 的请求在同一个进程内串行执行，避免用户连续点击时两个请求同时上传相同的内容。
+"""
+import asyncio
+import hashlib
+import json
+import weakref
+
+from src.config import Config
+from src.database.db_client import get_upload_results, save_upload_results
+
+# 同一个 key 对应一个 lock。与 _upload_semaphores 相同，没有请求持有时会被自动回收
+_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+def scoped_key(access_token: str, idempotency_key: str) -> str:
+    """key 由客户端生成，加上 access token 后不同用户之间不会冲突；hash 后数据库中不会保存 access token"""
+    return hashlib.sha256(f"{access_token}:{idempotency_key}".encode()).hexdigest()
+
+
+def item_hash(item: dict) -> str:
+    return hashlib.sha256(json.dumps(item, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def get_lock(key: str) -> asyncio.Lock:
+    lock = _locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[key] = lock
+    return lock
+
+
+async def find_completed_items(key: str, item_hashes: list[str]) -> dict[int, str]:
+    """返回之前已经上传成功、且内容没有变化的下标及对应的 page id"""
+    completed = await get_upload_results(key)
+    return {
+        idx: page_id
+        for idx, (saved_hash, page_id) in completed.items()
+        if idx < len(item_hashes) and item_hashes[idx] == saved_hash
+    }
+
+
+async def record_completed_item(key: str, idx: int, item_hash_: str, page_id: str) -> bool:
+    return await save_upload_results(key, {idx: (item_hash_, page_id)}, ttl=Config.IDEMPOTENCY_KEY_TTL)
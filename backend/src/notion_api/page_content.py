@@ -0,0 +1,72 @@
+"""
+将 Work 中较长的文本（abstract、highlights、authorComments）写入 page 的正文，而不是 database 的列。
+列中的文本最多 2000 个字符，超过的部分会被截断；写入正文时按 2000 个字符自动分段，内容是完整的。
+
+notion 的限制：
+    * 每个 rich_text 的 content 最多 2000 个字符
+    * pages.create 的 children、blocks.children.append 的 children 每次最多 100 个 block
+    * 每个请求的 body 最多 500KB，因此每个 block 只放一段文本（最多 2000 个字符），100 个 block 也不会超过
+创建 page 时直接带上前 100 个 block，剩余的每 100 个调用一次 blocks.children.append，见 api._upload_work。
+"""
+from src.models import Work, PageBodyField
+from src.notion_api.database_work_mapping import MAX_TEXT_LENGTH
+
+MAX_CHILDREN_PER_REQUEST = 100
+
+_HEADINGS: dict[str, str] = {"abstract": "Abstract", "highlights": "Highlights", "authorComments": "Author Comments"}
+
+
+def chunk_text(text: str, size: int = MAX_TEXT_LENGTH) -> list[str]:
+    """按 size 个字符分段。尽量在空白处断开，避免把一个单词拆到两段中"""
+    chunks = []
+    while len(text) > size:
+        cut = text.rfind(" ", size // 2, size)
+        if cut == -1:
+            cut = size
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def _text_block(block_type: str, content: str) -> dict:
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {"rich_text": [{"type": "text", "text": {"content": content}}]},
+    }
+
+
+def _text_blocks(block_type: str, text: str) -> list[dict]:
+    """超过 2000 个字符的文本拆成多个相同类型的 block"""
+    return [_text_block(block_type, chunk) for chunk in chunk_text(text)]
+
+
+def work_to_blocks(work: Work, fields: list[PageBodyField]) -> list[dict]:
+    """按 fields 的顺序，每个字段是一个标题加上内容。
+    abstract 按空行分为多个段落，highlights 等列表中的每一项是一个列表项
+    """
+    blocks = []
+    for field in fields:
+        value = getattr(work, field)
+        if not value:
+            continue
+        blocks.append(_text_block("heading_2", _HEADINGS[field]))
+        if isinstance(value, str):
+            for paragraph in value.split("\n\n"):
+                if paragraph.strip():
+                    blocks.extend(_text_blocks("paragraph", paragraph.strip()))
+        else:
+            for item in value:
+                if item.strip():
+                    blocks.extend(_text_blocks("bulleted_list_item", item.strip()))
+    return blocks
+
+
+def split_children(children: list[dict]) -> tuple[list[dict], list[list[dict]]]:
+    """返回 (创建 page 时带上的 block, 之后每次 blocks.children.append 的 block)"""
+    rest = children[MAX_CHILDREN_PER_REQUEST:]
+    return children[:MAX_CHILDREN_PER_REQUEST], [
+        rest[i : i + MAX_CHILDREN_PER_REQUEST] for i in range(0, len(rest), MAX_CHILDREN_PER_REQUEST)
+    ]
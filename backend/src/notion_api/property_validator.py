@@ -0,0 +1,106 @@
+"""
+上传前在本地检查 pages.create 的 properties 是否符合目标 database 的 schema，
+不符合的直接返回与 notion 相同的错误信息（见 api.py 开头的说明），不再浪费一次请求和限速额度。
+
+只检查 notion 一定会拒绝的情况：
+    * 不存在的列名
+    * 列的类型不对，或者值的类型不对
+    * status 列传入不存在的选项（select、multi_select 传入不存在的选项时 notion 会自动创建，不算错误）
+    * 日期不是 ISO 8601 格式
+    * 文本超过 2000 个字符
+formula、rollup、created_time 等其他类型不做检查，交给 notion 判断。
+"""
+import json
+from datetime import date, datetime
+
+from src.notion_api.database_work_mapping import MAX_TEXT_LENGTH
+
+_OPTIONAL = type(None)
+# 各类型的属性值应该是什么 python 类型，None 表示清空
+_VALUE_TYPES = {
+    "title": list,
+    "rich_text": list,
+    "number": (int, float, _OPTIONAL),
+    "select": (dict, _OPTIONAL),
+    "multi_select": list,
+    "status": (dict, _OPTIONAL),
+    "date": (dict, _OPTIONAL),
+    "checkbox": bool,
+    "url": (str, _OPTIONAL),
+    "email": (str, _OPTIONAL),
+    "phone_number": (str, _OPTIONAL),
+    "files": list,
+    "people": list,
+    "relation": list,
+}
+
+
+def is_iso_date(value: str) -> bool:
+    """notion 接受 2022-01-01、2022-01-01T12:00:00、2022-01-01T12:00:00.000Z、2022-01-01T12:00:00+08:00 等格式"""
+    try:
+        if len(value) == 10:
+            date.fromisoformat(value)
+        else:
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return True
+    except ValueError:
+        return False
+
+
+def _validate_text(name: str, pd_type: str, value: list) -> str | None:
+    for i, item in enumerate(value):
+        if not isinstance(item, dict):
+            return f"{name} is expected to be {pd_type}."
+        content = (item.get("text") or {}).get("content")
+        if isinstance(content, str) and len(content) > MAX_TEXT_LENGTH:
+            return (
+                f"body failed validation: body.properties.{name}.{pd_type}[{i}].text.content.length "
+                f"should be ≤ `{MAX_TEXT_LENGTH}`, instead was `{len(content)}`."
+            )
+    return None
+
+
+def _validate_status(schema: dict, value: dict) -> str | None:
+    options = (schema.get("status") or {}).get("options") or []
+    if "name" in value and value["name"] not in {option.get("name") for option in options}:
+        return f'Invalid status option. Status option "{value["name"]}" does not exist".'
+    if "id" in value and "name" not in value and value["id"] not in {option.get("id") for option in options}:
+        return f'Invalid status option. Status option "{value["id"]}" does not exist".'
+    return None
+
+
+def _validate_date(name: str, value: dict) -> str | None:
+    start = value.get("start")
+    if isinstance(start, str) and is_iso_date(start):
+        return None
+    return (
+        f"body failed validation: body.properties.{name}.date.start should be a valid ISO 8601 date string, "
+        f"instead was `{json.dumps(start)}`."
+    )
+
+
+def validate_page_properties(properties: dict, schema: dict[str, dict]) -> str | None:
+    """schema 是 notion 返回的 database 的 properties。返回第一个错误的信息，与 notion 相同；没有错误时返回 None"""
+    for name, value in properties.items():
+        pd_schema = schema.get(name)
+        if pd_schema is None:
+            return f"{name} is not a property that exists."
+        pd_type = pd_schema["type"]
+        if pd_type not in _VALUE_TYPES:
+            continue
+        pd_value = value.get(pd_type, ...) if isinstance(value, dict) else ...
+        # bool 是 int 的子类，number 列不能传 bool
+        if not isinstance(pd_value, _VALUE_TYPES[pd_type]) or (pd_type == "number" and isinstance(pd_value, bool)):
+            return f"{name} is expected to be {pd_type}."
+        if pd_type in ("title", "rich_text"):
+            error = _validate_text(name, pd_type, pd_value)
+        elif pd_type == "status" and pd_value is not None:
+            error = _validate_status(pd_schema, pd_value)
+        elif pd_type == "date" and pd_value is not None:
+            error = _validate_date(name, pd_value)
+        else:
+            error = None
+        if error is not None:
+            return error
+    return None
+
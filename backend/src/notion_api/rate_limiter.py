@@ -0,0 +1,300 @@
+"""
+根据 https://developers.notion.com/reference/request-limits，每个 integration 平均每秒 3 个请求（即每15分钟 2700 个），
+允许短时间内的突发请求。超过限制时返回 HTTP 429，header 中的 Retry-After 表示多少秒后可以重试。
+
+这里对每个 access token 维护一个令牌桶（token bucket）：
+    * 每次请求 notion 前都要从桶中取一个令牌，桶空了就等待
+    * 收到 429 时，在 Retry-After 秒内暂停该 access token 的所有请求，并将速率减半
+    * 之后每次请求成功，速率缓慢回升，直到恢复为 Config.NOTION_RATE_LIMIT
+运行多个 worker 时，令牌桶需要保存在数据库中，所有 worker 共用，见 shared_state.py
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import httpx
+from notion_client import AsyncClient
+from notion_client.client import BaseClient
+from notion_client.errors import HTTPResponseError, APIResponseError
+
+from src.config import Config
+from src.database.db_client import get_rate_limit_bucket, save_rate_limit_bucket
+from src.notion_api.http_clients import http_clients
+from src.shared_state import is_shared, hash_key
+from src.notion_api.retry import retry_reason, backoff_delay
+from src.metrics import notion_request_duration, notion_rate_limited, notion_validation_errors, notion_retries
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class BucketState:
+    """令牌桶的状态及其计算，进程内的 TokenBucket 和多个 worker 共享的 SharedTokenBucket 共用"""
+
+    tokens: float
+    rate: float
+    updated_at: float
+    # 收到 429 后，在此时间点之前不再发送请求
+    blocked_until: float = 0.0
+
+    def refill(self, now: float, capacity: float) -> None:
+        self.tokens = min(capacity, self.tokens + max(0.0, now - self.updated_at) * self.rate)
+        self.updated_at = max(self.updated_at, now)
+
+    def take(self, now: float, capacity: float) -> float:
+        """取一个令牌，返回还需要等待多少秒，为 0 表示已经取到"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.refill(now, capacity)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def recover(self, now: float, capacity: float, max_rate: float) -> None:
+        """请求成功，速率线性回升"""
+        self.refill(now, capacity)
+        self.rate = min(max_rate, self.rate + max_rate * Config.NOTION_RATE_LIMIT_RECOVERY)
+
+    def slow_down(self, now: float, retry_after: float, min_rate: float) -> None:
+        """收到 429，暂停 retry_after 秒，速率减半，并清空桶中剩余的令牌"""
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.rate = max(min_rate, self.rate / 2)
+        self.tokens = 0
+        self.updated_at = max(self.updated_at, now)
+
+
+class TokenBucket:
+    """进程内的令牌桶"""
+
+    def __init__(self, rate: float, capacity: float, min_rate: float):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.state = BucketState(tokens=capacity, rate=rate, updated_at=time.monotonic())
+        # 保证等待令牌的请求按先来后到的顺序获取令牌
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.state.rate
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while (wait := self.state.take(time.monotonic(), self.capacity)) > 0:
+                await asyncio.sleep(wait)
+
+    async def on_success(self) -> None:
+        if self.state.rate < self.max_rate:
+            self.state.recover(time.monotonic(), self.capacity, self.max_rate)
+
+    async def on_rate_limited(self, retry_after: float) -> None:
+        self.state.slow_down(time.monotonic(), retry_after, self.min_rate)
+
+
+class SharedTokenBucket:
+    """状态保存在数据库中（见 db_models.RateLimitBucket）的令牌桶，同一个 access token 在所有 worker 中共用一个桶。
+    多个 worker 之间用 unix 时间戳计时，各机器的时钟需要同步。
+    每次修改先读取状态，计算后按 version 写回，期间被其他 worker 修改过则重新读取计算。
+    数据库出错时退回到进程内的令牌桶，不会因为数据库的问题导致所有请求都无法发送
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float, min_rate: float):
+        self.key = hash_key(key)
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        # 最近一次读取到的速率，已经是最大速率时请求成功后无需再写数据库
+        self.rate = rate
+        self._fallback = TokenBucket(rate=rate, capacity=capacity, min_rate=min_rate)
+        self._lock = asyncio.Lock()
+
+    async def _update(self, change: Callable[[BucketState, float], T]) -> T:
+        while True:
+            row = await get_rate_limit_bucket(self.key)
+            now = time.time()
+            if row is None:
+                state, version = BucketState(tokens=self.capacity, rate=self.max_rate, updated_at=now), None
+            else:
+                *values, version = row
+                state = BucketState(*values)
+            result = change(state, now)
+            if await save_rate_limit_bucket(self.key, **asdict(state), version=version):
+                self.rate = state.rate
+                return result
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                try:
+                    wait = await self._update(lambda state, now: state.take(now, self.capacity))
+                except Exception as e:
+                    logger.warning("Shared rate limiter is unavailable, using the local one: %s", e)
+                    await self._fallback.acquire()
+                    return
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+    async def on_success(self) -> None:
+        if self.rate >= self.max_rate:
+            return
+        try:
+            await self._update(lambda state, now: state.recover(now, self.capacity, self.max_rate))
+        except Exception as e:
+            logger.warning("Shared rate limiter is unavailable: %s", e)
+
+    async def on_rate_limited(self, retry_after: float) -> None:
+        await self._fallback.on_rate_limited(retry_after)
+        try:
+            await self._update(lambda state, now: state.slow_down(now, retry_after, self.min_rate))
+        except Exception as e:
+            logger.warning("Shared rate limiter is unavailable: %s", e)
+
+
+class RateLimiter:
+    """按 access token 分别限速。只保留最近使用的 max_size 个令牌桶，避免内存无限增长。
+    Config.SHARED_STATE_BACKEND 为 database 时使用 SharedTokenBucket，所有 worker 共用限速
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, max_size: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_size = max_size
+        self._buckets: OrderedDict[str, TokenBucket | SharedTokenBucket] = OrderedDict()
+
+    def get_bucket(self, key: str) -> TokenBucket | SharedTokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if is_shared():
+                bucket = SharedTokenBucket(key, rate=self.rate, capacity=self.capacity, min_rate=self.min_rate)
+            else:
+                bucket = TokenBucket(rate=self.rate, capacity=self.capacity, min_rate=self.min_rate)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+
+def parse_retry_after(error: HTTPResponseError) -> float:
+    """Retry-After 的值是秒数。如果没有该 header 或无法解析，使用默认值"""
+    try:
+        return max(0.0, float(error.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return Config.NOTION_DEFAULT_RETRY_AFTER
+
+
+# notion-client 的方法对应的请求，路径中的 id 替换为 {id}
+_METHOD_NAMES = {
+    ("POST", "pages"): "pages.create",
+    ("GET", "pages/{id}"): "pages.retrieve",
+    ("PATCH", "pages/{id}"): "pages.update",
+    ("GET", "databases/{id}"): "databases.retrieve",
+    ("POST", "databases/{id}/query"): "databases.query",
+    ("POST", "search"): "search",
+    ("GET", "users/{id}"): "users.retrieve",
+    ("GET", "blocks/{id}/children"): "blocks.children.list",
+    ("PATCH", "blocks/{id}/children"): "blocks.children.append",
+}
+_PATH_WORDS = {"pages", "databases", "query", "search", "users", "blocks", "children", "properties", "comments"}
+
+
+def method_name(path: str, method: str) -> str:
+    """将请求转换为 notion-client 的方法名（如 pages.create），用于监控指标"""
+    template = "/".join(part if part in _PATH_WORDS else "{id}" for part in path.strip("/").split("/"))
+    return _METHOD_NAMES.get((method.upper(), template), f"{method.upper()} {template}")
+
+
+class RateLimitedAsyncClient(AsyncClient):
+    """所有 notion api 调用（search、pages.create、databases.retrieve 等）最终都会经过 request 方法，
+    因此在这里统一限速和重试。遇到 429 时，等待 Retry-After 后重试；遇到 5xx、超时等其他暂时性错误时，
+    按指数退避等待后重试（见 retry.py）。最多重试 Config.NOTION_MAX_RETRIES 次，且不超过 Config.NOTION_RETRY_DEADLINE 秒
+    """
+
+    def __init__(self, *args: Any, rate_limiter: RateLimiter, **kwargs: Any):
+        # 不调用 AsyncClient.__init__，它会立即创建一个 httpx.AsyncClient（需要加载证书等），
+        # 而这个 client 在 FastAPI 启动时就会被 http_clients 中的 client 替换掉
+        BaseClient.__init__(self, None, *args, **kwargs)
+        self.rate_limiter = rate_limiter
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """没有设置 client 时（如不经过 FastAPI 启动直接调用），第一次请求时从 http_clients 中创建"""
+        if not self._clients:
+            self.client = http_clients.create_client()
+            self.client.timeout = http_clients.timeout
+        return self._clients[-1]
+
+    @client.setter
+    def client(self, client: httpx.AsyncClient | None) -> None:
+        if client is not None:
+            BaseClient.client.fset(self, client)
+
+    async def request(
+        self,
+        path: str,
+        method: str,
+        query: Optional[Dict[Any, Any]] = None,
+        body: Optional[Dict[Any, Any]] = None,
+        auth: Optional[str] = None,
+    ) -> Any:
+        # 没有传 auth 时，使用的是 integration 自身的 secret，所有这类请求共用一个令牌桶
+        bucket = self.rate_limiter.get_bucket(auth or "")
+        name = method_name(path, method)
+        deadline = time.monotonic() + Config.NOTION_RETRY_DEADLINE
+        retries = 0
+        while True:
+            await bucket.acquire()
+            try:
+                result = await self._timed_request(name, path, method, query, body, auth)
+            except Exception as error:
+                reason = retry_reason(error)
+                if reason is None:
+                    raise
+                if reason == "rate_limited":
+                    # 无论是否重试都要降速，同一 access token 的其他请求也会等待到 Retry-After 之后
+                    delay = parse_retry_after(error)
+                    await bucket.on_rate_limited(delay)
+                else:
+                    delay = backoff_delay(retries)
+                if retries >= Config.NOTION_MAX_RETRIES or time.monotonic() + delay > deadline:
+                    raise
+                if reason != "rate_limited":
+                    await asyncio.sleep(delay)
+                retries += 1
+                notion_retries.inc(method=name, reason=reason)
+                continue
+            await bucket.on_success()
+            return result
+
+    async def _timed_request(
+        self,
+        name: str,
+        path: str,
+        method: str,
+        query: Optional[Dict[Any, Any]],
+        body: Optional[Dict[Any, Any]],
+        auth: Optional[str],
+    ) -> Any:
+        """记录每次请求的耗时（不包括等待令牌的时间）和出错的类型"""
+        with notion_request_duration.time(method=name, status="200") as labels:
+            try:
+                return await super().request(path, method, query=query, body=body, auth=auth)
+            except HTTPResponseError as error:
+                labels["status"] = str(error.status)
+                if error.status == 429:
+                    notion_rate_limited.inc(method=name)
+                elif isinstance(error, APIResponseError) and error.code == "validation_error":
+                    notion_validation_errors.inc(method=name)
+                raise
+            except Exception:
+                labels["status"] = "error"
+                raise
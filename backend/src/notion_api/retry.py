@@ -0,0 +1,50 @@
+"""
+notion api 请求出错时，判断是否可以重试，以及重试前等待多久。
+
+可以重试（暂时性）的错误：
+    * 429 rate_limited：等待 Retry-After 秒，同时令牌桶降速（见 rate_limiter.py）
+    * 5xx，包括 internal_server_error、service_unavailable，以及 notion 前面的网关返回的 502、504
+    * 409 conflict_error：notion 内部的事务冲突，直接重试即可
+    * 请求超时（RequestTimeoutError）、连接失败等网络错误
+其余的错误（validation_error、unauthorized、object_not_found 等，见 api.py 开头的说明）重试也不会成功，直接返回给用户。
+
+重试间隔使用带随机抖动的指数退避（full jitter）：第 n 次重试前等待 [0, min(cap, base * 2^n)) 秒，
+避免大量请求在同一时刻重试。从第一次发送开始超过 Config.NOTION_RETRY_DEADLINE 秒后不再重试。
+
+pages.create 超时或返回 5xx 时，notion 有可能已经创建了 page，重试可能产生重复的 page。
+相比整批上传失败，这种情况很少见，而且可以通过上传记录（upload_ledger.py）发现。
+"""
+import random
+
+import httpx
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+from src.config import Config
+
+RETRYABLE_CODES = {"rate_limited", "conflict_error", "internal_server_error", "service_unavailable"}
+# 所有可能由 notion-client 的请求抛出的错误
+NOTION_ERRORS = (HTTPResponseError, RequestTimeoutError, httpx.HTTPError)
+
+
+def retry_reason(error: Exception) -> str | None:
+    """返回重试的原因（用于监控指标），不可以重试时返回 None"""
+    if isinstance(error, APIResponseError) and error.code not in RETRYABLE_CODES:
+        return None
+    if isinstance(error, HTTPResponseError):
+        if error.status == 429:
+            return "rate_limited"
+        if error.status == 409:
+            return "conflict"
+        if error.status >= 500:
+            return "server_error"
+        return None
+    if isinstance(error, (RequestTimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    return None
+
+
+def backoff_delay(retries: int) -> float:
+    """第 retries 次重试（从 0 开始）前等待的秒数"""
+    return random.uniform(0, min(Config.NOTION_RETRY_BACKOFF_CAP, Config.NOTION_RETRY_BACKOFF_BASE * 2**retries))
@@ -0,0 +1,187 @@
+"""
+上传的文献较多时，/upload-works 需要等所有 page 创建完才返回，容易超过代理服务器的超时时间。
+因此提供后台上传任务：提交后立即返回 job id，之后通过 job id 查询进度。
+
+任务在 FastAPI 进程内由固定数量的 worker 执行，排队的任务数也有上限。
+已完成任务的结果保留 Config.UPLOAD_JOB_RESULT_TTL 秒后删除。
+运行多个 worker 时，查询进度的请求可能被分配到其他 worker，因此任务的状态还会定期写入共享的缓存（见 shared_state.py）。
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Literal
+
+from src.config import Config
+from src.models import NPDInfo, UploadJobStatus, UploadJobFailure
+from src.notion_api.api import upload_works, ErrorResult, DuplicateResult
+from src.shared_state import create_cache
+
+UploadJobResult = NPDInfo | ErrorResult | DuplicateResult
+
+
+@dataclass
+class UploadJob:
+    access_token: str
+    data: list[dict] | None
+    # 导入文件时，total 会随着文件的解析不断增加
+    total: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: Literal["pending", "running", "finished", "failed"] = "pending"
+    message: str = ""
+    # 与 data 一一对应，还没上传完的为 None
+    results: list[UploadJobResult | None] = field(default_factory=list)
+    finished_at: float | None = None
+    # 执行任务的函数，默认是将 data 传给 upload_works
+    runner: Callable[["UploadJob"], Awaitable[None]] | None = None
+    idempotency_key: str | None = None
+
+    def set_result(self, idx: int, result: UploadJobResult) -> None:
+        self.results[idx] = result
+
+    def add_item(self) -> int:
+        """任务执行过程中新增一条待上传的内容，返回其下标"""
+        self.results.append(None)
+        self.total += 1
+        return self.total - 1
+
+    def to_status(self) -> UploadJobStatus:
+        failures = []
+        page_ids = {}
+        duplicates = {}
+        for idx, result in enumerate(self.results):
+            if isinstance(result, ErrorResult):
+                failures.append(UploadJobFailure(index=idx, message=result.message, code=result.code))
+            elif isinstance(result, DuplicateResult):
+                duplicates[idx] = result.page_id
+            elif result is not None:
+                page_ids[idx] = result["id"]
+        return UploadJobStatus(
+            job_id=self.id,
+            status=self.status,
+            message=self.message,
+            total=self.total,
+            done=len(failures) + len(page_ids) + len(duplicates),
+            failures=failures,
+            page_ids=page_ids,
+            duplicates=duplicates,
+        )
+
+
+class UploadJobManager:
+    def __init__(self, workers: int, queue_size: int, result_ttl: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self.jobs: dict[str, UploadJob] = {}
+        # 只有 Config.SHARED_STATE_BACKEND 不是 memory 时才需要写入，其他 worker 从这里查询任务的状态
+        self._statuses = create_cache("upload_job", ttl=result_ttl, max_size=queue_size)
+        self._queue: asyncio.Queue[UploadJob] | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(
+        self, work_to_database_properties: list[dict], access_token: str, idempotency_key: str | None = None
+    ) -> UploadJob | ErrorResult:
+        """排队的任务已满时返回 ErrorResult"""
+        return await self.submit_job(
+            UploadJob(
+                access_token=access_token,
+                data=work_to_database_properties,
+                total=len(work_to_database_properties),
+                results=[None] * len(work_to_database_properties),
+                idempotency_key=idempotency_key,
+            )
+        )
+
+    async def submit_job(self, job: UploadJob) -> UploadJob | ErrorResult:
+        """排队的任务已满时返回 ErrorResult"""
+        self._evict_expired_jobs()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return ErrorResult(message="Too many upload jobs, please try again later", code=503)
+        self.jobs[job.id] = job
+        await self._publish(job)
+        return job
+
+    def get(self, job_id: str) -> UploadJob | None:
+        return self.jobs.get(job_id)
+
+    async def get_status(self, job_id: str) -> UploadJobStatus | None:
+        """任务不在当前 worker 中时，从共享的缓存中查询"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_status()
+        if not self._statuses.shared:
+            return None
+        status = await self._statuses.get(job_id)
+        return None if status is None else UploadJobStatus.model_validate(status)
+
+    async def _publish(self, job: UploadJob) -> None:
+        if self._statuses.shared:
+            await self._statuses.set(job.id, job.to_status().model_dump(mode="json"))
+
+    async def _publish_periodically(self, job: UploadJob) -> None:
+        while True:
+            await asyncio.sleep(Config.UPLOAD_JOB_STATUS_INTERVAL)
+            await self._publish(job)
+
+    def _evict_expired_jobs(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: UploadJob) -> None:
+        job.status = "running"
+        publisher = asyncio.create_task(self._publish_periodically(job)) if self._statuses.shared else None
+        try:
+            if job.runner is not None:
+                await job.runner(job)
+            else:
+                await upload_works(
+                    job.data, job.access_token, on_result=job.set_result, idempotency_key=job.idempotency_key
+                )
+            job.status = "finished"
+        except Exception as e:
+            job.status = "failed"
+            job.message = str(e)
+        except asyncio.CancelledError:
+            # 服务关闭时 worker 被取消，执行到一半的任务不会再继续
+            job.status = "failed"
+            job.message = "Upload job was interrupted by a server shutdown"
+            raise
+        finally:
+            # 上传内容已经不再需要，释放内存
+            job.data = None
+            job.finished_at = time.monotonic()
+            if publisher is not None:
+                publisher.cancel()
+            await self._publish(job)
+
+
+upload_job_manager = UploadJobManager(
+    workers=Config.UPLOAD_JOB_WORKERS, queue_size=Config.UPLOAD_JOB_QUEUE_SIZE, result_ttl=Config.UPLOAD_JOB_RESULT_TTL
+)
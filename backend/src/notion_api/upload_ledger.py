@@ -0,0 +1,48 @@
+"""
+本地记录每个 database 中已经上传过哪些文献（见 db_models.UploadLedger），上传前据此判断是否重复，无需查询 notion。
+只记录通过本后端上传成功的文献，用户在 notion 中手动添加或删除的不会被记录。
+"""
+import re
+
+from src.database.db_client import get_uploaded_pages, save_uploaded_pages
+from src.models import Work
+from src.scrapers.doi import normalize_doi
+
+# arxiv 的 id 可能带有版本号，如 2101.00001v2，同一篇论文的不同版本视为同一篇
+_ARXIV_VERSION = re.compile(r"v\d+$")
+_ARXIV_PREFIX = re.compile(r"^https?://arxiv\.org/abs/", re.IGNORECASE)
+
+
+def work_identifiers(work: Work) -> list[str]:
+    """返回文献的所有标识。DOI 不区分大小写；arxiv 的 id 去掉链接前缀和版本号"""
+    identifiers = []
+    if work.DOI:
+        identifiers.append(f"doi:{normalize_doi(work.DOI)}")
+    if work.platform and work.platformId:
+        platform_id = work.platformId.strip()
+        if work.platform.value == "arXiv":
+            platform_id = _ARXIV_VERSION.sub("", _ARXIV_PREFIX.sub("", platform_id))
+        identifiers.append(f"{work.platform.value}:{platform_id}")
+    return identifiers
+
+
+async def find_uploaded_works(database_id: str, works_identifiers: list[list[str]]) -> dict[int, str]:
+    """works_identifiers 的每一项是一篇文献的所有标识。返回已经上传过的文献的下标及对应的 page id"""
+    all_identifiers = list({identifier for identifiers in works_identifiers for identifier in identifiers})
+    if not all_identifiers:
+        return {}
+    uploaded = await get_uploaded_pages(database_id, all_identifiers)
+    duplicates = {}
+    for idx, identifiers in enumerate(works_identifiers):
+        for identifier in identifiers:
+            if identifier in uploaded:
+                duplicates[idx] = uploaded[identifier]
+                break
+    return duplicates
+
+
+async def record_uploaded_works(database_id: str, uploaded: list[tuple[list[str], str]]) -> bool:
+    """uploaded 的每一项是 (文献的所有标识, 创建的 page id)"""
+    return await save_uploaded_pages(
+        database_id, {identifier: page_id for identifiers, page_id in uploaded for identifier in identifiers}
+    )
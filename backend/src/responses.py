@@ -0,0 +1,46 @@
+"""
+所有接口返回的 json 都使用 orjson 序列化。
+
+FastAPI 默认会先用 response_model 校验返回值，再将其转换为只包含 dict、list 等基本类型的对象，最后用 json.dumps 序列化。
+/search-by-title 等接口返回的是 notion 的原始数据，体积较大，这几步占用了不少 CPU。
+接口直接返回 ApiJSONResponse 时会跳过前两步，由 orjson 一次完成序列化。
+"""
+import importlib.util
+import logging
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+else:
+    orjson = None
+    logger.warning("orjson is not installed, falling back to pydantic_core for json serialization")
+
+
+def _default(obj: Any) -> Any:
+    """orjson 不支持的类型。dataclass、Enum、datetime 等 orjson 本身就支持"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return pydantic_core.to_jsonable_python(obj)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is None:
+        return pydantic_core.to_json(content)
+    # UploadJobStatus 的 page_ids 等字段的 key 是 int，需要 OPT_NON_STR_KEYS
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ApiJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def create_response(success: bool, data: Any = None, message: str = "", code: int | str = 0) -> ApiJSONResponse:
+    """返回格式与 ApiResponse 相同，但是不经过 FastAPI 的校验和转换"""
+    return ApiJSONResponse(content={"success": success, "message": message, "data": data, "code": code})
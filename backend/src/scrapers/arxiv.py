@@ -0,0 +1,391 @@
+"""
+根据 arxiv id 批量获取论文信息，与前端 scrapers.ts 中 ArxivScraper 的 fetchRawWorksInfo、parseWorks 相同。
+api 文档见 https://info.arxiv.org/help/api/user-manual.html
+
+* id 较多时拆分为多个请求，每个请求最多 Config.ARXIV_CHUNK_SIZE 个 id
+* arxiv 要求连续请求之间至少间隔 3 秒，所有请求共用一个间隔
+* 返回的 Atom xml 边下载边解析，每解析完一个 entry 就释放，不会把整个 xml 放在内存中
+* 解析结果按带版本号的 id（如 2101.00001v2）缓存。不带版本号的 id 对应的最新版本号单独缓存，有效期较短
+"""
+import asyncio
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator
+
+import httpx
+from pydantic import ValidationError
+
+from src.cache import TTLCache
+from src.config import Config
+from src.models import Work
+from src.notion_api.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+ARXIV_NS = "{http://arxiv.org/schemas/atom}"
+
+_ID_PREFIX = re.compile(r"^(https?://arxiv\.org/abs/|arxiv:)", re.IGNORECASE)
+_VERSION = re.compile(r"v\d+$")
+_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+# key 是带版本号的 id，value 是 Work
+_works_cache = TTLCache(ttl=Config.ARXIV_CACHE_TTL, max_size=Config.ARXIV_CACHE_SIZE)
+# key 是不带版本号的 id，value 是最新版本的带版本号的 id
+_latest_version_cache = TTLCache(ttl=Config.ARXIV_LATEST_VERSION_TTL, max_size=Config.ARXIV_CACHE_SIZE)
+
+_pace_lock = asyncio.Lock()
+_last_request_at = 0.0
+
+# arxiv 网站对文献的主题分类，与前端 models.ts 中的 ARXIV_SUBJECTS 相同
+ARXIV_SUBJECTS = {
+    "cs.AI": "Artificial Intelligence",
+    "cs.AR": "Hardware Architecture",
+    "cs.CC": "Computational Complexity",
+    "cs.CE": "Computational Engineering and Finance and Science",
+    "cs.CG": "Computational Geometry",
+    "cs.CL": "Computation and Language",
+    "cs.CR": "Cryptography and Security",
+    "cs.CV": "Computer Vision and Pattern Recognition",
+    "cs.CY": "Computers and Society",
+    "cs.DB": "Databases",
+    "cs.DC": "Distributed Parallel and Cluster Computing",
+    "cs.DL": "Digital Libraries",
+    "cs.DM": "Discrete Mathematics",
+    "cs.DS": "Data Structures and Algorithms",
+    "cs.ET": "Emerging Technologies",
+    "cs.FL": "Formal Languages and Automata Theory",
+    "cs.GL": "General Literature",
+    "cs.GR": "Graphics",
+    "cs.GT": "Computer Science and Game Theory",
+    "cs.HC": "Human-Computer Interaction",
+    "cs.IR": "Information Retrieval",
+    "cs.IT": "Information Theory",
+    "cs.LG": "Machine Learning",
+    "cs.LO": "Logic in Computer Science",
+    "cs.MA": "Multiagent Systems",
+    "cs.MM": "Multimedia",
+    "cs.MS": "Mathematical Software",
+    "cs.NA": "Numerical Analysis",
+    "cs.NE": "Neural and Evolving Computation",
+    "cs.NI": "Networking and Internet Architecture",
+    "cs.OH": "Other Computer Science",
+    "cs.OS": "Operating Systems",
+    "cs.PF": "Performance",
+    "cs.PL": "Programming Languages",
+    "cs.RO": "Robotics",
+    "cs.SC": "Symbolic Computation",
+    "cs.SD": "Sound",
+    "cs.SE": "Software Engineering",
+    "cs.SI": "Social and Information Networks",
+    "cs.SY": "Systems and Control",
+    "econ.EM": "Econometrics",
+    "econ.GN": "General Economics",
+    "econ.TH": "Theoretical Economics",
+    "eess.AS": "Audio and Speech Processing",
+    "eess.IV": "Image and Video Processing",
+    "eess.SP": "Signal Processing",
+    "eess.SY": "Systems and Control",
+    "math.AC": "Commutative Algebra",
+    "math.AG": "Algebraic Geometry",
+    "math.AP": "Analysis of PDEs",
+    "math.AT": "Algebraic Topology",
+    "math.CA": "Classical Analysis and ODEs",
+    "math.CO": "Combinatorics",
+    "math.CT": "Category Theory",
+    "math.CV": "Complex Variables",
+    "math.DG": "Differential Geometry",
+    "math.DS": "Dynamical Systems",
+    "math.FA": "Functional Analysis",
+    "math.GM": "General Mathematics",
+    "math.GN": "General Topology",
+    "math.GR": "Group Theory",
+    "math.GT": "Geometric Topology",
+    "math.HO": "History and Overview",
+    "math.IT": "Information Theory",
+    "math.KT": "K-Theory and Homology",
+    "math.LO": "Logic",
+    "math.MG": "Metric Geometry",
+    "math.MP": "Mathematical Physics",
+    "math.NA": "Numerical Analysis",
+    "math.NT": "Number Theory",
+    "math.OA": "Operator Algebras",
+    "math.OC": "Optimization and Control",
+    "math.PR": "Probability",
+    "math.QA": "Quantum Algebra",
+    "math.RA": "Rings and Algebras",
+    "math.RT": "Representation Theory",
+    "math.SG": "Symplectic Geometry",
+    "math.SP": "Spectral Theory",
+    "math.ST": "Statistics Theory",
+    "math-ph": "Mathematical Physics",
+    "ASTRO-PH": "Astrophysics",
+    "astro-ph.CO": "Cosmology and Nongalactic Astrophysics",
+    "astro-ph.EP": "Earth and Planetary Astrophysics",
+    "astro-ph.GA": "Astrophysics of Galaxies",
+    "astro-ph.HE": "High Energy Astrophysical Phenomena",
+    "astro-ph.IM": "Instrumentation and Methods for Astrophysics",
+    "astro-ph.SR": "Solar and Stellar Astrophysics",
+    "COND-MAT": "Condensed Matter",
+    "cond-mat.dis-nn": "Disordered Systems and Neural Networks",
+    "cond-mat.mes-hall": "Mesoscale and Nanoscale Physics",
+    "cond-mat.mtrl-sci": "Materials Science",
+    "cond-mat.other": "Other Condensed Matter",
+    "cond-mat.quant-gas": "Quantum Gases",
+    "cond-mat.soft": "Soft Condensed Matter",
+    "cond-mat.stat-mech": "Statistical Mechanics",
+    "cond-mat.str-el": "Strongly Correlated Electrons",
+    "cond-mat.supr-con": "Superconductivity",
+    "gr-qc": "General Relativity and Quantum Cosmology",
+    "hep-ex": "High Energy Physics - Experiment",
+    "hep-lat": "High Energy Physics - Lattice",
+    "hep-ph": "High Energy Physics - Phenomenology",
+    "hep-th": "High Energy Physics - Theory",
+    "nlin.AO": "Adaptation and Self-Organizing Systems",
+    "nlin.CD": "Chaotic Dynamics",
+    "nlin.CG": "Cellular Automata and Lattice Gases",
+    "nlin.PS": "Pattern Formation and Solitons",
+    "nlin.SI": "Exactly Solvable and Integrable Systems",
+    "nucl-ex": "Nuclear Experiment",
+    "nucl-th": "Nuclear Theory",
+    "physics.acc-ph": "Accelerator Physics",
+    "physics.ao-ph": "Atmospheric and Oceanic Physics",
+    "physics.app-ph": "Applied Physics",
+    "physics.atm-clus": "Atomic and Molecular Clusters",
+    "physics.atom-ph": "Atomic Physics",
+    "physics.bio-ph": "Biological Physics",
+    "physics.chem-ph": "Chemical Physics",
+    "physics.class-ph": "Classical Physics",
+    "physics.comp-ph": "Computational Physics",
+    "physics.data-an": "Data Analysis and Statistics and Probability",
+    "physics.ed-ph": "Physics Education",
+    "physics.flu-dyn": "Fluid Dynamics",
+    "physics.gen-ph": "General Physics",
+    "physics.geo-ph": "Geophysics",
+    "physics.hist-ph": "History and Philosophy of Physics",
+    "physics.ins-det": "Instrumentation and Detectors",
+    "physics.med-ph": "Medical Physics",
+    "physics.optics": "Optics",
+    "physics.plasm-ph": "Plasma Physics",
+    "physics.pop-ph": "Popular Physics",
+    "physics.soc-ph": "Physics and Society",
+    "physics.space-ph": "Space Physics",
+    "quant-ph": "Quantum Physics",
+    "q-bio.BM": "Biomolecules",
+    "q-bio.CB": "Cell Behavior",
+    "q-bio.GN": "Genomics",
+    "q-bio.MN": "Molecular Networks",
+    "q-bio.NC": "Neurons and Cognition",
+    "q-bio.OT": "Other Quantitative Biology",
+    "q-bio.PE": "Populations and Evolution",
+    "q-bio.QM": "Quantitative Methods",
+    "q-bio.SC": "Subcellular Processes",
+    "q-bio.TO": "Tissues and Organs",
+    "q-fin.CP": "Computational Finance",
+    "q-fin.EC": "Economics",
+    "q-fin.GN": "General Finance",
+    "q-fin.MF": "Mathematical Finance",
+    "q-fin.PM": "Portfolio Management",
+    "q-fin.PR": "Pricing of Securities",
+    "q-fin.RM": "Risk Management",
+    "q-fin.ST": "Statistical Finance",
+    "q-fin.TR": "Trading and Market Microstructure",
+    "stat.AP": "Applications",
+    "stat.CO": "Computation",
+    "stat.ME": "Methodology",
+    "stat.ML": "Machine Learning",
+    "stat.OT": "Other Statistics",
+    "stat.TH": "Statistics Theory",
+}
+
+
+def normalize_arxiv_id(arxiv_id: str) -> str:
+    """id 有两种格式：hep-th/9901001 或 0704.0001v1，也可能是详情页链接 https://arxiv.org/abs/0704.0001v1"""
+    return _ID_PREFIX.sub("", arxiv_id.strip())
+
+
+def _strip_version(arxiv_id: str) -> str:
+    return _VERSION.sub("", arxiv_id)
+
+
+def _version_number(arxiv_id: str) -> int:
+    match = _VERSION.search(arxiv_id)
+    return int(match.group()[1:]) if match else 0
+
+
+def extract_publish_info_from_journal_ref(journal_ref: str) -> dict:
+    """从 journal_ref 字段中提取期刊名、卷号、年份、页码
+    所有 journal_ref 都是 "Phys.Lett. B305 (1993) 115-118" 即期刊名、卷号、年份、页码
+    有可能是 “J.Hasty Results 1 (2008) 1-9; Erratum: J.Hasty Results 2 (2008) 1-2” 这样用 ; 分隔了多个期刊或勘误信息
+    取第一个再解析即可
+    """
+    info = journal_ref.split(";")[0].split(" ")
+    pages = info.pop() if info else None
+    year = info.pop() if info else None
+    container_title = info.pop(0) if info else None
+    return {
+        "containerTitle": container_title,
+        "volume": " ".join(info) or None,
+        "year": year[1:5] if year and year[1:5].isdigit() else None,
+        "pages": pages,
+    }
+
+
+def _text(element: ET.Element, path: str) -> str | None:
+    found = element.find(path)
+    if found is None or found.text is None:
+        return None
+    return found.text.strip()
+
+
+def parse_entry(entry: ET.Element) -> Work | None:
+    """将 Atom xml 中的一个 entry 解析为 Work"""
+    platform_id = _text(entry, f"{ATOM_NS}id")
+    # id 不存在时，arxiv 返回的 entry 的 id 是 http://arxiv.org/api/errors#...
+    if not platform_id or "/api/errors" in platform_id:
+        return None
+
+    # 出版信息。journal_ref 中的信息只在 published 日期中没有时使用
+    publish_info = {}
+    published = _text(entry, f"{ATOM_NS}published")
+    date_match = _DATE.search(published) if published else None
+    if date_match:
+        publish_info = dict(zip(("year", "month", "day"), date_match.groups()))
+    journal_ref = _text(entry, f"{ARXIV_NS}journal_ref")
+    if journal_ref:
+        for key, value in extract_publish_info_from_journal_ref(journal_ref).items():
+            if publish_info.get(key) is None:
+                publish_info[key] = value
+
+    # 详情页、下载链接。如果有 DOI 时，取 DOI 的链接；没有 DOI 时，取 arxiv 链接
+    url = None
+    digital_resources = None
+    for link in entry.iterfind(f"{ATOM_NS}link"):
+        if link.get("rel") == "alternate" and not url:
+            url = link.get("href")
+        if link.get("rel") == "related":
+            if link.get("title") == "pdf":
+                digital_resources = [{"resourceLink": link.get("href"), "contentType": link.get("type")}]
+            if link.get("title") == "doi":
+                url = link.get("href")
+    doi = _text(entry, f"{ARXIV_NS}doi")
+    if doi:
+        url = f"https://dx.doi.org/{doi}"
+
+    authors = [
+        {"fullName": name}
+        for name in (_text(author, f"{ATOM_NS}name") for author in entry.iterfind(f"{ATOM_NS}author"))
+        if name
+    ]
+    subjects = [
+        ARXIV_SUBJECTS[category.get("term")]
+        for category in entry.iterfind(f"{ATOM_NS}category")
+        if category.get("term") in ARXIV_SUBJECTS
+    ]
+    comments = [comment.text for comment in entry.iterfind(f"{ARXIV_NS}comment") if comment.text]
+    try:
+        return Work.model_validate(
+            {
+                "title": _text(entry, f"{ATOM_NS}title"),
+                "platform": "arXiv",
+                "platformId": platform_id,
+                "publishInfo": publish_info or None,
+                "abstract": _text(entry, f"{ATOM_NS}summary"),
+                "authors": authors or None,
+                "url": url,
+                "digitalResources": digital_resources,
+                "subjects": subjects,
+                "authorComments": comments,
+                "DOI": doi,
+            }
+        )
+    except ValidationError as e:
+        logger.warning("Failed to parse arxiv entry %s: %s", platform_id, e)
+        return None
+
+
+async def _wait_for_turn() -> None:
+    """保证连续两次请求 arxiv 的间隔不小于 Config.ARXIV_REQUEST_INTERVAL 秒"""
+    global _last_request_at
+    async with _pace_lock:
+        wait = _last_request_at + Config.ARXIV_REQUEST_INTERVAL - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _last_request_at = time.monotonic()
+
+
+async def _stream_entries(ids: list[str]) -> AsyncIterator[Work]:
+    """请求一批 id，边下载边解析"""
+    await _wait_for_turn()
+    params = {"id_list": ",".join(ids), "max_results": len(ids)}
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    async with http_clients.metadata.stream("GET", f"{Config.ARXIV_API_URL}/api/query", params=params) as response:
+        if response.status_code != 200:
+            logger.warning("Failed to fetch arxiv works: HTTP %s", response.status_code)
+            return
+        async for chunk in response.aiter_bytes():
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = element
+                    continue
+                if element.tag != f"{ATOM_NS}entry":
+                    continue
+                work = parse_entry(element)
+                # 解析完的 entry 从树中删除，释放内存
+                root.remove(element)
+                if work is not None:
+                    yield work
+
+
+def _get_cached(arxiv_id: str) -> Work | None:
+    if _VERSION.search(arxiv_id):
+        return _works_cache.get(arxiv_id)
+    versioned_id = _latest_version_cache.get(arxiv_id)
+    return _works_cache.get(versioned_id) if versioned_id else None
+
+
+async def iter_arxiv_works(ids: list[str]) -> AsyncIterator[tuple[str, Work | None]]:
+    """依次返回 (传入的 id, Work)，顺序与 ids 相同，获取失败的 Work 为 None。
+    每获取完一批就返回这一批的结果，调用者无需等待全部获取完
+    """
+    normalized = [normalize_arxiv_id(arxiv_id) for arxiv_id in ids]
+    missing = list(dict.fromkeys(arxiv_id for arxiv_id in normalized if _get_cached(arxiv_id) is None))
+    # 传入的 id 在 missing 中的位置，用于判断某个 id 所在的那一批是否已经获取完
+    missing_positions = {arxiv_id: i for i, arxiv_id in enumerate(missing)}
+    fetched_count = 0
+    yielded = 0
+    for start in range(0, len(missing), Config.ARXIV_CHUNK_SIZE) if missing else [0]:
+        chunk = missing[start : start + Config.ARXIV_CHUNK_SIZE]
+        if chunk:
+            requested = set(chunk)
+            # 同一批中可能同时请求了 2101.00001 和 2101.00001v1，最新版本取这一批中见到的最大版本号
+            latest: dict[str, str] = {}
+            try:
+                async for work in _stream_entries(chunk):
+                    versioned_id = normalize_arxiv_id(work.platformId)
+                    base_id = _strip_version(versioned_id)
+                    _works_cache.set(versioned_id, work)
+                    if base_id not in requested:
+                        continue
+                    if _version_number(versioned_id) > _version_number(latest.get(base_id, "")):
+                        latest[base_id] = versioned_id
+                        _latest_version_cache.set(base_id, versioned_id)
+            except (httpx.HTTPError, ET.ParseError) as e:
+                logger.warning("Failed to fetch arxiv works: %s", e)
+            fetched_count = start + len(chunk)
+        while yielded < len(normalized):
+            arxiv_id = normalized[yielded]
+            if missing_positions.get(arxiv_id, -1) >= fetched_count:
+                break
+            yield ids[yielded], _get_cached(arxiv_id)
+            yielded += 1
+
+
+async def fetch_arxiv_works(ids: list[str]) -> list[Work | None]:
+    """返回结果与 ids 一一对应，获取失败的为 None"""
+    return [work async for _, work in iter_arxiv_works(ids)]
@@ -0,0 +1,156 @@
+"""
+给定 DOI，从 crossref.org 的 api 中获取论文信息，与前端 scrapers.ts 中的 DOIScraper 相同。
+json api 的全部字段内容见 https://api.crossref.org/swagger-ui/index.html#/Works/get_works__doi_
+字段含义见 https://github.com/CrossRef/rest-api-doc/blob/master/api_format.md
+
+结果保存在数据库中（见 db_models.DOIMetadata），所有用户共用，热门论文无需再请求 crossref。
+一次传入多个 DOI 时，未缓存的 DOI 并发请求 crossref，同时进行的请求数不超过 Config.DOI_RESOLVER_CONCURRENCY。
+"""
+import asyncio
+import logging
+import re
+from typing import Any
+from urllib.parse import quote
+
+import httpx
+from pydantic import ValidationError
+
+from src.cache import SingleFlight
+from src.config import Config
+from src.database.db_client import get_doi_metadata, save_doi_metadata
+from src.importers.common import build_work
+from src.models import Work
+from src.notion_api.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+_DOI_PREFIX = re.compile(r"^(https?://(dx\.)?doi\.org/|doi:)", re.IGNORECASE)
+
+_semaphore: asyncio.Semaphore | None = None
+_single_flight = SingleFlight()
+
+
+def normalize_doi(doi: str) -> str:
+    """DOI 不区分大小写，去掉 https://doi.org/ 等前缀后统一转为小写"""
+    return _DOI_PREFIX.sub("", doi.strip()).lower()
+
+
+def _int_to_str_with_zero(n: int | None) -> str | None:
+    if n is None:
+        return None
+    return f"{n:02d}"
+
+
+def _first(values: list | None) -> Any:
+    return values[0] if values else None
+
+
+def crossref_to_work(message: dict) -> Work | None:
+    """将 crossref 返回的 message 字段转换为 Work"""
+    date_parts = _first((message.get("issued") or {}).get("date-parts")) or []
+    work = {
+        "title": _first(message.get("title")),
+        "abstract": message.get("abstract"),
+        "referencedByCount": message.get("is-referenced-by-count"),
+        "DOI": message.get("DOI"),
+        # 这个地址实际上是 crossref 提供的 DOI 链接，点击后会自动跳转到实际的文献页面
+        "url": message.get("URL"),
+        "type": message.get("type"),
+        "subtitle": _first(message.get("subtitle")),
+        "subjects": message.get("subject"),
+        "ISBN": message.get("ISBN"),
+        "publishInfo": {
+            "publisher": message.get("publisher"),
+            "containerTitle": _first(message.get("container-title")),
+            "issue": message.get("issue"),
+            "volume": message.get("volume"),
+            "pages": message.get("page"),
+            "year": str(date_parts[0]) if len(date_parts) > 0 and date_parts[0] else None,
+            "month": _int_to_str_with_zero(date_parts[1]) if len(date_parts) > 1 else None,
+            "day": _int_to_str_with_zero(date_parts[2]) if len(date_parts) > 2 else None,
+        },
+        "authors": [
+            {
+                "familyName": author.get("family"),
+                "givenName": author.get("given"),
+                "fullName": " ".join(filter(None, [author.get("given"), author.get("family")])) or author.get("name"),
+                "ORCID": author.get("ORCID"),
+            }
+            for author in message.get("author", [])
+        ]
+        or None,
+        "digitalResources": [
+            {"resourceLink": link.get("URL"), "contentType": link.get("content-type")}
+            for link in message.get("link", [])
+        ]
+        or None,
+        "clinicalTrial": [
+            {"id": trial.get("clinical-trial-number"), "registry": trial.get("registry")}
+            for trial in message.get("clinical-trial-number", [])
+        ]
+        or None,
+    }
+    # crossref 的数据不一定规范（如 type 不在 WorkType 中、链接格式不对），去掉无法解析的字段后重试
+    return build_work(work)
+
+
+async def _fetch_from_crossref(doi: str) -> tuple[bool, Work | None]:
+    """返回 (是否应该缓存, Work)。crossref 中不存在该 DOI 时返回 (True, None)；网络错误等返回 (False, None)"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(Config.DOI_RESOLVER_CONCURRENCY)
+    params = {"mailto": Config.CROSSREF_MAILTO} if Config.CROSSREF_MAILTO else None
+    async with _semaphore:
+        try:
+            response = await http_clients.metadata.get(
+                f"{Config.CROSSREF_API_URL}/works/{quote(doi, safe='/')}", params=params
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Failed to fetch DOI %s from crossref: %s", doi, e)
+            return False, None
+    if response.status_code == 404:
+        return True, None
+    if response.status_code != 200:
+        logger.warning("Failed to fetch DOI %s from crossref: HTTP %s", doi, response.status_code)
+        return False, None
+    # 返回内容不是预期的格式时只影响这一个 DOI
+    try:
+        message = response.json()["message"]
+    except (KeyError, TypeError, ValueError):
+        message = None
+    if not isinstance(message, dict):
+        logger.warning("Failed to parse the crossref response for DOI %s", doi)
+        return False, None
+    return True, crossref_to_work(message)
+
+
+async def resolve_dois(dois: list[str]) -> list[Work | None]:
+    """返回结果与 dois 一一对应，无法获取的为 None"""
+    normalized = [normalize_doi(doi) for doi in dois]
+    unique_dois = list(dict.fromkeys(normalized))
+    works: dict[str, Work | None] = {}
+    for doi, work in (await get_doi_metadata(unique_dois)).items():
+        if work is None:
+            works[doi] = None
+            continue
+        # Work 的字段变化后，之前缓存的内容可能无法解析，此时当作没有缓存，重新请求 crossref 并覆盖
+        try:
+            works[doi] = Work.model_validate_json(work)
+        except ValidationError as e:
+            logger.warning("Ignoring invalid cached metadata for DOI %s: %s", doi, e)
+
+    missing = [doi for doi in unique_dois if doi not in works]
+    # 多个请求同时解析同一个 DOI 时，只请求一次 crossref
+    fetched = await asyncio.gather(
+        *(_single_flight.do(doi, lambda doi=doi: _fetch_from_crossref(doi)) for doi in missing)
+    )
+    found, not_found = {}, {}
+    for doi, (cacheable, work) in zip(missing, fetched):
+        works[doi] = work
+        if cacheable and work is not None:
+            found[doi] = work.model_dump_json(exclude_none=True)
+        elif cacheable:
+            not_found[doi] = None
+    await save_doi_metadata(found, ttl=Config.DOI_CACHE_TTL)
+    await save_doi_metadata(not_found, ttl=Config.DOI_NOT_FOUND_CACHE_TTL)
+    return [works[doi] for doi in normalized]
@@ -0,0 +1,90 @@
+"""
+运行多个 uvicorn worker（或多台机器）时，进程内的状态在 worker 之间不共享：
+同一个 access token 的请求分散到 N 个 worker 后，实际速率是限速的 N 倍；缓存只在各自的 worker 中命中；
+后台上传任务的进度只能在执行它的 worker 上查到。
+
+Config.SHARED_STATE_BACKEND 决定这些状态保存在哪里：
+    * memory（默认）：保存在进程内，只运行一个 worker 时使用，速度最快
+    * database：保存在数据库中（本地为 sqlite，生产环境为 postgresql），所有 worker、所有机器共享。
+      每次读写缓存、每次请求 notion 前取令牌都需要访问一次数据库
+令牌桶见 notion_api/rate_limiter.py，后台任务的状态见 notion_api/upload_jobs.py。
+"""
+import hashlib
+import json
+from typing import Any, Hashable, Iterable
+
+from src.cache import TTLCache
+from src.config import Config
+from src.database.db_client import get_shared_cache, get_shared_cache_many, set_shared_cache, delete_shared_cache
+
+BACKENDS = ("memory", "database")
+if Config.SHARED_STATE_BACKEND not in BACKENDS:
+    raise ValueError(f"SHARED_STATE_BACKEND must be one of {BACKENDS}, got {Config.SHARED_STATE_BACKEND!r}")
+
+
+def is_shared() -> bool:
+    return Config.SHARED_STATE_BACKEND != "memory"
+
+
+def hash_key(key: Hashable) -> str:
+    """key 中可能包含 access token，保存到数据库前转换为 sha256"""
+    return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()
+
+
+class LocalCache:
+    """与 TTLCache 相同，只是接口是异步的，与 DatabaseCache 保持一致"""
+
+    shared = False
+
+    def __init__(self, ttl: float, max_size: int):
+        self._cache = TTLCache(ttl=ttl, max_size=max_size)
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        return self._cache.get(key, default)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """返回已缓存的 key 及其内容，没有缓存的不包含在内"""
+        missing = object()
+        values = {key: self._cache.get(key, missing) for key in keys}
+        return {key: value for key, value in values.items() if value is not missing}
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        self._cache.set(key, value)
+
+    async def pop(self, key: Hashable) -> None:
+        self._cache.pop(key)
+
+
+class DatabaseCache:
+    """缓存内容以 json 的形式保存在 shared_cache 表中，只能缓存可以转换为 json 的内容。
+    数据库出错时视为没有缓存，不影响正常请求
+    """
+
+    shared = True
+
+    def __init__(self, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        value = await get_shared_cache(self.namespace, hash_key(key))
+        return default if value is None else json.loads(value)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """所有 key 只查询一次数据库"""
+        hashed = {hash_key(key): key for key in keys}
+        values = await get_shared_cache_many(self.namespace, list(hashed))
+        return {hashed[key]: json.loads(value) for key, value in values.items()}
+
+    async def set(self, key: Hashable, value: Any) -> None:
+        await set_shared_cache(self.namespace, hash_key(key), json.dumps(value), self.ttl)
+
+    async def pop(self, key: Hashable) -> None:
+        await delete_shared_cache(self.namespace, hash_key(key))
+
+
+def create_cache(namespace: str, ttl: float, max_size: int) -> LocalCache | DatabaseCache:
+    """namespace 用于区分不同的缓存，max_size 只对 memory 有效，数据库中的缓存只按 ttl 过期"""
+    if is_shared():
+        return DatabaseCache(namespace=namespace, ttl=ttl)
+    return LocalCache(ttl=ttl, max_size=max_size)
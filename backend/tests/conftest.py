@@ -0,0 +1,72 @@
+"""
+src.config 在导入时就会读取环境变量，因此必须在导入 src 之前设置好（与 benchmarks/__init__.py 相同）。
+异步的测试使用 anyio 的 pytest 插件（anyio 是 httpx 的依赖，无需另外安装），标记为 @pytest.mark.anyio。
+
+    cd backend
+    python -m pytest
+"""
+import os
+
+import pytest
+
+TEST_ENV = {
+    "PRODUCTION": "0",
+    "NOTION_CLIENT_ID": "test",
+    "NOTION_SECRET": "test",
+    "POSTGRES_URL": "postgres://test",
+}
+for key, value in TEST_ENV.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    """db_client 使用临时目录中的一个新的、没有任何表的 sqlite 数据库"""
+    from sqlalchemy.dialects.sqlite import insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from src.database import db_client
+
+    monkeypatch.setattr(
+        db_client,
+        "_create_engine",
+        lambda: (create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'database.db'}"), insert),
+    )
+    return db_client
+
+
+@pytest.fixture
+async def db(empty_db):
+    """每个测试使用一个新的 sqlite 数据库，已经迁移到最新版本"""
+    await empty_db.check_migrations()
+    yield empty_db
+    await empty_db.Session.dispose()
+
+
+@pytest.fixture
+def fake_notion():
+    """notion-client 的请求由 benchmarks/fake_notion.py 在进程内处理"""
+    from benchmarks.fake_notion import FakeNotion, installed
+
+    with installed(FakeNotion()) as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(empty_db):
+    """在进程内启动 FastAPI（包括 lifespan），notion 的请求由 FakeNotion 处理。
+    lifespan 会替换 notion-client 的 httpx client，因此在启动之后再替换为 FakeNotion
+    """
+    from fastapi.testclient import TestClient
+
+    from benchmarks.fake_notion import FakeNotion, installed
+    from main import app
+
+    with TestClient(app) as test_client, installed(FakeNotion()) as fake:
+        test_client.fake_notion = fake
+        yield test_client
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from src.cache import TTLCache
+from src.config import Config
+from src.notion_api.http_clients import http_clients
+from src.scrapers import arxiv
+from src.scrapers.arxiv import fetch_arxiv_works, iter_arxiv_works
+
+ENTRY = """<entry>
+    <id>http://arxiv.org/abs/{id}</id>
+    <published>2017-06-12T17:57:34Z</published>
+    <title>{title}</title>
+    <summary>Abstract of {id}</summary>
+    <author><name>Ashish Vaswani</name></author>
+    <arxiv:comment>15 pages</arxiv:comment>
+    <link href="http://arxiv.org/abs/{id}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/{id}" rel="related" type="application/pdf"/>
+    <category term="cs.CL" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>"""
+ERROR_ENTRY = "<entry><id>http://arxiv.org/api/errors#incorrect_id_format_for_{id}</id><title>Error</title></entry>"
+
+
+class FakeArxiv:
+    """模拟 arxiv 的 /api/query 接口，返回的 Atom xml 分成很小的块，用于检验边下载边解析"""
+
+    def __init__(self, papers: dict[str, int]):
+        # key 是不带版本号的 id，value 是最新的版本号
+        self.papers = papers
+        # 每个请求的 id_list 及收到请求的时间
+        self.requests: list[list[str]] = []
+        self.requested_at: list[float] = []
+
+    def entry(self, arxiv_id: str) -> str:
+        base_id, _, version = arxiv_id.partition("v")
+        if base_id not in self.papers or (version and int(version) > self.papers[base_id]):
+            return ERROR_ENTRY.format(id=arxiv_id)
+        versioned_id = arxiv_id if version else f"{base_id}v{self.papers[base_id]}"
+        return ENTRY.format(id=versioned_id, title=f"Paper {versioned_id}")
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        ids = parse_qs(request.url.query.decode())["id_list"][0].split(",")
+        self.requests.append(ids)
+        self.requested_at.append(time.monotonic())
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">\n'
+            f"  <title>arXiv Query</title>\n  {''.join(self.entry(arxiv_id) for arxiv_id in ids)}\n</feed>"
+        ).encode()
+
+        async def stream():
+            for i in range(0, len(xml), 64):
+                yield xml[i : i + 64]
+
+        return httpx.Response(200, content=stream())
+
+
+@pytest.fixture
+def fake_arxiv(monkeypatch):
+    fake = FakeArxiv({"1706.03762": 2, "1810.04805": 1, "2005.14165": 4, "1409.0473": 7, "1512.03385": 1})
+    monkeypatch.setattr(http_clients, "metadata", httpx.AsyncClient(transport=httpx.MockTransport(fake.handle)))
+    monkeypatch.setattr(arxiv, "_works_cache", TTLCache(ttl=60, max_size=100))
+    monkeypatch.setattr(arxiv, "_latest_version_cache", TTLCache(ttl=60, max_size=100))
+    monkeypatch.setattr(arxiv, "_pace_lock", asyncio.Lock())
+    monkeypatch.setattr(arxiv, "_last_request_at", 0.0)
+    monkeypatch.setattr(Config, "ARXIV_REQUEST_INTERVAL", 0.05)
+    return fake
+
+
+@pytest.mark.anyio
+async def test_fetch_arxiv_works(fake_arxiv):
+    works = await fetch_arxiv_works(["https://arxiv.org/abs/1706.03762", "arxiv:1810.04805v1", "9999.99999"])
+    assert works[0].platformId == "http://arxiv.org/abs/1706.03762v2"
+    assert works[0].title == "Paper 1706.03762v2"
+    assert works[0].publishInfo.year == "2017" and works[0].publishInfo.month == "06"
+    assert works[0].subjects == ["Computation and Language"]
+    assert str(works[0].digitalResources[0].resourceLink) == "http://arxiv.org/pdf/1706.03762v2"
+    assert works[1].platformId == "http://arxiv.org/abs/1810.04805v1"
+    assert works[2] is None
+
+
+@pytest.mark.anyio
+async def test_ids_are_split_into_paced_chunks(fake_arxiv, monkeypatch):
+    monkeypatch.setattr(Config, "ARXIV_CHUNK_SIZE", 2)
+    ids = ["1706.03762", "1810.04805", "2005.14165", "1706.03762", "1409.0473", "1512.03385"]
+    results = []
+    async for arxiv_id, work in iter_arxiv_works(ids):
+        # 每一批获取完就返回，不等后面的批次
+        results.append((arxiv_id, len(fake_arxiv.requests)))
+        assert work is not None
+    # 重复的 id 只请求一次
+    assert fake_arxiv.requests == [["1706.03762", "1810.04805"], ["2005.14165", "1409.0473"], ["1512.03385"]]
+    assert [count for _, count in results] == [1, 1, 2, 2, 2, 3]
+    # 每两次请求之间至少间隔 ARXIV_REQUEST_INTERVAL 秒
+    gaps = [b - a for a, b in zip(fake_arxiv.requested_at, fake_arxiv.requested_at[1:])]
+    assert all(gap >= Config.ARXIV_REQUEST_INTERVAL * 0.95 for gap in gaps)
+
+
+@pytest.mark.anyio
+async def test_explicit_old_version_does_not_replace_latest(fake_arxiv):
+    works = await fetch_arxiv_works(["1706.03762", "https://arxiv.org/abs/1706.03762v1"])
+    assert [work.platformId for work in works] == [
+        "http://arxiv.org/abs/1706.03762v2",
+        "http://arxiv.org/abs/1706.03762v1",
+    ]
+    # 顺序相反时结果相同
+    works = await fetch_arxiv_works(["2005.14165v2", "2005.14165"])
+    assert [work.platformId for work in works] == [
+        "http://arxiv.org/abs/2005.14165v2",
+        "http://arxiv.org/abs/2005.14165v4",
+    ]
+    # 之后从缓存中取到的仍是最新版本
+    fake_arxiv.requests.clear()
+    works = await fetch_arxiv_works(["1706.03762", "2005.14165"])
+    assert fake_arxiv.requests == []
+    assert [work.platformId for work in works] == [
+        "http://arxiv.org/abs/1706.03762v2",
+        "http://arxiv.org/abs/2005.14165v4",
+    ]
+
+
+@pytest.mark.anyio
+async def test_failed_chunk_only_fails_its_ids(fake_arxiv, monkeypatch):
+    monkeypatch.setattr(Config, "ARXIV_CHUNK_SIZE", 1)
+    handle = fake_arxiv.handle
+
+    def flaky(request: httpx.Request) -> httpx.Response:
+        if "1810.04805" in str(request.url):
+            return httpx.Response(503)
+        return handle(request)
+
+    monkeypatch.setattr(http_clients, "metadata", httpx.AsyncClient(transport=httpx.MockTransport(flaky)))
+    works = await fetch_arxiv_works(["1706.03762", "1810.04805", "1512.03385"])
+    assert [work.title if work else None for work in works] == ["Paper 1706.03762v2", None, "Paper 1512.03385v1"]
@@ -0,0 +1,87 @@
+import pytest
+
+from src.models import NProperty, PDToWorkMappingItem, Work
+from src.notion_api.api import DuplicateResult
+from src.notion_api.citation_graph import _CitationGraph, upload_citation_graph
+from src.notion_api.upload_ledger import record_uploaded_works
+
+
+def work(title: str | None, doi: str | None = None, references: list[Work] | None = None) -> Work:
+    return Work.model_validate({"title": title, "DOI": doi, "references": references})
+
+
+def test_build_merges_the_same_work():
+    shared = work("Shared Reference", "10.1/shared")
+    graph = _CitationGraph()
+    roots = graph.build(
+        [
+            work("A", "10.1/a", [shared, work("Untitled DOI only", "10.1/x"), work(None, "10.1/untitled")]),
+            # 同一个 DOI，大小写、前缀不同
+            work("B", "10.1/b", [work("shared reference", "https://doi.org/10.1/SHARED")]),
+            work("a", "10.1/A"),
+        ]
+    )
+    assert roots[0] == roots[2]
+    titles = [node.work.title.lower() for node in graph.nodes]
+    assert sorted(titles) == ["a", "b", "shared reference", "untitled doi only"]
+    shared_idx = titles.index("shared reference")
+    assert graph.nodes[roots[0]].references == [shared_idx, titles.index("untitled doi only")]
+    assert graph.nodes[roots[1]].references == [shared_idx]
+    assert not graph.nodes[shared_idx].is_root
+
+
+def test_same_title_with_different_dois_are_different_works():
+    graph = _CitationGraph()
+    roots = graph.build([work("Erratum", "10.1/e1"), work("Erratum", "10.1/e2"), work("Erratum")])
+    assert roots[0] != roots[1]
+    # 没有 DOI 的合并到第一个同名的
+    assert roots[2] == roots[0]
+
+
+def test_waves_follow_references():
+    c = work("C", "10.1/c")
+    b = work("B", "10.1/b", [c])
+    graph = _CitationGraph()
+    a_idx, b_idx = graph.build([work("A", "10.1/a", [b, c]), b])
+    c_idx = graph.nodes[b_idx].references[0]
+    assert graph.waves(set(range(len(graph.nodes)))) == [[c_idx], [b_idx], [a_idx]]
+    # 不在 pending 中的节点（已经存在的 page）不需要等待
+    assert graph.waves({a_idx, b_idx}) == [[b_idx], [a_idx]]
+
+
+def test_cycles_are_broken():
+    graph = _CitationGraph()
+    a_idx = graph.add(work("A", "10.1/a"), is_root=True)
+    b_idx = graph.add(work("B", "10.1/b"), is_root=True)
+    c_idx = graph.add(work("C", "10.1/c"), is_root=True)
+    graph.nodes[a_idx].references = [b_idx]
+    graph.nodes[b_idx].references = [a_idx]
+    graph.nodes[c_idx].references = [a_idx]
+    # A、B 互相引用，先上传 A（只关联已经创建的参考文献），之后 B、C 的参考文献都已经创建
+    assert graph.waves({a_idx, b_idx, c_idx}) == [[a_idx], [b_idx, c_idx]]
+
+
+MAPPING = {
+    "Name": PDToWorkMappingItem(
+        PDPropertyName="Name",
+        PDProperty=NProperty.model_validate({"id": "title", "name": "Name", "type": "title"}),
+        workPropertyName="title",
+    )
+}
+DATABASE_ID = "7a6b5c4d-0000-0000-0000-000000000000"
+
+
+@pytest.mark.anyio
+async def test_upload_citation_graph(db, fake_notion):
+    await record_uploaded_works(DATABASE_ID, [(["doi:10.1/old"], "existing-page")])
+    c = work("C", "10.1/c")
+    works = [work("A", "10.1/a", [work("B", "10.1/b", [c]), c, work("Old", "10.1/old")])]
+    [result] = await upload_citation_graph(works, MAPPING, DATABASE_ID, "token-graph", "References")
+    # A、B、C 三轮上传，已经存在的参考文献不再创建
+    assert fake_notion.requests["POST pages"] == 3
+    relation = [item["id"] for item in result["properties"]["References"]["relation"]]
+    assert len(relation) == 3 and relation[2] == "existing-page"
+    # 再次上传时参考文献和文献本身都已经存在
+    [again] = await upload_citation_graph(works, MAPPING, DATABASE_ID, "token-graph", "References", on_duplicate="skip")
+    assert again == DuplicateResult(page_id=result["id"], data=0)
+    assert fake_notion.requests["POST pages"] == 3
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from src.notion_api.database_mirror import search_mirror, sync_database, tokenize
+
+DATABASE_ID = "3e4f5a6b-0000-0000-0000-000000000000"
+
+
+def mirror_page(i: int, title: str, authors: str = "", doi: str = "") -> dict:
+    text = lambda content: {"type": "rich_text", "rich_text": [{"type": "text", "plain_text": content}]}
+    return {
+        "object": "page",
+        "id": f"{i:08d}-2222-0000-0000-000000000000",
+        "last_edited_time": f"2024-05-01T12:{i:02d}:00.000Z",
+        "archived": False,
+        "url": f"https://www.notion.so/page{i}",
+        "properties": {
+            "Name": {"type": "title", "title": [{"type": "text", "plain_text": title}]},
+            "Authors": text(authors),
+            "DOI": text(doi),
+        },
+    }
+
+
+def test_tokenize():
+    assert tokenize("Café au lait, café!") == ["cafe", "au", "lait"]
+    assert tokenize("深度学习 model_v2") == ["深", "度", "学", "习", "model", "v2"]
+
+
+@pytest.mark.anyio
+async def test_sync_and_search(db, fake_notion):
+    fake_notion.rows = [
+        mirror_page(1, "Attention is all you need", "Ashish Vaswani", "10.5555/3295222"),
+        mirror_page(2, "Attending carefully", "Someone Else"),
+        mirror_page(3, "Unrelated", "Vaswani"),
+    ]
+    status = await sync_database(DATABASE_ID, "token-mirror")
+    assert (status.fetched, status.updated, status.full) == (3, 3, True)
+    hits, _ = await search_mirror(DATABASE_ID, "vaswani atten", "token-mirror")
+    assert [hit.title for hit in hits] == ["Attention is all you need"]
+    # 最后一个词按前缀匹配
+    hits, _ = await search_mirror(DATABASE_ID, "atten", "token-mirror")
+    assert sorted(hit.title for hit in hits) == ["Attending carefully", "Attention is all you need"]
+    hits, _ = await search_mirror(DATABASE_ID, "10.5555/3295222", "token-mirror")
+    assert [hit.title for hit in hits] == ["Attention is all you need"]
+
+    fake_notion.rows = fake_notion.rows[:2]
+    status = await sync_database(DATABASE_ID, "token-mirror", full=True)
+    assert (status.updated, status.deleted) == (0, 1)
+    hits, _ = await search_mirror(DATABASE_ID, "vaswani", "token-mirror")
+    assert [hit.title for hit in hits] == ["Attention is all you need"]
+
+
+@pytest.mark.anyio
+async def test_prefix_search_escapes_like_wildcards(db):
+    pages = [
+        dict(page_id=page_id, title=page_id, authors="", abstract="", doi="", url="", last_edited_time="2024")
+        for page_id in ("p1", "p2", "p3")
+    ]
+    terms = [
+        dict(page_id="p1", term="a_b", weight=1),
+        dict(page_id="p2", term="axb", weight=1),
+        dict(page_id="p3", term="a%b", weight=1),
+    ]
+    await db.save_mirror_pages(DATABASE_ID, pages, terms, [], None, "{}")
+    assert [row["page_id"] for row in await db.search_mirror(DATABASE_ID, [], "a_", 10)] == ["p1"]
+    assert [row["page_id"] for row in await db.search_mirror(DATABASE_ID, [], "a%", 10)] == ["p3"]
+    assert len(await db.search_mirror(DATABASE_ID, [], "a", 10)) == 3
+
+
+@pytest.mark.anyio
+async def test_terms_written_by_another_worker_do_not_conflict(db):
+    """另一个 worker 同时同步时，可能在本次删除旧的词之后写入了相同的词"""
+    page = dict(page_id="p1", title="t", authors="", abstract="", doi="", url="", last_edited_time="2024")
+    await db.save_mirror_pages(DATABASE_ID, [page], [dict(page_id="p1", term="t", weight=8)], [], None, "{}")
+    await db.save_mirror_pages(DATABASE_ID, [], [dict(page_id="p1", term="t", weight=9)], [], None, "{}")
+    [row] = await db.search_mirror(DATABASE_ID, ["t"], None, 10)
+    assert row["score"] == 9
+
+
+@pytest.mark.anyio
+async def test_concurrent_syncs_are_shared_only_for_the_same_token(db, fake_notion):
+    fake_notion.rows = [mirror_page(1, "A")]
+    await asyncio.gather(
+        sync_database(DATABASE_ID, "token-a"), sync_database(DATABASE_ID, "token-a"), sync_database(DATABASE_ID, "token-b")
+    )
+    # 每个 access token 都需要确认能访问该 database
+    assert fake_notion.requests["GET databases/{id}"] == 2
@@ -0,0 +1,67 @@
+from src.models import NProperty, PDToWorkMappingItem, Work
+from src.notion_api.database_work_mapping import MAX_TEXT_LENGTH, transform_works_to_pages, update_mapping_with_schema
+
+
+def mapping_item(name: str, pd_type: str, work_property_name: str) -> PDToWorkMappingItem:
+    return PDToWorkMappingItem(
+        PDPropertyName=name,
+        PDProperty=NProperty.model_validate({"id": name.lower(), "name": name, "type": pd_type}),
+        workPropertyName=work_property_name,
+    )
+
+
+MAPPING = {
+    "Name": mapping_item("Name", "title", "title"),
+    "Authors": mapping_item("Authors", "multi_select", "authors"),
+    "Abstract": mapping_item("Abstract", "rich_text", "abstract"),
+    "Year": mapping_item("Year", "number", "year"),
+    "Published": mapping_item("Published", "date", "date"),
+    "Link": mapping_item("Link", "url", "url"),
+    "Type": mapping_item("Type", "select", "type"),
+    "Unused": None,
+}
+
+
+def test_transform_work():
+    work = Work.model_validate(
+        {
+            "title": "Attention Is All You Need",
+            "authors": [{"fullName": "Ashish Vaswani"}, {"givenName": "Noam", "familyName": "Shazeer, Jr"}],
+            "abstract": "The dominant sequence transduction models",
+            "url": "https://arxiv.org/abs/1706.03762",
+            "type": "journal-article",
+            "publishInfo": {"year": "2017", "month": "06"},
+        }
+    )
+    [page] = transform_works_to_pages("db", MAPPING, [work])
+    assert page["parent"] == {"type": "database_id", "database_id": "db"}
+    properties = page["properties"]
+    assert properties["Name"] == {"title": [{"text": {"content": "Attention Is All You Need"}}]}
+    # multi_select 中不允许出现逗号
+    assert properties["Authors"] == {"multi_select": [{"name": "Ashish Vaswani"}, {"name": "Noam Shazeer Jr"}]}
+    assert properties["Year"] == {"number": 2017.0}
+    assert properties["Published"] == {"date": {"start": "2017-06-01"}}
+    assert properties["Link"] == {"url": "https://arxiv.org/abs/1706.03762"}
+    assert properties["Type"] == {"select": {"name": "journal-article"}}
+    assert "Unused" not in properties
+
+
+def test_empty_fields_are_skipped_and_long_text_truncated():
+    work = Work.model_validate({"title": "T", "abstract": "x" * (MAX_TEXT_LENGTH + 10)})
+    [page] = transform_works_to_pages("db", MAPPING, [work])
+    assert set(page["properties"]) == {"Name", "Abstract"}
+    assert len(page["properties"]["Abstract"]["rich_text"][0]["text"]["content"]) == MAX_TEXT_LENGTH
+
+
+def test_update_mapping_with_schema():
+    properties = {
+        "Name": {"id": "title", "name": "Name", "type": "title", "title": {}},
+        # 类型从 multi_select 改成了 rich_text
+        "Authors": {"id": "authors", "name": "Authors", "type": "rich_text", "rich_text": {}},
+    }
+    updated = update_mapping_with_schema(MAPPING, properties)
+    assert set(updated) == {"Name", "Authors"}
+    assert updated["Authors"].PDProperty.type.value == "rich_text"
+    work = Work.model_validate({"title": "T", "authors": [{"fullName": "A"}, {"fullName": "B"}]})
+    [page] = transform_works_to_pages("db", updated, [work])
+    assert page["properties"]["Authors"] == {"rich_text": [{"text": {"content": "A;\nB"}}]}
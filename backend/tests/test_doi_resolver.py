@@ -0,0 +1,94 @@
+import httpx
+import pytest
+
+from src.notion_api.http_clients import http_clients
+from src.scrapers import doi as doi_resolver
+from src.scrapers.doi import resolve_dois
+
+
+class FakeCrossref:
+    """模拟 crossref 的 /works/{doi} 接口，与 benchmarks/fake_notion.py 一样替换 httpx client 的 transport"""
+
+    def __init__(self, works: dict[str, dict]):
+        # key 是小写的 DOI，value 是 crossref 返回的 message
+        self.works = works
+        # DOI -> 返回的状态码及内容，用于模拟出错
+        self.responses: dict[str, httpx.Response] = {}
+        self.requested: list[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        doi = request.url.path.removeprefix("/works/")
+        self.requested.append(doi)
+        if doi in self.responses:
+            return self.responses[doi]
+        if doi not in self.works:
+            return httpx.Response(404, text="Resource not found.")
+        return httpx.Response(200, json={"status": "ok", "message-type": "work", "message": self.works[doi]})
+
+
+@pytest.fixture
+def crossref(db, monkeypatch):
+    fake = FakeCrossref(
+        {
+            "10.1000/a": {
+                "DOI": "10.1000/A",
+                "title": ["Paper A"],
+                "type": "journal-article",
+                "issued": {"date-parts": [[2020, 3]]},
+                "author": [{"given": "Ada", "family": "Lovelace"}],
+            },
+            "10.1000/b": {"DOI": "10.1000/b", "title": ["Paper B"]},
+        }
+    )
+    monkeypatch.setattr(http_clients, "metadata", httpx.AsyncClient(transport=httpx.MockTransport(fake.handle)))
+    monkeypatch.setattr(doi_resolver, "_semaphore", None)
+    return fake
+
+
+@pytest.mark.anyio
+async def test_resolve_dois(crossref):
+    works = await resolve_dois(["https://doi.org/10.1000/A", "10.1000/missing", "doi:10.1000/a"])
+    assert works[0].title == "Paper A"
+    assert works[0].publishInfo.year == "2020" and works[0].publishInfo.month == "03"
+    assert works[0].authors[0].fullName == "Ada Lovelace"
+    assert works[1] is None
+    assert works[2] == works[0]
+    # 同一个 DOI 只请求一次
+    assert sorted(crossref.requested) == ["10.1000/a", "10.1000/missing"]
+
+
+@pytest.mark.anyio
+async def test_cached_dois_are_not_fetched_again(crossref):
+    await resolve_dois(["10.1000/a", "10.1000/missing"])
+    crossref.requested.clear()
+    works = await resolve_dois(["10.1000/a", "10.1000/missing", "10.1000/b"])
+    assert [work.title if work else None for work in works] == ["Paper A", None, "Paper B"]
+    assert crossref.requested == ["10.1000/b"]
+
+
+@pytest.mark.anyio
+async def test_bad_response_only_fails_that_doi(crossref):
+    crossref.responses["10.1000/a"] = httpx.Response(200, text="<html>maintenance</html>")
+    crossref.responses["10.1000/c"] = httpx.Response(200, json={"status": "ok"})
+    crossref.responses["10.1000/d"] = httpx.Response(503)
+    works = await resolve_dois(["10.1000/a", "10.1000/b", "10.1000/c", "10.1000/d"])
+    assert [work.title if work else None for work in works] == [None, "Paper B", None, None]
+    # 出错的 DOI 没有被缓存，下一次重新请求
+    crossref.responses.clear()
+    crossref.requested.clear()
+    works = await resolve_dois(["10.1000/a", "10.1000/b"])
+    assert [work.title for work in works] == ["Paper A", "Paper B"]
+    assert crossref.requested == ["10.1000/a"]
+
+
+@pytest.mark.anyio
+async def test_invalid_cached_row_is_fetched_again(crossref, db):
+    # 例如 Work 的字段变化后，之前缓存的内容无法再解析
+    await db.save_doi_metadata({"10.1000/a": '{"title": ["not", "a", "string"]}', "10.1000/b": "not json"}, ttl=60)
+    works = await resolve_dois(["10.1000/a", "10.1000/b"])
+    assert [work.title for work in works] == ["Paper A", "Paper B"]
+    assert sorted(crossref.requested) == ["10.1000/a", "10.1000/b"]
+    # 重新获取的结果覆盖了无法解析的缓存
+    crossref.requested.clear()
+    await resolve_dois(["10.1000/a", "10.1000/b"])
+    assert crossref.requested == []
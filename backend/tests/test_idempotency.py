@@ -0,0 +1,49 @@
+import pytest
+
+from src.notion_api.api import ErrorResult, upload_works
+
+DATABASE_ID = "0f8a1b2c-0000-0000-0000-000000000000"
+
+
+def page(title: str, **properties) -> dict:
+    return {
+        "parent": {"type": "database_id", "database_id": DATABASE_ID},
+        "properties": {"Name": {"title": [{"text": {"content": title}}]}, **properties},
+    }
+
+
+@pytest.mark.anyio
+async def test_retry_only_uploads_failed_items(db, fake_notion):
+    items = [page("A"), page("B", Missing={"rich_text": []}), page("C")]
+    first = await upload_works(items, "token-retry", idempotency_key="key-1")
+    assert isinstance(first[1], ErrorResult) and first[1].data == 1
+    assert fake_notion.requests["POST pages"] == 2
+
+    items[1] = page("B")
+    second = await upload_works(items, "token-retry", idempotency_key="key-1")
+    # 之前成功的直接返回原来的 page，只上传了失败的那一条
+    assert fake_notion.requests["POST pages"] == 3
+    assert second[0] == {"object": "page", "id": first[0]["id"]}
+    assert second[2] == {"object": "page", "id": first[2]["id"]}
+    assert second[1]["id"] not in (first[0]["id"], first[2]["id"])
+
+    third = await upload_works(items, "token-retry", idempotency_key="key-1")
+    assert fake_notion.requests["POST pages"] == 3
+    assert [result["id"] for result in third] == [result["id"] for result in second]
+
+
+@pytest.mark.anyio
+async def test_changed_item_is_uploaded_again(db, fake_notion):
+    first = await upload_works([page("A"), page("B")], "token-changed", idempotency_key="key-1")
+    second = await upload_works([page("A"), page("B, revised")], "token-changed", idempotency_key="key-1")
+    assert fake_notion.requests["POST pages"] == 3
+    assert second[0]["id"] == first[0]["id"]
+    assert second[1]["id"] != first[1]["id"]
+
+
+@pytest.mark.anyio
+async def test_keys_are_scoped_to_the_access_token(db, fake_notion):
+    await upload_works([page("A")], "token-1", idempotency_key="shared-key")
+    await upload_works([page("A")], "token-2", idempotency_key="shared-key")
+    await upload_works([page("A")], "token-1", idempotency_key="other-key")
+    assert fake_notion.requests["POST pages"] == 3
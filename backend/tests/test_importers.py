@@ -0,0 +1,152 @@
+import io
+import json
+import time
+
+import pytest
+
+from src.importers import bibtex, csl_json, ris
+
+BIBTEX = r"""
+@string{jmlr = "Journal of Machine Learning Research"}
+
+@article{vaswani2017,
+  title = {Attention Is {All} You Need (and more)},
+  author = {Vaswani, Ashish and Noam Shazeer},
+  journal = "Advances in Neural Information Processing Systems",
+  year = 2017,
+  month = jun,
+  doi = {10.5555/3295222.3295349},
+}
+@misc(devlin2018, title = {BERT: Pre-training {:}}, eprint = {1810.04805}, archivePrefix = {arXiv})
+"""
+
+
+def test_bibtex():
+    works = list(bibtex.iter_works(io.StringIO(BIBTEX)))
+    assert len(works) == 2
+    assert works[0].title == "Attention Is All You Need (and more)"
+    assert [author.fullName for author in works[0].authors] == ["Ashish Vaswani", "Noam Shazeer"]
+    assert works[0].publishInfo.year == "2017" and works[0].publishInfo.month == "06"
+    assert works[0].DOI == "10.5555/3295222.3295349"
+    assert works[0].type.value == "journal-article"
+    assert works[1].title == "BERT: Pre-training :"
+    assert works[1].platform.value == "arXiv" and works[1].platformId == "1810.04805"
+
+
+def test_bibtex_entries_on_one_line():
+    lines = ["@article{a, title={A}}@article{b, title={B}} @book(c, title={C (2nd ed.)})\n"]
+    assert [work.title for work in bibtex.iter_works(lines)] == ["A", "B", "C (2nd ed.)"]
+
+
+def test_bibtex_only_counts_the_opening_delimiter():
+    # 标题中不成对的圆括号不影响 {} 包围的记录
+    lines = ["@article{a, title={Smile :)}}\n", "@article{b,\n", "  title={B}\n", "}\n"]
+    assert [raw for _, raw in bibtex.iter_raw_entries(lines)] == [
+        "a, title={Smile :)}",
+        "b,\n  title={B}\n",
+    ]
+
+
+RIS = """TY  - JOUR
+TI  - Deep Residual Learning
+AU  - He, Kaiming
+AU  - Zhang, Xiangyu
+PY  - 2016/06/27/
+SP  - 770
+EP  - 778
+KW  - vision
+DO  - 10.1109/CVPR.2016.90
+AB  - Deeper neural networks are more difficult
+to train.
+ER  - 
+garbage between records
+TY  - BOOK
+T1  - A Book
+SN  - 978-3-16-148410-0
+ER  - 
+TY  - JOUR
+ER  - 
+"""
+
+
+def test_ris():
+    works = list(ris.iter_works(io.StringIO(RIS)))
+    assert len(works) == 3
+    paper, book, empty = works
+    assert paper.title == "Deep Residual Learning"
+    assert [author.fullName for author in paper.authors] == ["Kaiming He", "Xiangyu Zhang"]
+    assert (paper.publishInfo.year, paper.publishInfo.month, paper.publishInfo.day) == ("2016", "06", "27")
+    assert paper.publishInfo.pages == "770-778"
+    assert paper.abstract == "Deeper neural networks are more difficult to train."
+    assert book.type.value == "book" and book.ISBN == ["978-3-16-148410-0"]
+    # 没有标题的记录由 pipeline 报告为 parse_error
+    assert empty is None or not empty.title
+
+
+CSL_ITEMS = [
+    {
+        "type": "article-journal",
+        "title": "Paper with \"quotes\", commas and [brackets] {braces}\\",
+        "author": [{"family": "Lovelace", "given": "Ada"}],
+        "issued": {"date-parts": [[1843, 9]]},
+        "DOI": "10.1000/a",
+    },
+    {"type": "book", "title": "Second"},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, csl_json.CHUNK_SIZE])
+def test_csl_json(monkeypatch, chunk_size):
+    monkeypatch.setattr(csl_json, "CHUNK_SIZE", chunk_size)
+    text = json.dumps(CSL_ITEMS, indent=2)
+    works = list(csl_json.iter_works(io.StringIO(text)))
+    assert [work.title for work in works] == [item["title"] for item in CSL_ITEMS]
+    assert works[0].authors[0].fullName == "Ada Lovelace"
+    assert works[0].publishInfo.month == "09"
+    assert works[1].type.value == "book"
+
+
+def test_csl_json_malformed_element_only_fails_that_entry():
+    text = '[{"title": "A"}, {"title": "B",, }, 42, {"title": "C"}}, {"title": "D"},]'
+    titles = [work.title if work else None for work in csl_json.iter_works(io.StringIO(text))]
+    assert titles == ["A", None, None, None, "D"]
+
+
+
+def test_csl_json_fields_with_wrong_types():
+    items = [
+        {"title": "Null fields", "author": None, "keyword": None, "issued": None},
+        {"title": "Wrong types", "author": "Ada Lovelace", "keyword": ["a", "b"], "issued": "1843"},
+        {"title": "Bad date parts", "issued": {"date-parts": "1843"}, "author": [None, {"family": "Turing"}]},
+        {"title": "Unhashable type", "type": ["book"]},
+        {"title": "Last", "keyword": "graphs; networks"},
+    ]
+    works = list(csl_json.iter_works(io.StringIO(json.dumps(items))))
+    assert [work.title if work else None for work in works] == [
+        "Null fields",
+        "Wrong types",
+        "Bad date parts",
+        None,
+        "Last",
+    ]
+    assert works[0].authors is None and works[1].subjects is None
+    assert works[2].authors[0].fullName == "Turing"
+    assert works[4].subjects == ["graphs", "networks"]
+
+
+def test_csl_json_not_an_array():
+    with pytest.raises(csl_json.CSLJSONError):
+        list(csl_json.iter_raw_entries(io.StringIO('{"title": "A"}')))
+    with pytest.raises(csl_json.CSLJSONError):
+        list(csl_json.iter_raw_entries(io.StringIO('[{"title": "A"}, {"title": ')))
+    assert list(csl_json.iter_raw_entries(io.StringIO(" [ ] "))) == []
+
+
+def test_csl_json_single_line_file_is_linear():
+    """压缩成一行的文件，解析时间与文件大小成正比"""
+    items = [{"type": "article-journal", "title": f"Paper {i}", "abstract": "x" * 200} for i in range(20000)]
+    text = json.dumps(items, separators=(",", ":"))
+    start = time.perf_counter()
+    count = sum(1 for _ in csl_json.iter_raw_entries(io.StringIO(text)))
+    assert count == len(items)
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,106 @@
+import re
+from collections import defaultdict
+
+from src.config import Config
+from src.metrics import MetricsRegistry
+
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$")
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+_UNESCAPE = {"\\\\": "\\", '\\"': '"', "\\n": "\n"}
+
+
+def parse(text: str) -> tuple[dict[str, str], dict[str, dict[tuple, float]]]:
+    """解析 Prometheus 文本格式，返回 (metric 名 -> TYPE, 样本名 -> {排序后的 label: value})"""
+    assert text.endswith("\n")
+    types, samples = {}, defaultdict(dict)
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, metric_type = line.split(" ")
+            types[name] = metric_type
+            continue
+        if line.startswith("# HELP "):
+            continue
+        match = _SAMPLE.match(line)
+        assert match, f"invalid sample line: {line!r}"
+        name, labels_text, value = match.groups()
+        labels = []
+        if labels_text:
+            pairs = _LABEL.findall(labels_text)
+            assert ",".join(f'{k}="{v}"' for k, v in pairs) == labels_text, f"invalid labels: {labels_text!r}"
+            labels = [(k, re.sub(r"\\.", lambda m: _UNESCAPE[m.group()], v)) for k, v in pairs]
+        samples[name][tuple(sorted(labels))] = float(value)
+    return types, samples
+
+
+def check_histograms(types: dict[str, str], samples: dict[str, dict[tuple, float]]) -> None:
+    """每个 histogram 的 bucket 是累加的，+Inf 的 bucket 等于 _count"""
+    for name, metric_type in types.items():
+        if metric_type != "histogram":
+            continue
+        series = defaultdict(list)
+        for labels, value in samples[f"{name}_bucket"].items():
+            le = dict(labels)["le"]
+            series[tuple(label for label in labels if label[0] != "le")].append((float(le), value))
+        for labels, buckets in series.items():
+            counts = [value for _, value in sorted(buckets)]
+            assert counts == sorted(counts)
+            assert sorted(buckets)[-1][0] == float("inf")
+            assert counts[-1] == samples[f"{name}_count"][labels]
+            assert labels in samples[f"{name}_sum"]
+
+
+def test_render_counter_gauge_and_histogram():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("path",))
+    gauge = registry.gauge("in_flight", "In flight")
+    histogram = registry.histogram("latency_seconds", "Latency", ("method",))
+    histogram.buckets = (0.1, 1, 10)
+    odd = 'a "quoted"\\path\nnext'
+    counter.inc(path=odd)
+    counter.inc(2.5, path="/b")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    for value in (0.05, 0.1, 0.5, 3, 30):
+        histogram.observe(value, method="GET")
+
+    text = registry.render()
+    assert '{path="a \\"quoted\\"\\\\path\\nnext"}' in text
+    types, samples = parse(text)
+    assert types == {"requests_total": "counter", "in_flight": "gauge", "latency_seconds": "histogram"}
+    assert samples["requests_total"] == {(("path", odd),): 1, (("path", "/b"),): 2.5}
+    assert samples["in_flight"] == {(): 1}
+    buckets = {dict(labels)["le"]: value for labels, value in samples["latency_seconds_bucket"].items()}
+    # 等于上界的值计入该 bucket
+    assert buckets == {"0.1": 2, "1": 3, "10": 4, "+Inf": 5}
+    assert samples["latency_seconds_count"] == {(("method", "GET"),): 5}
+    assert samples["latency_seconds_sum"][(("method", "GET"),)] == sum((0.05, 0.1, 0.5, 3, 30))
+    check_histograms(types, samples)
+
+
+def test_metrics_endpoint(client):
+    client.post("/upload-jobs", json={"access_token": "token-metrics", "data": []})
+    client.get("/upload-jobs/unknown")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    types, samples = parse(response.text)
+    assert types["http_request_duration_seconds"] == "histogram"
+    assert types["upload_jobs"] == "gauge"
+    routes = {dict(labels)["route"] for labels in samples["http_request_duration_seconds_count"]}
+    # 路由使用模板而不是实际的路径
+    assert "/upload-jobs/{job_id}" in routes and "/upload-jobs/unknown" not in routes
+    assert {dict(labels)["status"] for labels in samples["upload_jobs"]} == {"pending", "running", "finished", "failed"}
+    check_histograms(types, samples)
+
+
+def test_metrics_access(client, monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200 and "# TYPE" in response.text
@@ -0,0 +1,53 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from src.config import Config
+from src.database.db_models import Base
+
+
+def schema_diff(sync_conn) -> list:
+    return compare_metadata(MigrationContext.configure(sync_conn), Base.metadata)
+
+
+def head(db_client) -> set[str]:
+    return set(ScriptDirectory.from_config(db_client._alembic_config()).get_heads())
+
+
+def test_script_heads_match_alembic(empty_db):
+    """启动时不导入 alembic，自己读取迁移脚本得到的最新版本必须与 alembic 相同"""
+    assert empty_db._script_heads() == head(empty_db)
+
+
+@pytest.mark.anyio
+async def test_migrations_match_the_models(db):
+    """新增或修改 db_models 中的表后，需要添加对应的迁移脚本"""
+    async with db.Session.engine.connect() as conn:
+        assert await conn.run_sync(schema_diff) == []
+        assert await conn.run_sync(db._current_revisions) == head(db)
+    assert len(head(db)) == 1
+
+
+@pytest.mark.anyio
+async def test_database_created_before_migrations_is_stamped(empty_db):
+    """之前由 create_all 创建、缺少后来新增的表的数据库，补全缺少的表后标记为最新版本"""
+    empty_db.Session.connect()
+    async with empty_db.Session.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[Base.metadata.tables["access_token"]])
+    await empty_db.check_migrations()
+    async with empty_db.Session.engine.connect() as conn:
+        assert await conn.run_sync(schema_diff) == []
+        assert await conn.run_sync(empty_db._current_revisions) == head(empty_db)
+    await empty_db.Session.dispose()
+
+
+@pytest.mark.anyio
+async def test_outdated_database_is_rejected_without_auto_migrate(empty_db, monkeypatch):
+    monkeypatch.setattr(Config, "DB_AUTO_MIGRATE", False)
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        await empty_db.check_migrations()
+    async with empty_db.Session.engine.connect() as conn:
+        assert await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()) == []
+    await empty_db.Session.dispose()
@@ -0,0 +1,124 @@
+import json
+
+import httpx
+import pytest
+
+from benchmarks.fake_notion import FakeNotion, installed
+from src.models import Work
+from src.notion_api.api import ErrorResult, upload_works
+from src.notion_api.page_content import MAX_CHILDREN_PER_REQUEST, chunk_text, split_children, work_to_blocks
+
+DATABASE_ID = "0f8a1b2c-0000-0000-0000-000000000000"
+
+
+def paragraphs(count: int) -> list[dict]:
+    return [
+        {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": str(i)}}]}}
+        for i in range(count)
+    ]
+
+
+def page(children: list[dict]) -> dict:
+    return {
+        "parent": {"type": "database_id", "database_id": DATABASE_ID},
+        "properties": {"Name": {"title": [{"text": {"content": "Paper"}}]}},
+        "children": children,
+    }
+
+
+class RecordingNotion(FakeNotion):
+    """记录每个请求的 body，fail_append 为第几次 blocks.children.append 时返回错误（从 1 开始）"""
+
+    def __init__(self, fail_append: int | None = None):
+        super().__init__()
+        self.fail_append = fail_append
+        self.bodies: list[tuple[str, dict]] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        self.bodies.append((f"{request.method} {request.url.path.removeprefix('/v1/')}", body))
+        if request.method == "PATCH" and request.url.path.endswith("/children"):
+            appended = sum(1 for route, _ in self.bodies if route.endswith("/children"))
+            if appended == self.fail_append:
+                return self.error(400, "validation_error", "body failed validation")
+        return super().handle(request)
+
+
+def test_chunk_text_at_the_limit():
+    assert chunk_text("a" * 2000) == ["a" * 2000]
+    # 没有空白时按 2000 个字符硬切
+    assert [len(chunk) for chunk in chunk_text("a" * 4500)] == [2000, 2000, 500]
+    assert chunk_text("") == []
+
+
+def test_chunk_text_breaks_at_whitespace():
+    text = " ".join(f"word{i:04d}" for i in range(1000))
+    chunks = chunk_text(text)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    # 每段都在空格处断开，没有拆开单词
+    assert all(chunk.endswith(tuple("0123456789")) for chunk in chunks[:-1])
+    assert all(chunk.startswith(" ") for chunk in chunks[1:])
+
+
+def test_work_to_blocks():
+    work = Work.model_validate(
+        {"title": "Paper", "abstract": "First paragraph.\n\n" + "x" * 4500, "highlights": ["One", " ", "Two"]}
+    )
+    blocks = work_to_blocks(work, ["abstract", "highlights"])
+    assert [block["type"] for block in blocks] == [
+        "heading_2",
+        "paragraph",
+        "paragraph",
+        "paragraph",
+        "paragraph",
+        "heading_2",
+        "bulleted_list_item",
+        "bulleted_list_item",
+    ]
+    contents = [block[block["type"]]["rich_text"][0]["text"]["content"] for block in blocks]
+    assert contents[0] == "Abstract" and contents[5] == "Highlights"
+    assert [len(content) for content in contents[2:5]] == [2000, 2000, 500]
+    assert work_to_blocks(Work.model_validate({"title": "Paper"}), ["abstract"]) == []
+
+
+def test_split_children():
+    assert split_children([]) == ([], [])
+    children = paragraphs(MAX_CHILDREN_PER_REQUEST)
+    assert split_children(children) == (children, [])
+    children = paragraphs(250)
+    inline, batches = split_children(children)
+    assert inline == children[:100]
+    assert [len(batch) for batch in batches] == [100, 50]
+    assert [block for batch in batches for block in batch] == children[100:]
+
+
+@pytest.mark.anyio
+async def test_long_body_is_appended_in_batches():
+    with installed(RecordingNotion()) as fake:
+        [result] = await upload_works([page(paragraphs(250))], "token-body")
+    assert result["object"] == "page"
+    # 上传前会先读取 database 的 schema 校验属性，见 property_validator.py
+    routes = [(route, len(body.get("children", []))) for route, body in fake.bodies if not route.startswith("GET")]
+    assert routes == [
+        ("POST pages", 100),
+        (f"PATCH blocks/{result['id']}/children", 100),
+        (f"PATCH blocks/{result['id']}/children", 50),
+    ]
+    # 按顺序追加
+    appended = [body for route, body in fake.bodies if route.endswith("/children")]
+    assert appended[0]["children"][0] == paragraphs(250)[100]
+    assert fake.blocks[result["id"]] == 250
+
+
+@pytest.mark.anyio
+async def test_failed_append_archives_the_page():
+    with installed(RecordingNotion(fail_append=2)) as fake:
+        results = await upload_works([page(paragraphs(10)), page(paragraphs(250))], "token-archive")
+    assert results[0]["object"] == "page"
+    assert isinstance(results[1], ErrorResult) and results[1].data == 1
+    archived = [(route, body) for route, body in fake.bodies if route.startswith("PATCH pages/")]
+    assert len(archived) == 1
+    assert archived[0][1] == {"archived": True}
+    # 出错后不再继续追加
+    assert sum(1 for route, _ in fake.bodies if route.endswith("/children")) == 2
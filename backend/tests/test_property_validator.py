@@ -0,0 +1,84 @@
+import pytest
+
+from benchmarks.fake_notion import DATABASE_PROPERTIES
+from src.notion_api.api import ErrorResult, upload_works
+from src.notion_api.database_work_mapping import MAX_TEXT_LENGTH
+from src.notion_api.property_validator import is_iso_date, validate_page_properties
+
+
+def text(content: str) -> list[dict]:
+    return [{"text": {"content": content}}]
+
+
+@pytest.mark.parametrize(
+    "value, valid",
+    [
+        ("2022-01-01", True),
+        ("2022-01-01T12:00:00", True),
+        ("2022-01-01T12:00:00.000Z", True),
+        ("2022-01-01T12:00:00+08:00", True),
+        ("2022-13-01", False),
+        ("01/02/2022", False),
+        ("2022", False),
+    ],
+)
+def test_is_iso_date(value, valid):
+    assert is_iso_date(value) is valid
+
+
+def test_valid_properties():
+    properties = {
+        "Name": {"title": text("A")},
+        "Year": {"number": 2024},
+        "Published": {"date": {"start": "2024-05-01"}},
+        "URL": {"url": None},
+        "Type": {"select": {"name": "A new option"}},
+        "Subjects": {"multi_select": [{"name": "new"}]},
+        "Status": {"status": {"name": "Reading"}},
+        "References": {"relation": [{"id": "page"}]},
+    }
+    assert validate_page_properties(properties, DATABASE_PROPERTIES) is None
+
+
+@pytest.mark.parametrize(
+    "properties, message",
+    [
+        ({"Missing": {"rich_text": []}}, "Missing is not a property that exists."),
+        ({"Year": {"rich_text": text("2024")}}, "Year is expected to be number."),
+        ({"Year": {"number": "2024"}}, "Year is expected to be number."),
+        ({"Year": {"number": True}}, "Year is expected to be number."),
+        ({"Name": "A"}, "Name is expected to be title."),
+        ({"Name": {"title": ["A"]}}, "Name is expected to be title."),
+        ({"Status": {"status": {"name": "Unknown"}}}, 'Invalid status option. Status option "Unknown" does not exist".'),
+        (
+            {"Published": {"date": {"start": "May 2024"}}},
+            "body failed validation: body.properties.Published.date.start should be a valid ISO 8601 date string, "
+            'instead was `"May 2024"`.',
+        ),
+        (
+            {"Abstract": {"rich_text": text("ok") + text("x" * (MAX_TEXT_LENGTH + 1))}},
+            f"body failed validation: body.properties.Abstract.rich_text[1].text.content.length "
+            f"should be ≤ `{MAX_TEXT_LENGTH}`, instead was `{MAX_TEXT_LENGTH + 1}`.",
+        ),
+    ],
+)
+def test_invalid_properties(properties, message):
+    assert validate_page_properties({"Name": {"title": text("A")}, **properties}, DATABASE_PROPERTIES) == message
+
+
+@pytest.mark.anyio
+async def test_invalid_items_are_not_sent(fake_notion):
+    database_id = "5c1d2e3f-0000-0000-0000-000000000000"
+    items = [
+        {"parent": {"database_id": database_id}, "properties": {"Name": {"title": text("A")}}},
+        {"parent": {"database_id": database_id}, "properties": {"Year": {"number": "2024"}}},
+    ]
+    results = await upload_works(items, "token-validator")
+    assert results[0]["object"] == "page"
+    assert isinstance(results[1], ErrorResult)
+    assert (results[1].code, results[1].message, results[1].data) == (
+        "validation_error",
+        "Year is expected to be number.",
+        1,
+    )
+    assert fake_notion.requests["POST pages"] == 1
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from src.config import Config
+from src.notion_api.rate_limiter import BucketState, TokenBucket, RateLimiter, method_name
+
+
+def test_take_until_empty():
+    state = BucketState(tokens=2, rate=1, updated_at=0)
+    assert state.take(0, capacity=2) == 0
+    assert state.take(0, capacity=2) == 0
+    # 桶空了，按速率 1 个/秒，需要等 1 秒
+    assert state.take(0, capacity=2) == pytest.approx(1)
+
+
+def test_refill_is_capped_at_capacity():
+    state = BucketState(tokens=0, rate=3, updated_at=0)
+    state.refill(1, capacity=10)
+    assert state.tokens == pytest.approx(3)
+    state.refill(100, capacity=10)
+    assert state.tokens == 10
+
+
+def test_slow_down_blocks_and_halves_rate():
+    state = BucketState(tokens=5, rate=4, updated_at=0)
+    state.slow_down(10, retry_after=2, min_rate=0.5)
+    assert state.rate == 2
+    assert state.tokens == 0
+    assert state.take(11, capacity=5) == pytest.approx(1)
+    # 速率不会低于 min_rate
+    for _ in range(10):
+        state.slow_down(10, retry_after=2, min_rate=0.5)
+    assert state.rate == 0.5
+
+
+def test_recover_speeds_up_to_max_rate():
+    state = BucketState(tokens=0, rate=1, updated_at=0)
+    state.recover(0, capacity=10, max_rate=4)
+    assert state.rate == pytest.approx(1 + 4 * Config.NOTION_RATE_LIMIT_RECOVERY)
+    for _ in range(1000):
+        state.recover(0, capacity=10, max_rate=4)
+    assert state.rate == 4
+
+
+@pytest.mark.anyio
+async def test_token_bucket_waits_after_rate_limited():
+    bucket = TokenBucket(rate=100, capacity=10, min_rate=1)
+    await bucket.on_rate_limited(0.1)
+    assert bucket.rate == 50
+    start = time.monotonic()
+    await bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+    await bucket.on_success()
+    assert bucket.rate == pytest.approx(50 + 100 * Config.NOTION_RATE_LIMIT_RECOVERY)
+
+
+def test_rate_limiter_keeps_recent_buckets():
+    limiter = RateLimiter(rate=3, capacity=10, min_rate=0.5, max_size=2)
+    first = limiter.get_bucket("a")
+    limiter.get_bucket("b")
+    assert limiter.get_bucket("a") is first
+    # b 是最久没有使用的，被移除
+    limiter.get_bucket("c")
+    assert "b" not in limiter._buckets
+    assert limiter.get_bucket("a") is first
+
+
+def test_method_name():
+    assert method_name("pages", "POST") == "pages.create"
+    assert method_name("databases/0f8a1b2c-0000/query", "post") == "databases.query"
+    assert method_name("blocks/abc123/children", "PATCH") == "blocks.children.append"
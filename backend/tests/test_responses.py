@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src import responses
+from src.models import UploadJobFailure, UploadJobStatus, Work
+from src.notion_api.api import DuplicateResult, ErrorResult
+from src.responses import ApiJSONResponse, create_response
+
+WORK = Work.model_validate(
+    {
+        "title": "Attention Is All You Need",
+        "type": "journal-article",
+        "url": "https://arxiv.org/abs/1706.03762",
+        "authors": [{"fullName": "Ashish Vaswani"}],
+        "digitalResources": [{"resourceLink": "https://arxiv.org/pdf/1706.03762", "contentType": "application/pdf"}],
+    }
+)
+
+# 各接口返回的 data，与 main.py 中传给 create_response 的相同
+PAYLOADS = {
+    "upload_job_status": UploadJobStatus(
+        job_id="job",
+        status="running",
+        total=4,
+        done=3,
+        failures=[UploadJobFailure(index=1, message="Name is expected to be title.", code="validation_error")],
+        page_ids={0: "page-0", 10: "page-10"},
+        duplicates={2: "page-2"},
+    ),
+    "upload_raw_works": {"failed": [1, 3], "duplicates": {2: "page-2", 11: "page-11"}},
+    "error_results": [
+        ErrorResult(message="Invalid", code=400, data={0: "Name is expected to be title.", 3: ["a", "b"]}),
+        ErrorResult(message="Timeout", code="connection_error", data=5),
+        DuplicateResult(page_id="page-2", data=2),
+    ],
+    "works": [WORK, None],
+    "mirror_search": {
+        "results": [{"page_id": "page-0", "title": "Attention", "score": 1.5}],
+        "synced_at": datetime(2024, 5, 1, 12, 30, 0, 123456),
+    },
+    "notion_page": {
+        "object": "page",
+        "id": "page-0",
+        "properties": {"Year": {"number": 2017}, "Tags": {"multi_select": []}, "Done": {"checkbox": False}},
+        "url": None,
+    },
+}
+
+
+def stdlib_json(content) -> object:
+    """FastAPI 默认的序列化方式：jsonable_encoder 转换后用 json.dumps 序列化"""
+    return json.loads(JSONResponse(jsonable_encoder(content)).body)
+
+
+@pytest.mark.parametrize("name", PAYLOADS)
+def test_payloads_match_stdlib_json(name):
+    content = {"success": True, "message": "", "data": PAYLOADS[name], "code": 0}
+    assert json.loads(create_response(success=True, data=PAYLOADS[name]).body) == stdlib_json(content)
+
+
+@pytest.mark.parametrize("name", PAYLOADS)
+def test_pydantic_core_fallback_matches_stdlib_json(name, monkeypatch):
+    monkeypatch.setattr(responses, "orjson", None)
+    content = {"success": True, "message": "", "data": PAYLOADS[name], "code": 0}
+    assert json.loads(ApiJSONResponse(content).body) == stdlib_json(content)
+
+
+def test_int_keys_and_datetimes():
+    body = json.loads(
+        ApiJSONResponse(
+            {
+                "page_ids": {0: "a", 12: "b"},
+                "naive": datetime(2024, 5, 1, 12, 0),
+                "aware": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+                "work": WORK,
+            }
+        ).body
+    )
+    assert body["page_ids"] == {"0": "a", "12": "b"}
+    assert body["naive"] == "2024-05-01T12:00:00"
+    assert body["aware"] == "2024-05-01T12:00:00+00:00"
+    # pydantic 模型按 model_dump(mode="json") 序列化：枚举是值，链接是字符串
+    assert body["work"]["type"] == "journal-article"
+    assert body["work"]["url"] == "https://arxiv.org/abs/1706.03762"
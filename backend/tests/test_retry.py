@@ -0,0 +1,96 @@
+import httpx
+import pytest
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+from src.config import Config
+from src.notion_api import api
+from src.notion_api.api import ErrorResult, search_by_title
+from src.notion_api.retry import backoff_delay, retry_reason
+
+
+def api_error(status: int, code: str) -> APIResponseError:
+    body = {"object": "error", "status": status, "code": code, "message": code}
+    return APIResponseError(httpx.Response(status, json=body), code, code)
+
+
+@pytest.mark.parametrize(
+    "error, reason",
+    [
+        (api_error(429, "rate_limited"), "rate_limited"),
+        (api_error(409, "conflict_error"), "conflict"),
+        (api_error(500, "internal_server_error"), "server_error"),
+        (api_error(503, "service_unavailable"), "server_error"),
+        # 网关返回的不是 notion 格式的错误
+        (HTTPResponseError(httpx.Response(502, text="Bad Gateway")), "server_error"),
+        (RequestTimeoutError(), "timeout"),
+        (httpx.ReadTimeout("timed out"), "timeout"),
+        (httpx.ConnectError("refused"), "connection"),
+        (api_error(400, "validation_error"), None),
+        (api_error(401, "unauthorized"), None),
+        (api_error(404, "object_not_found"), None),
+        (HTTPResponseError(httpx.Response(400, text="Bad Request")), None),
+        (ValueError("not a request error"), None),
+    ],
+)
+def test_retry_reason(error, reason):
+    assert retry_reason(error) == reason
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(Config, "NOTION_RETRY_BACKOFF_BASE", 0.5)
+    monkeypatch.setattr(Config, "NOTION_RETRY_BACKOFF_CAP", 3)
+    for _ in range(100):
+        assert 0 <= backoff_delay(0) < 0.5
+        assert 0 <= backoff_delay(10) < 3
+
+
+@pytest.fixture
+def notion_responses(monkeypatch):
+    """notion 依次返回列表中的响应，列表中的异常会被抛出"""
+    responses = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(Config, "NOTION_RETRY_BACKOFF_BASE", 0.001)
+    original = api.notion.client
+    api.notion.client = httpx.AsyncClient(transport=httpx.MockTransport(handle), base_url="https://api.notion.com/v1/")
+    yield responses
+    api.notion.client = original
+
+
+def notion_error(status: int, code: str) -> httpx.Response:
+    return httpx.Response(status, json={"object": "error", "status": status, "code": code, "message": code})
+
+
+SEARCH_RESULT = {"object": "list", "results": [], "has_more": False, "next_cursor": None}
+
+
+@pytest.mark.anyio
+async def test_transient_errors_are_retried(notion_responses):
+    notion_responses.extend(
+        [notion_error(503, "service_unavailable"), httpx.ConnectError("refused"), httpx.Response(200, json=SEARCH_RESULT)]
+    )
+    assert await search_by_title("retried", "database", "token-retried") == []
+    assert notion_responses == []
+
+
+@pytest.mark.anyio
+async def test_permanent_errors_are_returned(notion_responses):
+    notion_responses.append(notion_error(401, "unauthorized"))
+    result = await search_by_title("unauthorized", "database", "token-unauthorized")
+    assert isinstance(result, ErrorResult) and result.code == "unauthorized"
+
+
+@pytest.mark.anyio
+async def test_search_returns_connection_errors(notion_responses, monkeypatch):
+    monkeypatch.setattr(Config, "NOTION_MAX_RETRIES", 1)
+    notion_responses.extend([httpx.ConnectError("refused"), httpx.ConnectError("refused")])
+    result = await search_by_title("offline", "database", "token-offline")
+    assert isinstance(result, ErrorResult) and result.code == "connection_error"
+    # 出错的结果不会被缓存
+    notion_responses.append(httpx.Response(200, json=SEARCH_RESULT))
+    assert await search_by_title("offline", "database", "token-offline") == []
@@ -0,0 +1,48 @@
+import pytest
+
+from src.notion_api import api
+from src.shared_state import DatabaseCache, LocalCache
+
+
+@pytest.mark.anyio
+async def test_local_cache_get_many():
+    cache = LocalCache(ttl=60, max_size=10)
+    await cache.set("a", 1)
+    await cache.set("none", None)
+    assert await cache.get_many(["a", "none", "missing"]) == {"a": 1, "none": None}
+
+
+@pytest.mark.anyio
+async def test_database_cache_get_many(db):
+    cache = DatabaseCache(namespace="test", ttl=60)
+    other = DatabaseCache(namespace="other", ttl=60)
+    await cache.set(("token", "database", "a"), {"id": "a"})
+    await cache.set(("token", "database", "b"), {"id": "b"})
+    await other.set(("token", "database", "c"), {"id": "c"})
+    expired = DatabaseCache(namespace="test", ttl=-1)
+    await expired.set(("token", "database", "d"), {"id": "d"})
+    keys = [("token", "database", name) for name in "abcde"]
+    assert await cache.get_many(keys) == {keys[0]: {"id": "a"}, keys[1]: {"id": "b"}}
+
+
+@pytest.mark.anyio
+async def test_search_revalidates_schemas_with_one_query(db, fake_notion, monkeypatch):
+    schema_cache = DatabaseCache(namespace="schema", ttl=60)
+    monkeypatch.setattr(api, "schema_cache", schema_cache)
+    monkeypatch.setattr(api, "search_cache", LocalCache(ttl=60, max_size=10))
+    fresh = fake_notion.database("00000000-0000-0000-0000-000000000000")
+    unchanged = fake_notion.database("00000001-0000-0000-0000-000000000000")
+    stale = {**fake_notion.database("00000002-0000-0000-0000-000000000000"), "last_edited_time": "2020-01-01"}
+    for pd in (unchanged, stale):
+        await schema_cache.set(("token-search", "database", pd["id"]), pd)
+
+    async def one_at_a_time(*args):
+        raise AssertionError("schemas should be read with get_many")
+
+    monkeypatch.setattr("src.shared_state.get_shared_cache", one_at_a_time)
+    results = await api.search_by_title("papers", "database", "token-search")
+    assert len(results) == fake_notion.search_results
+    cached = await schema_cache.get_many([("token-search", "database", pd["id"]) for pd in (fresh, unchanged, stale)])
+    # 只刷新已经缓存的，last_edited_time 变了的被替换
+    assert [pd["id"] for pd in cached.values()] == [unchanged["id"], stale["id"]]
+    assert all(pd["last_edited_time"] == fresh["last_edited_time"] for pd in cached.values())
@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+import pytest
+
+from src.config import Config
+from src.notion_api import upload_jobs
+from src.notion_api.api import DuplicateResult, ErrorResult
+from src.notion_api.upload_jobs import UploadJob, UploadJobManager, upload_job_manager
+
+DATABASE_ID = "0f8a1b2c-0000-0000-0000-000000000000"
+
+
+def page(title: str, **properties) -> dict:
+    return {
+        "parent": {"type": "database_id", "database_id": DATABASE_ID},
+        "properties": {"Name": {"title": [{"text": {"content": title}}]}, **properties},
+    }
+
+
+def blocked_job(release: asyncio.Event, total: int = 0) -> UploadJob:
+    """执行到 release.set() 之前一直不结束的任务"""
+
+    async def runner(job: UploadJob) -> None:
+        await release.wait()
+
+    return UploadJob(access_token="token", data=None, total=total, results=[None] * total, runner=runner)
+
+
+@pytest.fixture
+async def manager():
+    manager = UploadJobManager(workers=1, queue_size=1, result_ttl=60)
+    await manager.start()
+    yield manager
+    await manager.stop()
+
+
+async def wait_until_finished(manager: UploadJobManager, job: UploadJob) -> None:
+    for _ in range(100):
+        if job.finished_at is not None:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job.id} did not finish")
+
+
+@pytest.mark.anyio
+async def test_progress_counters(manager):
+    step = asyncio.Event()
+
+    async def runner(job: UploadJob) -> None:
+        job.set_result(0, {"object": "page", "id": "page-0"})
+        job.set_result(1, ErrorResult(message="Name is expected to be title.", code="validation_error", data=1))
+        await step.wait()
+        job.set_result(2, DuplicateResult(page_id="page-2", data=2))
+        job.set_result(job.add_item(), {"object": "page", "id": "page-3"})
+
+    job = await manager.submit_job(UploadJob(access_token="token", data=None, total=3, results=[None] * 3, runner=runner))
+    assert job.to_status().status == "pending"
+    await asyncio.sleep(0.01)
+    status = await manager.get_status(job.id)
+    assert (status.status, status.total, status.done) == ("running", 3, 2)
+    assert status.page_ids == {0: "page-0"}
+    assert [(failure.index, failure.code) for failure in status.failures] == [(1, "validation_error")]
+
+    step.set()
+    await wait_until_finished(manager, job)
+    status = await manager.get_status(job.id)
+    assert (status.status, status.total, status.done) == ("finished", 4, 4)
+    assert status.page_ids == {0: "page-0", 3: "page-3"}
+    assert status.duplicates == {2: "page-2"}
+
+
+@pytest.mark.anyio
+async def test_failed_runner_marks_the_job_failed(manager):
+    async def runner(job: UploadJob) -> None:
+        raise RuntimeError("file is not valid BibTeX")
+
+    job = await manager.submit_job(UploadJob(access_token="token", data=None, total=0, runner=runner))
+    await wait_until_finished(manager, job)
+    assert (job.status, job.message) == ("failed", "file is not valid BibTeX")
+
+
+@pytest.mark.anyio
+async def test_full_queue_returns_503(manager):
+    release = asyncio.Event()
+    running = await manager.submit_job(blocked_job(release))
+    # 等 worker 取走第一个任务，队列中还能再放一个
+    await asyncio.sleep(0.01)
+    queued = await manager.submit_job(blocked_job(release))
+    assert isinstance(queued, UploadJob)
+    rejected = await manager.submit_job(blocked_job(release))
+    assert isinstance(rejected, ErrorResult) and rejected.code == 503
+    assert rejected.message == "Too many upload jobs, please try again later"
+    assert set(manager.jobs) == {running.id, queued.id}
+    release.set()
+
+
+@pytest.mark.anyio
+async def test_finished_jobs_are_evicted_after_ttl(manager, monkeypatch):
+    release = asyncio.Event()
+    release.set()
+    finished = await manager.submit_job(blocked_job(release))
+    await wait_until_finished(manager, finished)
+    running = await manager.submit_job(blocked_job(asyncio.Event()))
+
+    now = time.monotonic()
+    monkeypatch.setattr(upload_jobs.time, "monotonic", lambda: now + manager.result_ttl - 1)
+    await manager.submit_job(blocked_job(release))
+    assert manager.get(finished.id) is finished
+
+    monkeypatch.setattr(upload_jobs.time, "monotonic", lambda: now + manager.result_ttl + 1)
+    await manager.submit_job(blocked_job(release))
+    assert manager.get(finished.id) is None
+    assert await manager.get_status(finished.id) is None
+    # 未完成的任务不会被删除
+    assert manager.get(running.id) is running
+
+
+@pytest.mark.anyio
+async def test_stop_cancels_running_jobs():
+    manager = UploadJobManager(workers=2, queue_size=4, result_ttl=60)
+    await manager.start()
+    tasks = list(manager._worker_tasks)
+    job = await manager.submit_job(blocked_job(asyncio.Event()))
+    await asyncio.sleep(0.01)
+    assert job.status == "running"
+    await manager.stop()
+    assert manager._worker_tasks == []
+    assert all(task.done() for task in tasks)
+    assert job.status == "failed" and job.finished_at is not None
+
+
+def poll(client, job_id: str) -> dict:
+    for _ in range(100):
+        data = client.get(f"/upload-jobs/{job_id}").json()["data"]
+        if data["status"] in ("finished", "failed"):
+            return data
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_upload_job_endpoints(client):
+    response = client.post(
+        "/upload-jobs",
+        json={"access_token": "token-jobs", "data": [page("A"), page("B", Missing={"rich_text": []}), page("C")]},
+    ).json()
+    assert response["success"] and response["code"] == 202
+    assert response["data"]["total"] == 3
+
+    data = poll(client, response["data"]["job_id"])
+    assert (data["status"], data["total"], data["done"]) == ("finished", 3, 3)
+    assert sorted(data["page_ids"]) == ["0", "2"]
+    assert [failure["index"] for failure in data["failures"]] == [1]
+    assert client.fake_notion.requests["POST pages"] == 2
+
+    response = client.get("/upload-jobs/unknown").json()
+    assert not response["success"] and response["code"] == 404
+
+
+def test_upload_job_endpoint_rejects_when_queue_is_full(empty_db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    # 没有 worker，提交的任务一直排队
+    monkeypatch.setattr(upload_job_manager, "workers", 0)
+    monkeypatch.setattr(upload_job_manager, "queue_size", 1)
+    monkeypatch.setattr(upload_job_manager, "jobs", {})
+    with TestClient(app) as client:
+        first = client.post("/upload-jobs", json={"access_token": "token", "data": [page("A")]}).json()
+        assert first["success"] and first["data"]["status"] == "pending"
+        second = client.post("/upload-jobs", json={"access_token": "token", "data": [page("B")]}).json()
+        assert not second["success"] and second["code"] == 503
+
+
+def test_lifespan_stops_the_workers(empty_db):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app):
+        tasks = list(upload_job_manager._worker_tasks)
+        assert len(tasks) == Config.UPLOAD_JOB_WORKERS
+        assert not any(task.done() for task in tasks)
+    assert upload_job_manager._worker_tasks == []
+    assert all(task.done() for task in tasks)
@@ -0,0 +1,24 @@
+import pytest
+
+from src.models import Work
+from src.notion_api.upload_ledger import find_uploaded_works, record_uploaded_works, work_identifiers
+
+
+def test_work_identifiers():
+    work = Work.model_validate(
+        {"title": "T", "DOI": "https://doi.org/10.48550/ARXIV.1706.03762", "platform": "arXiv",
+         "platformId": "http://arxiv.org/abs/1706.03762v5"}
+    )
+    assert work_identifiers(work) == ["doi:10.48550/arxiv.1706.03762", "arXiv:1706.03762"]
+    assert work_identifiers(Work.model_validate({"title": "T"})) == []
+
+
+@pytest.mark.anyio
+async def test_find_uploaded_works(db):
+    assert await record_uploaded_works("db1", [(["doi:10.1/a", "arXiv:1"], "page-a"), (["doi:10.1/b"], "page-b")])
+    # 重复记录同一篇不会出错，保留原来的 page id
+    assert await record_uploaded_works("db1", [(["doi:10.1/a"], "page-a2")])
+    duplicates = await find_uploaded_works("db1", [["doi:10.1/c"], ["doi:10.1/x", "arXiv:1"], ["doi:10.1/b"], []])
+    assert duplicates == {1: "page-a", 2: "page-b"}
+    # 按 database 分别记录
+    assert await find_uploaded_works("db2", [["doi:10.1/a"]]) == {}
@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.database.db_models import AccessToken, User
+from src.database.write_buffer import WriteBehindBuffer
+
+
+class FakeInsert:
+    def __init__(self, model):
+        self.model = model
+        self.rows = []
+
+    def values(self, rows):
+        self.rows = rows
+        return self
+
+    def on_conflict_do_nothing(self, index_elements):
+        return self
+
+
+class SlowSessionMaker:
+    """每次写入需要 delay 秒，写入完成的行记录在 written 中"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.written: list[tuple[str, dict]] = []
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+    async def execute(self, stmt: FakeInsert):
+        await asyncio.sleep(self.delay)
+        self.written.extend((stmt.model.__tablename__, row) for row in stmt.rows)
+
+
+def make_buffer(delay: float) -> tuple[WriteBehindBuffer, SlowSessionMaker]:
+    session_maker = SlowSessionMaker(delay)
+    return WriteBehindBuffer(session_maker=session_maker, insert=FakeInsert, batch_size=1, flush_interval=60), session_maker
+
+
+@pytest.mark.anyio
+async def test_stop_during_slow_insert_keeps_all_rows():
+    buffer, session_maker = make_buffer(delay=0.2)
+    await buffer.start()
+    buffer.add(User, {"id": "u1"}, conflict_column="id")
+    await asyncio.sleep(0.05)
+    # 此时 u1 正在写入，u2 还在 _pending 中
+    buffer.add(User, {"id": "u2"}, conflict_column="id")
+    await buffer.stop()
+    assert [row["id"] for _, row in session_maker.written] == ["u1", "u2"]
+
+
+@pytest.mark.anyio
+async def test_cancelled_flush_puts_rows_back():
+    buffer, session_maker = make_buffer(delay=0.2)
+    buffer.add(User, {"id": "u1"}, conflict_column="id")
+    buffer.add(AccessToken, {"bot_id": "b1"}, conflict_column="bot_id")
+    flush = asyncio.create_task(buffer.flush())
+    await asyncio.sleep(0.05)
+    flush.cancel()
+    await asyncio.gather(flush, return_exceptions=True)
+    assert session_maker.written == []
+    session_maker.delay = 0
+    await buffer.flush()
+    assert sorted(table for table, _ in session_maker.written) == ["access_token", "user"]
+
+
+@pytest.mark.anyio
+async def test_duplicate_rows_in_one_batch_are_written_once():
+    buffer, session_maker = make_buffer(delay=0)
+    buffer.add(User, {"id": "u1", "name": "first"}, conflict_column="id")
+    buffer.add(User, {"id": "u1", "name": "second"}, conflict_column="id")
+    await buffer.flush()
+    assert session_maker.written == [("user", {"id": "u1", "name": "first"})]